@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class IntroConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'acc_intro'
+
+    def ready(self):
+        # Keeps the cached token authentication in step with token, password and profile changes
+        from .authentication import connect_signals
+        connect_signals()
+        # Keeps the member-level directory (DirectoryEntry) in step with profile and member saves
+        from .directory import connect_signals as connect_directory_signals
+        connect_directory_signals()
@@ -0,0 +1,90 @@
+# Token authentication with a short-lived cache in front of the Token + User join.
+# DRF's TokenAuthentication queries the token and its user on every request; here the pair is
+# cached for AUTH_TOKEN_CACHE_SECONDS, with the user's NewPersonalProfile joined in, so
+# request.user.new_profile needs no query either. A second key per user points at the cached
+# token, which lets a user's entry be dropped without a database lookup.
+#
+# Entries are evicted when the token is saved or deleted (rotation), when the user is saved (a
+# password or is_active change) and when the profile changes. Code that changes these with
+# queryset.update() or bulk_update() skips the signals and has to call invalidate_user_auth().
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+
+DEFAULT_CACHE_SECONDS = 60
+
+
+def auth_cache():
+    return caches[getattr(settings, 'AUTH_TOKEN_CACHE', 'default')]
+
+
+def token_cache_key(key):
+    return f'auth-token:{key}'
+
+
+def user_cache_key(user_id):
+    return f'auth-token-user:{user_id}'
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that serves repeat requests for a token from the cache"""
+
+    def authenticate_credentials(self, key):
+        cache = auth_cache()
+        cached = cache.get(token_cache_key(key))
+        if cached is not None:
+            return cached
+
+        model = self.get_model()
+        try:
+            token = model.objects.select_related('user', 'user__new_profile').get(key=key)
+        except model.DoesNotExist:
+            raise exceptions.AuthenticationFailed(_('Invalid token.'))
+
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+        timeout = getattr(settings, 'AUTH_TOKEN_CACHE_SECONDS', DEFAULT_CACHE_SECONDS)
+        cache.set_many({token_cache_key(key): (token.user, token), user_cache_key(token.user_id): key}, timeout)
+        return (token.user, token)
+
+
+def invalidate_token(key):
+    auth_cache().delete(token_cache_key(key))
+
+
+def invalidate_user_auth(user_id):
+    """Drop the cached token of a user, e.g. after a password change"""
+    cache = auth_cache()
+    key = cache.get(user_cache_key(user_id))
+    if key:
+        cache.delete_many([token_cache_key(key), user_cache_key(user_id)])
+
+
+def token_changed(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+    invalidate_user_auth(instance.user_id)
+
+
+def user_changed(sender, instance, **kwargs):
+    invalidate_user_auth(instance.pk)
+
+
+def profile_changed(sender, instance, **kwargs):
+    invalidate_user_auth(instance.user_id)
+
+
+def connect_signals():
+    """Connected from IntroConfig.ready()"""
+    from django.contrib.auth.models import User
+    from django.db.models.signals import post_delete, post_save
+    from rest_framework.authtoken.models import Token
+    from .models import NewPersonalProfile
+
+    for signal, name in ((post_save, 'save'), (post_delete, 'delete')):
+        signal.connect(token_changed, sender=Token, dispatch_uid=f'auth_cache_token_{name}')
+        signal.connect(user_changed, sender=User, dispatch_uid=f'auth_cache_user_{name}')
+        signal.connect(profile_changed, sender=NewPersonalProfile, dispatch_uid=f'auth_cache_profile_{name}')
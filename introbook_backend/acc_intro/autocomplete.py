@@ -0,0 +1,94 @@
+# Typeahead suggestions for the search box (AutocompleteView), called on every keystroke.
+# A suggestion is a person's name ('Patel Kiran') with the number of people in the directory who have
+# it, the most common first. The prefix is matched on the two name orders DirectoryEntry keeps,
+# normalized by search_text(), so 'pat', 'patel ki' and 'kiran p' all find 'Patel Kiran'. Both
+# columns have a varchar_pattern_ops index (migration 0026), so on PostgreSQL the match is an index
+# range scan and never touches the search documents or serializes profiles.
+#
+# Short prefixes match the most people and are typed the most, so every worker keeps the suggestions
+# of its recent prefixes in a small LRU (AUTOCOMPLETE_CACHE_SIZE prefixes). Its keys include the
+# directory version (facets.py), which every profile or member write moves on, so suggestions
+# computed before a write are not served after it. That takes a default cache shared by the workers
+# (CACHES in settings.py); entries also expire after AUTOCOMPLETE_CACHE_SECONDS, so a worker that
+# missed a version change serves stale suggestions for that long at most.
+
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.db.models import Count, Min, Q
+from .facets import directory_version
+from .models import DirectoryEntry
+from .search import search_text
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 20
+DEFAULT_CACHE_SIZE = 2048
+DEFAULT_CACHE_SECONDS = 60
+
+
+class PrefixCache:
+    """Least recently used cache of suggestions that expire after seconds, shared by the threads of a worker"""
+
+    def __init__(self, size, seconds):
+        self.size = size
+        self.seconds = seconds
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, suggestions = entry
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return suggestions
+
+    def set(self, key, suggestions):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.seconds, suggestions)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+prefix_cache = PrefixCache(
+    getattr(settings, 'AUTOCOMPLETE_CACHE_SIZE', DEFAULT_CACHE_SIZE),
+    getattr(settings, 'AUTOCOMPLETE_CACHE_SECONDS', DEFAULT_CACHE_SECONDS),
+)
+
+
+def query_suggestions(prefix, limit):
+    """The limit most common names starting with the normalized prefix, from one query"""
+    rows = (
+        DirectoryEntry.objects
+        .filter(Q(name_text__startswith=prefix) | Q(reversed_name_text__startswith=prefix))
+        .values('name_text')
+        .annotate(count=Count('id'), surname_label=Min('surname'), name_label=Min('name'))
+        .order_by('-count', 'name_text')[:limit]
+    )
+    return [
+        {'name': f"{row['surname_label']} {row['name_label']}".strip(), 'count': row['count']}
+        for row in rows
+    ]
+
+
+def suggestions(query, limit=DEFAULT_LIMIT):
+    """Suggestions for what has been typed so far, from the prefix cache when it has them"""
+    prefix = search_text(query)
+    if not prefix:
+        return []
+    key = (directory_version(), prefix, limit)
+    cached = prefix_cache.get(key)
+    if cached is None:
+        cached = query_suggestions(prefix, limit)
+        prefix_cache.set(key, cached)
+    return cached
@@ -0,0 +1,130 @@
+# Writers used by the Excel importers.
+# ImmediateImportWriter saves every row as soon as it is built (the original behaviour).
+# BulkImportWriter keeps everything in memory and writes it with bulk_create in one transaction.
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from .models import NewPersonalProfile, NewFamilyMember, NumberSequence
+from .directory import add_directory_entries
+from .mobile_utils import mobile_key, load_registered_mobiles
+from .search import update_search_columns
+
+
+class ImportWriter:
+    """Duplicate detection shared by both writers"""
+
+    registered_mobiles = None
+
+    def is_registered(self, mobile):
+        """True if the mobile already has an account, in the database or earlier in this import"""
+        # Every existing mobile is loaded once, instead of several exists() queries per family
+        if self.registered_mobiles is None:
+            self.registered_mobiles = load_registered_mobiles()
+        return mobile_key(mobile) in self.registered_mobiles
+
+    def remember(self, username):
+        # Catches a mobile repeated later in the same sheet before the insert fails
+        if self.registered_mobiles is not None:
+            self.registered_mobiles.add(mobile_key(username))
+
+
+class ImmediateImportWriter(ImportWriter):
+    """Create users, profiles and family members one row at a time"""
+
+    def create_user(self, username, password=None, **fields):
+        # No password means an unusable one: the user activates the account through the OTP login
+        user = User.objects.create_user(username=username, password=password, **fields)
+        self.remember(username)
+        return user
+
+    def create_profile(self, **fields):
+        return NewPersonalProfile.objects.create(**fields)
+
+    def create_member(self, **fields):
+        return NewFamilyMember.objects.create(**fields)
+
+    def pending_count(self):
+        return 0
+
+    def flush(self):
+        return {'users': 0, 'profiles': 0, 'members': 0}
+
+
+class BulkImportWriter(ImportWriter):
+    """Collect users, profiles and family members and write them in batches on flush()"""
+
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self.users = []
+        self.profiles = []
+        self.members = []
+        self.password_hashes = {}
+        self.written = {'users': 0, 'profiles': 0, 'members': 0}
+
+    def create_user(self, username, password=None, **fields):
+        user = User(username=username, **fields)
+        if password is None:
+            # Imported users get no password until they activate through the OTP login, so nothing is hashed
+            user.set_unusable_password()
+        else:
+            # Hash an explicit password once per import, not once per user
+            if password not in self.password_hashes:
+                self.password_hashes[password] = make_password(password)
+            user.password = self.password_hashes[password]
+        self.users.append(user)
+        self.remember(username)
+        return user
+
+    def create_profile(self, **fields):
+        # bulk_create skips save(), which is where canonical_mobile and the search columns are normally filled in
+        profile = NewPersonalProfile(**fields)
+        profile.canonical_mobile = mobile_key(profile.mobileNumber)
+        update_search_columns(profile)
+        self.profiles.append(profile)
+        return profile
+
+    def create_member(self, **fields):
+        member = NewFamilyMember(**fields)
+        member.canonical_mobile = mobile_key(member.mobileNumber)
+        self.members.append(member)
+        return member
+
+    def pending_count(self):
+        return len(self.users) + len(self.profiles) + len(self.members)
+
+    def assign_numbers(self, objects, field, sequence):
+        # bulk_create skips save(), so the whole batch reserves its numbers in one block, committed on
+        # its own so the counter is not locked for the rest of the import (see NumberSequence.reserve)
+        unnumbered = [obj for obj in objects if not getattr(obj, field)]
+        if unnumbered:
+            first = NumberSequence.reserve(sequence, len(unnumbered))
+            for offset, obj in enumerate(unnumbered):
+                setattr(obj, field, first + offset)
+
+    def flush(self):
+        """Write everything collected so far inside a single transaction"""
+        counts = {'users': len(self.users), 'profiles': len(self.profiles), 'members': len(self.members)}
+        self.assign_numbers(self.profiles, 'user_number', 'user_number')
+        self.assign_numbers(self.members, 'member_number', 'member_number')
+        with transaction.atomic():
+            # Users first so the profiles pick up their primary keys, then profiles for the members
+            User.objects.bulk_create(self.users, batch_size=self.batch_size)
+            NewPersonalProfile.objects.bulk_create(self.profiles, batch_size=self.batch_size)
+            NewFamilyMember.objects.bulk_create(self.members, batch_size=self.batch_size)
+            # bulk_create skips the post_save signals that add the directory entries
+            if self.profiles or self.members:
+                add_directory_entries(self.profiles, self.members, batch_size=self.batch_size)
+        for key, count in counts.items():
+            self.written[key] += count
+        self.users = []
+        self.profiles = []
+        self.members = []
+        return counts
+
+
+def get_import_writer(mode):
+    """Return the writer for an upload mode ('bulk', 'stream' or the default row-by-row mode)"""
+    if mode in ('bulk', 'stream'):
+        return BulkImportWriter()
+    return ImmediateImportWriter()
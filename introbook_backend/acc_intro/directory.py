@@ -0,0 +1,206 @@
+# Member-level directory (DirectorySearchView).
+# Most of the community are NewFamilyMember rows, which the family search does not cover. Every
+# person, the head of each family and each member, has a DirectoryEntry with the fields the search
+# filters on (relation, age, city and sakh keys, and the facets of facets.py) and the same
+# search_document/search_key columns as the profiles, all indexed, so a search reads one table and
+# never scans NewFamilyMember.
+#
+# save() of a profile or member updates its entry through the post_save signals below, and deleting
+# one deletes its entry (the foreign keys cascade). bulk_create() and bulk_update() skip the
+# signals, so the bulk import writer adds the entries of what it created (add_directory_entries)
+# and the sync rebuilds the families it changed (rebuild_directory); the rebuild_search_index
+# command rebuilds the whole directory. Each of these also invalidates the cached facet counts and suggestions.
+#
+# A search returns families, each with the people in it that matched, a page of families at a time
+# in profile id order (keyset pagination, see pagination.py): one query for the page of family ids
+# and one for their matching entries with the family joined.
+
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from .facets import invalidate_directory_caches
+from .models import DirectoryEntry, NewFamilyMember, NewPersonalProfile
+from .pagination import decode_cursor, encode_cursor, page_size_from, rows_after
+from .search import get_search_backend, search_document, search_text
+from .serializers import ProfileSummarySerializer
+from .transliteration import phonetic_key
+
+# The relation of the head of a family, the members keep theirs (lowercased)
+HEAD_RELATION = 'self'
+# Query parameters filter_entries() reads
+FILTER_PARAMS = (
+    'q', 'relation', 'min_age', 'max_age', 'city', 'sakh', 'caste', 'education', 'maritalStatus', 'bloodGroup',
+)
+
+
+def entry_fields(person, relation, age):
+    """DirectoryEntry values for a profile or a member"""
+    document = search_document(person)
+    return {
+        'surname': person.surname or '',
+        'name': person.name or '',
+        'gender': person.gender or '',
+        'city': person.city or '',
+        'sakh': person.sakh or '',
+        'relation': (relation or '').strip().lower()[:20],
+        'age': age,
+        'city_key': phonetic_key(search_text(person.city))[:100],
+        'sakh_key': phonetic_key(search_text(person.sakh))[:100],
+        'caste': (person.caste or '').strip(),
+        'education': person.education or '',
+        'maritalStatus': person.maritalStatus or '',
+        'bloodGroup': person.bloodGroup or '',
+        'name_text': search_text(f'{person.surname or ""} {person.name or ""}')[:255],
+        'reversed_name_text': search_text(f'{person.name or ""} {person.surname or ""}')[:255],
+        'search_document': document,
+        'search_key': phonetic_key(document),
+    }
+
+
+def profile_entry_fields(profile):
+    return entry_fields(profile, HEAD_RELATION, profile.age)
+
+
+def member_entry_fields(member):
+    return entry_fields(member, member.relation, member.memberAge)
+
+
+def sync_profile_entry(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    DirectoryEntry.objects.update_or_create(profile=instance, member=None, defaults=profile_entry_fields(instance))
+    invalidate_directory_caches()
+
+
+def sync_member_entry(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    DirectoryEntry.objects.update_or_create(
+        member=instance, defaults={'profile_id': instance.profile_id, **member_entry_fields(instance)}
+    )
+    invalidate_directory_caches()
+
+
+def directory_entries(profiles=(), members=()):
+    """Unsaved DirectoryEntry rows for saved profiles and members"""
+    rows = [DirectoryEntry(profile_id=profile.id, **profile_entry_fields(profile)) for profile in profiles]
+    rows += [
+        DirectoryEntry(profile_id=member.profile_id, member_id=member.id, **member_entry_fields(member))
+        for member in members
+    ]
+    return rows
+
+
+def add_directory_entries(profiles=(), members=(), batch_size=500):
+    """Insert the entries of profiles and members that were just bulk created (they have none yet)"""
+    rows = directory_entries(profiles, members)
+    DirectoryEntry.objects.bulk_create(rows, batch_size=batch_size)
+    invalidate_directory_caches()
+    return len(rows)
+
+
+def rebuild_directory(profile_ids=None, batch_size=500):
+    """Rewrite the entries of the given families (all of them when profile_ids is None), return how many"""
+    profiles = NewPersonalProfile.objects.all()
+    members = NewFamilyMember.objects.all()
+    entries = DirectoryEntry.objects.all()
+    if profile_ids is not None:
+        profile_ids = list(profile_ids)
+        profiles = profiles.filter(id__in=profile_ids)
+        members = members.filter(profile_id__in=profile_ids)
+        entries = entries.filter(profile_id__in=profile_ids)
+
+    rows = directory_entries(profiles.iterator(), members.iterator())
+    with transaction.atomic():
+        entries.delete()
+        DirectoryEntry.objects.bulk_create(rows, batch_size=batch_size)
+    invalidate_directory_caches()
+    return len(rows)
+
+
+def param_values(params, name):
+    """The comma separated values of a query parameter"""
+    return [value.strip() for value in params.get(name, '').split(',') if value.strip()]
+
+
+def filters_from(params):
+    """The FILTER_PARAMS given in params, by name"""
+    return {name: params.get(name) for name in FILTER_PARAMS if params.get(name)}
+
+
+def filter_entries(params, entries=None):
+    """Entries matching ?q=, ?min_age=, ?max_age= and any of the comma separated values of ?relation=,
+    ?city=, ?sakh=, ?caste=, ?education=, ?maritalStatus= and ?bloodGroup=.
+
+    city and sakh are compared as phonetic keys, so 'Surat' also finds 'સુરત'. Raises ValueError for an age
+    that is not a whole number.
+    """
+    entries = DirectoryEntry.objects.all() if entries is None else entries
+    relations = [relation.lower() for relation in param_values(params, 'relation')]
+    if relations:
+        entries = entries.filter(relation__in=relations)
+    for param, lookup in (('min_age', 'age__gte'), ('max_age', 'age__lte')):
+        value = params.get(param)
+        if value in (None, ''):
+            continue
+        try:
+            entries = entries.filter(**{lookup: int(value)})
+        except ValueError:
+            raise ValueError(f'{param} must be a whole number')
+    for param in ('city', 'sakh'):
+        values = param_values(params, param)
+        if values:
+            entries = entries.filter(**{f'{param}_key__in': [phonetic_key(search_text(value)) for value in values]})
+    for param in ('caste', 'education', 'maritalStatus', 'bloodGroup'):
+        values = param_values(params, param)
+        if values:
+            entries = entries.filter(**{f'{param}__in': values})
+    query = params.get('q', '').strip()
+    if query:
+        entries = get_search_backend().filter(entries, query)
+    return entries
+
+
+def entry_data(entry):
+    return {
+        'member_id': entry.member_id,
+        'is_head': entry.member_id is None,
+        'relation': entry.relation,
+        'surname': entry.surname,
+        'name': entry.name,
+        'gender': entry.gender,
+        'age': entry.age,
+        'city': entry.city,
+        'sakh': entry.sakh,
+    }
+
+
+def paginate_families(request, entries):
+    """(families of the requested page, each {'family': summary, 'people': [...]}, cursor of the next page or None)"""
+    page_size = page_size_from(request)
+    family_ids = entries.order_by('profile_id').values_list('profile_id', flat=True).distinct()
+    cursor = request.query_params.get('cursor')
+    if cursor:
+        family_ids = family_ids.filter(rows_after(DirectoryEntry, ('profile_id',), decode_cursor(cursor, 1)))
+    family_ids = list(family_ids[:page_size + 1])
+    next_cursor = encode_cursor([family_ids[page_size - 1]]) if len(family_ids) > page_size else None
+    family_ids = family_ids[:page_size]
+
+    people = (
+        entries.filter(profile_id__in=family_ids)
+        .select_related('profile')
+        .order_by('profile_id', F('member_id').asc(nulls_first=True), 'id')
+    )
+    families = {}
+    for entry in people:
+        if entry.profile_id not in families:
+            families[entry.profile_id] = {'family': ProfileSummarySerializer(entry.profile).data, 'people': []}
+        families[entry.profile_id]['people'].append(entry_data(entry))
+    return list(families.values()), next_cursor
+
+
+def connect_signals():
+    post_save.connect(sync_profile_entry, sender=NewPersonalProfile, dispatch_uid='directory_profile_saved')
+    post_save.connect(sync_member_entry, sender=NewFamilyMember, dispatch_uid='directory_member_saved')
+    post_delete.connect(invalidate_directory_caches, sender=NewPersonalProfile, dispatch_uid='directory_profile_deleted')
+    post_delete.connect(invalidate_directory_caches, sender=NewFamilyMember, dispatch_uid='directory_member_deleted')
@@ -0,0 +1,199 @@
+# Split an uploaded sheet into family blocks in a single pass.
+# A family starts on a row whose first column (the પોતે name) is filled; the rows below it with
+# an empty first column belong to the same family. Sheets that repeat the name on every row of the
+# family are handled too, because a block only ends when the first column changes to a new name.
+
+import math
+import re
+import pandas as pd
+from openpyxl import load_workbook
+
+MOBILE_COLUMNS = [7, 8, 9, 10]  # મોબાઇલ નંબર and the columns next to it that sometimes hold it
+MIN_COLUMNS = 11  # નામ ... સરનામું
+DEFAULT_PRIORITY_RELATIONS = ['પુત્ર', 'પત્ની']  # son, wife
+
+
+def normalize_mobile_column(column):
+    """Turn a sheet column into clean mobile strings ('' where the cell is not a mobile number)"""
+    # Excel stores most numbers as floats (9.327015e+09), so convert whole numbers back to digits
+    numbers = pd.to_numeric(column, errors='coerce')
+    whole_numbers = numbers[numbers.notna() & (numbers == numbers.round())]
+    text = column.astype(str).str.strip().str.replace(r'[\s\-+()]', '', regex=True)
+    cleaned = text.where(text.str.isdigit(), '')
+    cleaned.loc[whole_numbers.index] = whole_numbers.astype('int64').astype(str)
+    return cleaned.where(cleaned.str.len() >= 10, '')
+
+
+def normalize_mobile(value):
+    """Clean a single mobile cell with the same rules as normalize_mobile_column"""
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = None
+    if number is not None and math.isfinite(number) and number == round(number):
+        text = str(int(number))
+    else:
+        text = re.sub(r'[\s\-+()]', '', str(value).strip())
+        if not text.isdigit():
+            return ''
+    return text if len(text) >= 10 else ''
+
+
+def normalize_text_column(column):
+    """Strip a text column and turn NaN into ''"""
+    return column.astype(str).str.strip().where(column.notna(), '')
+
+
+def row_mobiles(df):
+    """First mobile number found in columns 7-10 of every row"""
+    mobiles = pd.Series('', index=df.index)
+    for col_idx in reversed(MOBILE_COLUMNS):
+        if col_idx < df.shape[1]:
+            column = normalize_mobile_column(df.iloc[:, col_idx])
+            mobiles = column.where(column != '', mobiles)
+    return mobiles
+
+
+def relation_ranks(relations, is_head, priority_relations, self_first):
+    """Rank every row as a main-user candidate: lower is better, None means never"""
+    is_self = relations.str.contains('પોતે', regex=False)
+    ranks = pd.Series(len(priority_relations) + 1, index=relations.index, dtype='float64')
+    # Walk the list backwards so the first matching priority relation wins
+    for position in reversed(range(len(priority_relations))):
+        matches = relations.str.contains(priority_relations[position], regex=False)
+        ranks = ranks.mask(matches, position + 1)
+    ranks = ranks.mask(is_self & ~is_head)
+    if self_first:
+        ranks = ranks.mask(is_head, 0)
+    return ranks
+
+
+def partition_families(df, priority_relations=None, self_first=True):
+    """Group the sheet into families and pick the main mobile of each one.
+
+    Returns a list of dicts with the family's main_name, start_index (0-based data row, so the
+    Excel row is start_index + 2), its rows (plain tuples), the per-row mobiles, and
+    main_pos / main_mobile for the row that should become the main user (main_pos is None
+    when nobody in the family has a mobile number).
+    """
+    if priority_relations is None:
+        priority_relations = DEFAULT_PRIORITY_RELATIONS
+    df = df.reset_index(drop=True)
+    for col_idx in range(df.shape[1], MIN_COLUMNS):
+        df[f'extra_{col_idx}'] = None
+
+    # Blank separator rows carry nothing, so drop them before grouping
+    df = df[df.notna().any(axis=1)]
+    sheet_rows = df.index
+    df = df.reset_index(drop=True)
+    heads = normalize_text_column(df.iloc[:, 0])
+    has_head = (heads != '') & (heads != 'nan')
+    previous_head = heads.where(has_head).ffill().shift()
+    family_ids = (has_head & (heads != previous_head)).cumsum()
+
+    relations = normalize_text_column(df.iloc[:, 2])
+    mobiles = row_mobiles(df)
+    is_head = has_head & (heads != previous_head)
+    ranks = relation_ranks(relations, is_head, priority_relations, self_first)
+
+    # Best candidate per family: lowest rank, then the earliest row
+    candidates = pd.DataFrame({'family': family_ids, 'rank': ranks, 'mobile': mobiles})
+    candidates = candidates[(candidates['family'] > 0) & (candidates['mobile'] != '') & candidates['rank'].notna()]
+    candidates = candidates.sort_values(['family', 'rank'], kind='stable')
+    best = candidates.groupby('family').head(1)
+    main_rows = dict(zip(best['family'], best.index))
+
+    families = []
+    current = None
+    for position, (family_id, row) in enumerate(zip(family_ids, df.itertuples(index=False, name=None))):
+        if family_id == 0:
+            continue  # Rows before the first family
+        if current is None or current['family_id'] != family_id:
+            current = {
+                'family_id': family_id,
+                'main_name': heads.iloc[position],
+                'start_index': int(sheet_rows[position]),
+                'rows': [],
+                'mobiles': [],
+                'main_pos': None,
+                'main_mobile': '',
+            }
+            families.append(current)
+        if main_rows.get(family_id) == position:
+            current['main_pos'] = len(current['rows'])
+            current['main_mobile'] = mobiles.iloc[position]
+        current['rows'].append(row)
+        current['mobiles'].append(mobiles.iloc[position])
+    return families
+
+
+def choose_main(family, priority_relations, self_first):
+    """Pick the main row of one family with the same ranking as relation_ranks"""
+    best_rank = None
+    for position, (row, mobile) in enumerate(zip(family['rows'], family['mobiles'])):
+        if not mobile:
+            continue
+        relation = str(row[2]).strip() if row[2] is not None else ''
+        if position == 0 and self_first:
+            rank = 0
+        elif 'પોતે' in relation and position != 0:
+            continue
+        else:
+            rank = len(priority_relations) + 1
+            for priority_position, priority_rel in enumerate(priority_relations):
+                if priority_rel in relation:
+                    rank = priority_position + 1
+                    break
+        if best_rank is None or rank < best_rank:
+            best_rank = rank
+            family['main_pos'] = position
+            family['main_mobile'] = mobile
+    return family
+
+
+def stream_families(source, priority_relations=None, self_first=True):
+    """Yield the same family dicts as partition_families while reading the workbook row by row.
+
+    The workbook is opened read-only, so only the current family is kept in memory and each
+    family is yielded as soon as the next one starts.
+    """
+    if priority_relations is None:
+        priority_relations = DEFAULT_PRIORITY_RELATIONS
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]  # pd.read_excel reads the first sheet too
+        current = None
+        for position, row in enumerate(sheet.iter_rows(min_row=2, values_only=True)):
+            if all(value is None for value in row):
+                continue  # Blank separator rows, and the formatted empty rows some sheets end with
+            if len(row) < MIN_COLUMNS:
+                row = tuple(row) + (None,) * (MIN_COLUMNS - len(row))
+            head = str(row[0]).strip() if row[0] is not None else ''
+            if head and (current is None or head != current['main_name']):
+                if current is not None:
+                    yield choose_main(current, priority_relations, self_first)
+                current = {
+                    'family_id': current['family_id'] + 1 if current else 1,
+                    'main_name': head,
+                    'start_index': position,
+                    'rows': [],
+                    'mobiles': [],
+                    'main_pos': None,
+                    'main_mobile': '',
+                }
+            if current is None:
+                continue  # Rows before the first family
+            mobile = ''
+            for col_idx in MOBILE_COLUMNS:
+                if col_idx < len(row):
+                    mobile = normalize_mobile(row[col_idx])
+                    if mobile:
+                        break
+            current['rows'].append(row)
+            current['mobiles'].append(mobile)
+        if current is not None:
+            yield choose_main(current, priority_relations, self_first)
+    finally:
+        workbook.close()
@@ -0,0 +1,252 @@
+# Name, address and date parsers shared by the Excel importers.
+# The same surnames, addresses and dates repeat on many rows of a sheet (a whole family usually
+# shares one address), so every parser works on the cell text and caches the result in a bounded
+# LRU cache. The *_column functions parse a whole pandas column by parsing each distinct value once.
+
+import re
+from datetime import date, datetime
+from functools import lru_cache
+import pandas as pd
+
+COMMON_SURNAMES = frozenset(['પટેલ', 'શાહ', 'દવે', 'જોશી', 'મહેતા', 'પરમાર', 'ઠાકોર', 'વ્યાસ', 'ત્રિવેદી', 'ચૌધરી'])
+# Tried in this order, like the old prefix loop (so 'ગં.સ્વ.' leaves the trailing '.' behind)
+NAME_PREFIX_RE = re.compile(r'^(?:સ્વ\.|ગં\.સ્વ|સ્વ|ગં\.સ્વ\.)')
+DATE_FORMATS = {'slash': '%d/%m/%Y', 'dash': '%d-%m-%Y', 'iso': '%Y-%m-%d'}
+
+NAME_CACHE_SIZE = 8192
+ADDRESS_CACHE_SIZE = 4096
+DATE_CACHE_SIZE = 4096
+
+
+def cell_text(value):
+    """Stripped text of a cell, or None for empty cells (None, NaN, '')"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    if not value:
+        return None
+    return str(value).strip()
+
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def _parse_name_text(name):
+    parts = name.split()
+
+    if len(parts) < 2:
+        return parts[0] if parts else '', '', '', ''
+
+    sakh = parts[-1]    # ભોજાવત (last word)
+
+    if parts[0] in COMMON_SURNAMES:
+        # Has explicit surname: પટેલ સ્વ. અમરતલાલ નારણદાસ ભોજાવત
+        surname = parts[0]
+    else:
+        # No explicit surname: રમાબેન અમરતલાલ ભોજાવત - use sakh as surname
+        surname = sakh
+
+    # Handle સ્વ. prefix
+    if 'સ્વ' in name:
+        sv_index = -1
+        for i, part in enumerate(parts):
+            if 'સ્વ' in part:
+                sv_index = i
+                break
+
+        if sv_index >= 0 and sv_index + 1 < len(parts):
+            # Name is સ્વ. + next word, father name is the word after it (if it is not the sakh)
+            parsed_name = f"સ્વ. {parts[sv_index + 1]}"
+            father_name = parts[sv_index + 2] if sv_index + 2 < len(parts) - 1 else ''
+        else:
+            parsed_name = 'સ્વ.'
+            father_name = ''
+    elif parts[0] in COMMON_SURNAMES:
+        # Has surname: પટેલ રમાબેન અમરતલાલ ભોજાવત
+        parsed_name = parts[1]
+        father_name = parts[2] if len(parts) > 2 else ''
+    else:
+        # No surname: રમાબેન અમરતલાલ ભોજાવત
+        parsed_name = parts[0]
+        father_name = parts[1]
+
+    return surname, parsed_name, father_name, sakh
+
+
+def parse_name(full_name):
+    """Parse Gujarati name: પટેલ સ્વ. અમરતલાલ નારણદાસ ભોજાવત or રમાબેન અમરતલાલ ભોજાવત
+
+    Returns (surname, name, father_name, sakh).
+    """
+    name = cell_text(full_name)
+    if name is None:
+        return '', '', '', ''
+    return _parse_name_text(name)
+
+
+@lru_cache(maxsize=NAME_CACHE_SIZE)
+def _parse_gujarati_name_text(name):
+    # Remove prefixes like સ્વ., ગં.સ્વ
+    name = NAME_PREFIX_RE.sub('', name, count=1).strip()
+
+    parts = name.split()
+    if len(parts) == 0:
+        return '', ''
+    elif len(parts) == 1:
+        return parts[0], parts[0]  # surname and sakh same
+    # Last word is sakh, first word is surname
+    return parts[0], parts[-1]
+
+
+def parse_gujarati_name(full_name):
+    """Parse Gujarati name to extract (surname, sakh)"""
+    name = cell_text(full_name)
+    if name is None:
+        return '', ''
+    return _parse_gujarati_name_text(name)
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def _parse_address_text(address):
+    if not address or address == 'nan':
+        return '', '', ''
+
+    # If no comma, treat entire address as address details
+    if ',' not in address:
+        return address, '', ''
+
+    parts = [part.strip() for part in address.split(',')]
+    parts = [part for part in parts if part]  # Remove empty parts
+
+    if len(parts) == 0:
+        return '', '', ''
+    elif len(parts) == 1:
+        return parts[0], '', ''
+    elif len(parts) == 2:
+        return parts[0], parts[1], ''
+    city = parts[-1]  # Last part as city
+    area = parts[-2]  # Second to last as area
+    return ', '.join(parts[:-2]), area, city
+
+
+def parse_address(full_address):
+    """પાર્સ અડ્રેસ: વ, નીશીથ એપર્ટમેન્ટ, જયહિન્દ ચાર રસ્તા, મણીનગર, અમદાવાદ
+
+    Returns (address_details, area, city); empty parts are dropped and a two part address is
+    read as details and area.
+    """
+    address = cell_text(full_address)
+    if address is None:
+        return '', '', ''
+    return _parse_address_text(address)
+
+
+@lru_cache(maxsize=ADDRESS_CACHE_SIZE)
+def _split_address_text(address):
+    parts = [part.strip() for part in address.split(',')]
+
+    if len(parts) < 2:
+        return address, '', ''
+
+    city = parts[-1]  # અમદાવાદ (last part)
+    area = parts[-2]  # મણીનગર (second to last)
+    return ', '.join(parts[:-2]), area, city
+
+
+def split_address(full_address):
+    """Split an address into (address_details, area, city), always reading the last two parts as area and city"""
+    address = cell_text(full_address)
+    if address is None:
+        return '', '', ''
+    return _split_address_text(address)
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def _parse_date_text(date_str):
+    if not date_str or date_str == 'nan':
+        return None
+
+    try:
+        # Handle datetime objects from pandas
+        if ' ' in date_str and ':' in date_str:
+            return datetime.strptime(date_str.split(' ')[0], DATE_FORMATS['iso']).date()
+        elif '/' in date_str:
+            return datetime.strptime(date_str, DATE_FORMATS['slash']).date()
+        elif '-' in date_str and len(date_str.split('-')[0]) <= 2:
+            return datetime.strptime(date_str, DATE_FORMATS['dash']).date()
+        elif '-' in date_str:
+            return datetime.strptime(date_str, DATE_FORMATS['iso']).date()
+    except ValueError:
+        print(f"Could not parse date: {date_str}")
+        return None
+
+    return None
+
+
+def parse_date(date_str):
+    """Parse date from various formats to a date (None if it cannot be parsed)"""
+    text = cell_text(date_str)
+    if text is None:
+        return None
+    return _parse_date_text(text)
+
+
+def calculate_age(birth_date):
+    """Calculate age from birth date"""
+    if not birth_date:
+        return None  # No age if no birth date
+
+    try:
+        today = date.today()
+        age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+        return max(age, 1)  # Minimum age 1
+    except Exception:
+        return None  # No age if calculation fails
+
+
+def parse_column(column, parser, columns=None):
+    """Apply a parser to a whole column, calling it once per distinct value.
+
+    Returns a Series when columns is None, otherwise a DataFrame with one column per item of the
+    tuples the parser returns.
+    """
+    codes, uniques = pd.factorize(column)
+    # factorize() gives empty cells the code -1, so the last entry holds the parsed empty value
+    parsed = [parser(value) for value in uniques] + [parser(None)]
+    results = [parsed[code] for code in codes]
+    if columns is None:
+        return pd.Series(results, index=column.index, dtype=object)
+    return pd.DataFrame(results, index=column.index, columns=columns)
+
+
+def parse_name_column(column):
+    return parse_column(column, parse_name, ['surname', 'name', 'father_name', 'sakh'])
+
+
+def parse_gujarati_name_column(column):
+    return parse_column(column, parse_gujarati_name, ['surname', 'sakh'])
+
+
+def parse_address_column(column):
+    return parse_column(column, parse_address, ['address', 'area', 'city'])
+
+
+def split_address_column(column):
+    return parse_column(column, split_address, ['address', 'area', 'city'])
+
+
+def parse_date_column(column):
+    return parse_column(column, parse_date)
+
+
+def parsing_caches():
+    """The LRU caches behind the parsers, by name (for cache_info() and cache_clear())"""
+    return {
+        'name': _parse_name_text,
+        'gujarati_name': _parse_gujarati_name_text,
+        'address': _parse_address_text,
+        'split_address': _split_address_text,
+        'date': _parse_date_text,
+    }
+
+
+def clear_parsing_caches():
+    for cache in parsing_caches().values():
+        cache.cache_clear()
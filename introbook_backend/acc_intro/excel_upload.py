@@ -1,139 +1,321 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
-from django.contrib.auth.models import User
-from .models import NewPersonalProfile, NewFamilyMember
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from .models import NewPersonalProfile, ImportJob
+from .serializers import ImportJobSerializer
+from .bulk_import import get_import_writer
+from .excel_families import partition_families, stream_families
+from .import_jobs import fail_stale_jobs, start_import_job
+from .excel_parsing import parse_name, parse_address, parse_date, calculate_age
+from .import_sync import assign_source_keys, sync_family_records
 import pandas as pd
-from datetime import datetime
 
-def parse_name(full_name):
-    """Parse Gujarati name: પટેલ સ્વ. અમરતલાલ નારણદાસ ભોજાવત or રમાબેન અમરતલાલ ભોજાવત"""
-    if not full_name or pd.isna(full_name):
-        return '', '', '', ''
+# Map both Gujarati and English relations to English
+RELATION_MAPPING = {
+    # Gujarati relations
+    'પુત્ર': 'son',
+    'પુત્રી': 'daughter', 
+    'પત્ની': 'spouse',
+    'પતિ': 'spouse',
+    'પિતા': 'father',
+    'માતા': 'mother',
+    'ભાઈ': 'brother',
+    'ભાઇ': 'brother',
+    'બહેન': 'sister',
+    'દાદા': 'grandfather',
+    'દાદી': 'grandmother',
+    'નાના': 'uncle',
+    'નાની': 'aunt',
+    'પૌત્ર': 'grandson',
+    'પૌત્રી': 'granddaughter',
+    'પુત્રવધુ': 'daughter_in_law',
+    # English relations
+    'son': 'son',
+    'daughter': 'daughter',
+    'spouse': 'spouse',
+    'wife': 'spouse',
+    'husband': 'spouse',
+    'father': 'father',
+    'mother': 'mother',
+    'brother': 'brother',
+    'sister': 'sister',
+    'grandfather': 'grandfather',
+    'grandmother': 'grandmother',
+    'uncle': 'uncle',
+    'aunt': 'aunt',
+    'grandson': 'grandson',
+    'granddaughter': 'granddaughter',
+    'daughter_in_law': 'daughter_in_law'
+}
+
+def map_marital_status(marital_status):
+    """Map the Excel marital status (Gujarati or English) to the model choices"""
+    if marital_status and ('પરણીત' in marital_status or 'married' in marital_status.lower()):
+        return 'married'
+    if marital_status and ('વિધવા' in marital_status or 'widowed' in marital_status.lower()):
+        return 'widowed'
+    if marital_status and ('અપરણીત' in marital_status or 'single' in marital_status.lower() or 'unmarried' in marital_status.lower()):
+        return 'unmarried'
+    if not marital_status or marital_status.strip() == '':
+        return 'single'
+    return marital_status.lower()
+
+def build_family_record(family):
+    """Parse one family block into plain dicts for the main user, profile and family members.
+
+    Does not touch the database, so it can run in worker processes. Returns None when nobody
+    in the family has a mobile number.
+    """
+    rows = family['rows']
+    row = rows[0]
+    current_main = family['main_name']
+    main_pos = family['main_pos']
     
-    name = str(full_name).strip()
-    parts = name.split()
+    # No one in the family has a mobile number
+    if main_pos is None:
+        print(f"પોતે {current_main} has no mobile, looking for family member...")
+        print(f"No valid mobile found for family of {current_main}, skipping this family")
+        return None
+    
+    # Main mobile was picked for the whole sheet up front (પોતે first, then પુત્ર, પત્ની, others)
+    main_mobile = family['main_mobile']
+    main_row_to_use = rows[main_pos]
+    main_name_to_use = current_main
+    selected_relation = 'પોતે'
+    if main_pos != 0:
+        print(f"પોતે {current_main} has no mobile, looking for family member...")
+        main_name_to_use = str(main_row_to_use[1]).strip()
+        selected_relation = str(main_row_to_use[2]).strip() if not pd.isna(main_row_to_use[2]) else ''
+        print(f"Making {main_name_to_use} ({selected_relation}) the main user with mobile: {main_mobile}")
     
-    if len(parts) < 2:
-        return parts[0] if parts else '', '', '', ''
+    # Parse name and address for the selected main user
+    surname, parsed_name, father_name, sakh = parse_name(main_name_to_use)
+    birthdate = parse_date(main_row_to_use[3])
+    blood_group = str(main_row_to_use[4]).strip() if not pd.isna(main_row_to_use[4]) else ''
+    marital_status = str(main_row_to_use[5]).strip() if not pd.isna(main_row_to_use[5]) else ''
+    sakh_from_excel = str(main_row_to_use[6]).strip() if not pd.isna(main_row_to_use[6]) else sakh
+    education = str(main_row_to_use[8]).strip() if not pd.isna(main_row_to_use[8]) else ''
+    occupation = str(main_row_to_use[9]).strip() if not pd.isna(main_row_to_use[9]) else ''
+    full_address = str(main_row_to_use[10]) if not pd.isna(main_row_to_use[10]) else ''
+    address_details, area, city = parse_address(full_address)
+    print(f"Main user address parsed: '{full_address}' -> '{address_details}', '{area}', '{city}'")
     
-    sakh = parts[-1]    # ભોજાવત (last word)
+    # If main user has no address, use original પોતે's address
+    if main_pos != 0 and (not address_details or address_details.strip() == ''):
+        original_address = str(row[10]) if not pd.isna(row[10]) else ''
+        address_details, area, city = parse_address(original_address)
     
-    # Check if first word is a surname (like પટેલ, શાહ, etc.) or a name
-    # Common Gujarati surnames: પટેલ, શાહ, દવે, જોશી, etc.
-    common_surnames = ['પટેલ', 'શાહ', 'દવે', 'જોશી', 'મહેતા', 'પરમાર', 'ઠાકોર', 'વ્યાસ', 'ત્રિવેદી', 'ચૌધરી']
+    record = {
+        'main_name': main_name_to_use,
+        'mobile': main_mobile,
+        'start_index': family['start_index'],
+        'user': {
+            'first_name': parsed_name[:30] if parsed_name else '',
+            'last_name': surname[:30] if surname else ''
+        },
+        'profile': {
+            'surname': surname,
+            'name': parsed_name,
+            'fatherName': father_name,
+            'sakh': sakh_from_excel,
+            'age': calculate_age(birthdate),
+            'dateOfBirth': birthdate,
+            'bloodGroup': blood_group,
+            'maritalStatus': map_marital_status(marital_status),
+            'education': education,
+            'occupation': occupation,
+            'email': f"{main_mobile}@temp.com",
+            'mobileNumber': main_mobile,
+            'address': address_details,
+            'area': area,
+            'city': city,
+            'password_change_required': True
+        },
+        'members': []
+    }
     
-    if parts[0] in common_surnames:
-        # Has explicit surname: પટેલ સ્વ. અમરતલાલ નારણદાસ ભોજાવત
-        surname = parts[0]
-    else:
-        # No explicit surname: રમાબેન અમરતલાલ ભોજાવત - use sakh as surname
-        surname = sakh
+    # Address family members inherit when their own cell is empty
+    inherited_address, inherited_area, inherited_city = address_details, area, city
     
-    # Handle સ્વ. prefix
-    if 'સ્વ.' in name or 'સ્વ' in name:
-        # Find સ્વ. and get the name after it
-        sv_index = -1
-        for i, part in enumerate(parts):
-            if 'સ્વ' in part:
-                sv_index = i
-                break
+    # If a family member became main, add original પોતે as family member
+    if main_pos != 0:
+        original_surname, original_name, original_father, original_sakh = parse_name(current_main)
         
-        if sv_index >= 0 and sv_index + 1 < len(parts):
-            # Name is સ્વ. + next word
-            parsed_name = f"સ્વ. {parts[sv_index + 1]}"
-            # Father name is the word after name (if exists)
-            father_name = parts[sv_index + 2] if sv_index + 2 < len(parts) - 1 else ''
-        else:
-            parsed_name = 'સ્વ.'
-            father_name = ''
-    else:
-        # No સ્વ., normal parsing
-        if parts[0] in common_surnames:
-            # Has surname: પટેલ રમાબેન અમરતલાલ ભોજાવત
-            parsed_name = parts[1] if len(parts) > 1 else ''
-            father_name = parts[2] if len(parts) > 2 else ''
+        # Get original પોતે's address from his own row
+        original_address = str(row[10]) if not pd.isna(row[10]) else ''
+        original_address_details, original_area, original_city = parse_address(original_address)
+        print(f"Original પોતે address parsed: '{original_address}' -> '{original_address_details}', '{original_area}', '{original_city}'")
+        
+        # If original પોતે address is empty, use main user's address
+        if not original_address_details and not original_area and not original_city:
+            original_address_details, original_area, original_city = address_details, area, city
+            print(f"Original પોતે had no address, using main user's address: '{address_details}', '{area}', '{city}'")
         else:
-            # No surname: રમાબેન અમરતલાલ ભોજાવત
-            parsed_name = parts[0]
-            father_name = parts[1] if len(parts) > 1 else ''
-    
-    return surname, parsed_name, father_name, sakh
-
-def parse_address(full_address):
-    """પાર્સ અડ્રેસ: વ, નીશીથ એપર્ટમેન્ટ, જયહિન્દ ચાર રસ્તા, મણીનગર, અમદાવાદ"""
-    if not full_address or pd.isna(full_address) or str(full_address).strip() == 'nan':
-        return '', '', ''
-    
-    address = str(full_address).strip()
-    if not address:
-        return '', '', ''
-    
-    # If no comma, treat entire address as address details
-    if ',' not in address:
-        return address, '', ''
+            print(f"Using original પોતે's address: '{original_address_details}', '{original_area}', '{original_city}'")
+        original_birthdate = parse_date(row[3])
+        
+        # Determine relation of original પોતે to the new main user
+        original_relation = 'other'  # Default
+        
+        if 'પુત્ર' in selected_relation:  # If son became main, original is father
+            original_relation = 'father'
+        elif 'પત્ની' in selected_relation:  # If wife became main, original is husband
+            original_relation = 'spouse'
+        elif 'પુત્રી' in selected_relation:  # If daughter became main, original is father
+            original_relation = 'father'
+        elif 'પિતા' in selected_relation:  # If father became main, original is son
+            original_relation = 'son'
+        elif 'માતા' in selected_relation:  # If mother became main, original is son
+            original_relation = 'son'
+        
+        # Family member for original પોતે
+        record['members'].append({
+            'surname': original_surname,
+            'name': original_name,
+            'fatherName': original_father,
+            'sakh': original_sakh,
+            'memberAge': calculate_age(original_birthdate),
+            'dateOfBirth': original_birthdate,
+            'relation': original_relation,
+            'email': '',
+            'mobileNumber': '',  # Original had no mobile
+            'address': original_address_details,
+            'area': original_area,
+            'city': original_city
+        })
+        
+        print(f"Added original પોતે {original_surname} {original_name} as {original_relation} - Address: '{original_address_details}', '{original_area}', '{original_city}'")
+        inherited_address, inherited_area, inherited_city = original_address_details, original_area, original_city
+    print(f"Stored address for inheritance: '{inherited_address}', '{inherited_area}', '{inherited_city}'")
     
-    parts = [part.strip() for part in address.split(',')]
-    parts = [part for part in parts if part]  # Remove empty parts
+    # Process family members (skip the main row and whoever became the main user)
+    for pos in range(1, len(rows)):
+        member_row = rows[pos]
+        member_name = str(member_row[1]).strip() if not pd.isna(member_row[1]) else ''
+        relation = str(member_row[2]).strip() if not pd.isna(member_row[2]) else ''
+        if pos == main_pos or not member_name or not relation or relation == 'પોતે':
+            continue
+        try:
+            surname, parsed_name, father_name, sakh = parse_name(member_name)
+            birthdate = parse_date(member_row[3])
+            blood_group = str(member_row[4]).strip() if not pd.isna(member_row[4]) else ''
+            marital_status = str(member_row[5]).strip() if not pd.isna(member_row[5]) and str(member_row[5]).strip() else ''
+            sakh_from_excel = str(member_row[6]).strip() if not pd.isna(member_row[6]) else sakh
+            education = str(member_row[8]).strip() if not pd.isna(member_row[8]) else ''
+            occupation = str(member_row[9]).strip() if not pd.isna(member_row[9]) else ''
+            full_address = str(member_row[10]) if not pd.isna(member_row[10]) else ''
+            address_details, area, city = parse_address(full_address)
+            # If family member has empty address, inherit from original પોતે
+            if not full_address or full_address.strip() == '' or full_address == 'nan':
+                address_details, area, city = inherited_address, inherited_area, inherited_city
+            
+            # Mobile numbers were cleaned for the whole sheet, '' when not valid (no dummy numbers)
+            member_mobile = family['mobiles'][pos]
+            
+            # Adjust relation based on who became the main member
+            adjusted_relation = relation
+            
+            # If son became main, adjust all relations relative to son
+            if 'પુત્ર' in selected_relation:
+                if relation == 'પત્ની' or relation == 'wife':  # Wife of original becomes mother
+                    adjusted_relation = 'માતા'
+                elif relation == 'પુત્રી' or relation == 'daughter':  # Daughter becomes sister
+                    adjusted_relation = 'બહેન'
+                elif relation == 'ભાઈ' or relation == 'brother':  # Brother becomes brother (stays same)
+                    adjusted_relation = 'brother'
+                elif 'પુત્રવધુ' in relation:  # Daughter-in-law becomes wife
+                    adjusted_relation = 'પત્ની'
+                elif relation == 'પૌત્રી' or relation == 'granddaughter':  # Granddaughter becomes daughter
+                    adjusted_relation = 'પુત્રી'
+                elif relation == 'પૌત્ર' or relation == 'grandson':  # Grandson becomes son
+                    adjusted_relation = 'પુત્ર'
+            
+            # Try exact match first, then partial match for Gujarati relations
+            english_relation = RELATION_MAPPING.get(adjusted_relation, None)
+            if not english_relation:
+                # Try partial matching for common variations
+                for gujarati_rel, english_rel in RELATION_MAPPING.items():
+                    if gujarati_rel in adjusted_relation or adjusted_relation in gujarati_rel:
+                        english_relation = english_rel
+                        break
+                if not english_relation:
+                    english_relation = 'other'
+            
+            if adjusted_relation != relation:
+                print(f"Relation adjusted: {relation} -> {adjusted_relation} -> {english_relation}")
+            
+            record['members'].append({
+                'surname': surname,
+                'name': parsed_name,
+                'fatherName': father_name,
+                'sakh': sakh_from_excel,
+                'memberAge': calculate_age(birthdate),
+                'dateOfBirth': birthdate,
+                'bloodGroup': blood_group,
+                'maritalStatus': map_marital_status(marital_status),
+                'education': education,
+                'occupation': occupation,
+                'relation': english_relation,
+                'email': f"{member_mobile}@temp.com" if member_mobile else '',
+                'mobileNumber': member_mobile,
+                'address': address_details,
+                'area': area,
+                'city': city
+            })
+            
+        except Exception as e:
+            print(f"Error parsing family member {member_name}: {e}")
+            continue
     
-    if len(parts) == 1:
-        return parts[0], '', ''
-    elif len(parts) == 2:
-        return parts[0], parts[1], ''
-    else:
-        city = parts[-1]  # Last part as city
-        area = parts[-2]  # Second to last as area
-        address_details = ', '.join(parts[:-2])  # Rest as address details
-        return address_details, area, city
+    # Source keys and content hashes let a later re-upload (mode=sync) update only what changed
+    return assign_source_keys(record)
 
-def parse_date(date_str):
-    """Parse date from various formats to YYYY-MM-DD"""
-    if not date_str or pd.isna(date_str):
-        return None
+def save_family_record(record, writer):
+    """Create the user, profile and family members of a parsed family.
+
+    Returns 'created', or 'skipped' when the mobile is already registered (existing data is
+    preserved), or 'error' when the main user could not be created.
+    """
+    main_mobile = record['mobile']
     
-    date_str = str(date_str).strip()
-    if not date_str or date_str == 'nan':
-        return None
+    # Existing mobiles (and the ones created earlier in this sheet) are checked in memory - PRESERVE EXISTING DATA
+    if writer.is_registered(main_mobile):
+        print(f"✓ PRESERVING: User with mobile {main_mobile} already exists, keeping existing data intact")
+        print(f"✓ SKIPPED: {record['main_name']} (mobile: {main_mobile}) - preserving existing data")
+        return 'skipped'
     
     try:
-        # Handle datetime objects from pandas
-        if ' ' in date_str and ':' in date_str:
-            date_obj = datetime.strptime(date_str.split(' ')[0], '%Y-%m-%d')
-            return date_obj.date()
-        # Try DD/MM/YYYY format
-        elif '/' in date_str:
-            date_obj = datetime.strptime(date_str, '%d/%m/%Y')
-            return date_obj.date()
-        # Try DD-MM-YYYY format
-        elif '-' in date_str and len(date_str.split('-')[0]) <= 2:
-            date_obj = datetime.strptime(date_str, '%d-%m-%Y')
-            return date_obj.date()
-        # Try YYYY-MM-DD format
-        elif '-' in date_str:
-            date_obj = datetime.strptime(date_str, '%Y-%m-%d')
-            return date_obj.date()
-    except ValueError:
-        print(f"Could not parse date: {date_str}")
-        return None
+        user = writer.create_user(username=main_mobile, **record['user'])
+        profile = writer.create_profile(user=user, **record['profile'])
+        print(f"✓ CREATED: New user #{profile.user_number or '(numbered on flush)'} - {profile.surname} {profile.name} (mobile: {main_mobile})")
+    except Exception as e:
+        print(f"Error creating user for {record['main_name']}: {e}")
+        return 'error'
     
-    return None
-
-def calculate_age(birth_date):
-    """Calculate age from birth date"""
-    if not birth_date:
-        return None  # No age if no birth date
+    for member in record['members']:
+        try:
+            writer.create_member(profile=profile, **member)
+            print(f"Added {member['name']} with address: {member['address']}")
+        except Exception as e:
+            print(f"Error creating family member {member['name']}: {e}")
+            continue
     
-    try:
-        from datetime import date
-        today = date.today()
-        age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
-        return max(age, 1)  # Minimum age 1
-    except:
-        return None  # No age if calculation fails
+    return 'created'
 
 class UploadExcelView(APIView):
     permission_classes = [AllowAny]
     
+    def import_family(self, family, writer):
+        """Parse and save one family block: 'created', 'skipped', 'invalid' (no mobile) or 'error'"""
+        try:
+            record = build_family_record(family)
+        except Exception as e:
+            print(f"Error processing family starting at row {family['start_index']}: {e}")
+            return 'error'
+        if record is None:
+            return 'invalid'
+        return save_family_record(record, writer)
+    
     def post(self, request):
         try:
             if 'file' not in request.FILES:
@@ -143,395 +325,67 @@ class UploadExcelView(APIView):
             if not uploaded_file.name.endswith('.xlsx'):
                 return Response({'success': False, 'error': 'Only .xlsx files are allowed'}, status=400)
             
-            df = pd.read_excel(uploaded_file)
+            # mode=bulk builds every row in memory and writes it with bulk_create at the end,
+            # mode=stream reads the workbook row by row and writes each batch as soon as it fills up,
+            # mode=background saves the file and imports it on a worker thread (poll import-jobs/<id>/),
+            # mode=sync updates the families imported earlier from the same sheet in place
+            mode = request.data.get('mode') or request.query_params.get('mode') or 'standard'
+            
+            if mode == 'background':
+                # Only the uploader (and staff) can poll the job, so it needs one
+                if not request.user.is_authenticated:
+                    return Response({'success': False, 'error': 'Log in to run a background import'}, status=401)
+                job = ImportJob.objects.create(
+                    file=uploaded_file,
+                    original_name=uploaded_file.name,
+                    uploaded_by=request.user
+                )
+                start_import_job(job)
+                print(f"Queued import job #{job.id} for {uploaded_file.name}")
+                return Response({
+                    'success': True,
+                    'mode': mode,
+                    'job_id': job.id,
+                    'status': job.status,
+                    'message': f'Excel upload accepted, import job #{job.id} is running in the background'
+                }, status=202)
+            
+            if mode == 'sync':
+                return self.sync_upload(uploaded_file)
+            
+            writer = get_import_writer(mode)
+            
             records_created = 0
             records_skipped = 0
             
-            print(f"\n=== EXCEL UPLOAD - PRESERVING EXISTING DATA ===")
+            print(f"\n=== EXCEL UPLOAD - PRESERVING EXISTING DATA ({mode} mode) ===")
             print(f"Current database has {NewPersonalProfile.objects.count()} existing users")
-            print(f"Excel file has {len(df)} rows to process")
             
-            # Process rows sequentially to handle main members and their families
-            current_main = None
-            current_profile = None
+            if mode == 'stream':
+                # Families are yielded one at a time, so the whole sheet is never held in memory
+                families = stream_families(uploaded_file)
+            else:
+                df = pd.read_excel(uploaded_file)
+                print(f"Excel file has {len(df)} rows to process")
+                
+                # Split the sheet into families once instead of scanning the DataFrame for every main member
+                families = partition_families(df)
+                print(f"Found {len(families)} families in the sheet")
+            
+            for family in families:
+                if mode == 'stream' and writer.pending_count() >= writer.batch_size:
+                    writer.flush()
+                
+                result = self.import_family(family, writer)
+                if result == 'created':
+                    records_created += 1
+                elif result == 'skipped':
+                    records_skipped += 1
             
-            for index, row in df.iterrows():
-                try:
-                    col0_value = str(row.iloc[0]).strip() if not pd.isna(row.iloc[0]) else ''
-                    member_name = str(row.iloc[1]).strip() if not pd.isna(row.iloc[1]) else ''
-                    relation = str(row.iloc[2]).strip() if not pd.isna(row.iloc[2]) else ''
-                    
-                    # If col0 has value, it's a new main member
-                    if col0_value and col0_value != 'nan':
-                        current_main = col0_value
-                        
-                        # Get mobile number - check if પોતે has mobile
-                        main_mobile = ''
-                        if not pd.isna(row.iloc[7]):
-                            try:
-                                main_mobile = str(int(row.iloc[7]))
-                            except:
-                                main_mobile = str(row.iloc[7]).strip()
-                        
-                        # Parse main member name and get details
-                        main_name_to_use = current_main
-                        main_row_to_use = row
-                        
-                        # If પોતે has no mobile, find family member with mobile
-                        if not main_mobile or len(main_mobile) < 10:
-                            print(f"પોતે {current_main} has no mobile, looking for family member...")
-                            
-                            # Get all rows for this family
-                            family_rows = df[df.iloc[:, 0] == current_main]
-                            if len(family_rows) == 0:
-                                # Look for family members in subsequent rows
-                                family_start = index
-                                family_end = index + 1
-                                while family_end < len(df) and (pd.isna(df.iloc[family_end, 0]) or df.iloc[family_end, 0] == ''):
-                                    family_end += 1
-                                family_rows = df.iloc[family_start:family_end]
-                            
-                            # Find family member with mobile (prioritize: પુત્ર, પત્ની, others)
-                            selected_member = None
-                            priority_relations = ['પુત્ર', 'પત્ની']  # son, wife
-                            
-                            # First try priority relations
-                            for priority_rel in priority_relations:
-                                for _, fam_row in family_rows.iterrows():
-                                    fam_relation = str(fam_row.iloc[2]).strip() if not pd.isna(fam_row.iloc[2]) else ''
-                                    if priority_rel in fam_relation:
-                                        fam_mobile = ''
-                                        if not pd.isna(fam_row.iloc[7]):
-                                            try:
-                                                fam_mobile = str(int(fam_row.iloc[7]))
-                                            except:
-                                                fam_mobile = str(fam_row.iloc[7]).strip()
-                                        
-                                        if fam_mobile and len(fam_mobile) >= 10:
-                                            selected_member = fam_row
-                                            main_mobile = fam_mobile
-                                            main_name_to_use = str(fam_row.iloc[1]).strip()
-                                            main_row_to_use = fam_row
-                                            print(f"Making {main_name_to_use} ({priority_rel}) the main user with mobile: {main_mobile}")
-                                            break
-                                if selected_member is not None:
-                                    break
-                            
-                            # If no priority relation found, try any family member with mobile
-                            if selected_member is None:
-                                for _, fam_row in family_rows.iterrows():
-                                    fam_relation = str(fam_row.iloc[2]).strip() if not pd.isna(fam_row.iloc[2]) else ''
-                                    if fam_relation != 'પોતે':  # Not self
-                                        fam_mobile = ''
-                                        if not pd.isna(fam_row.iloc[7]):
-                                            try:
-                                                fam_mobile = str(int(fam_row.iloc[7]))
-                                            except:
-                                                fam_mobile = str(fam_row.iloc[7]).strip()
-                                        
-                                        if fam_mobile and len(fam_mobile) >= 10:
-                                            selected_member = fam_row
-                                            main_mobile = fam_mobile
-                                            main_name_to_use = str(fam_row.iloc[1]).strip()
-                                            main_row_to_use = fam_row
-                                            print(f"Making {main_name_to_use} ({fam_relation}) the main user with mobile: {main_mobile}")
-                                            break
-                            
-                            # If no family member found with mobile
-                            if not main_mobile or len(main_mobile) < 10:
-                                print(f"No valid mobile found for family of {current_main}, skipping this family")
-                                current_profile = None  # Reset to prevent family member processing
-                                continue
-                        
-                        # Parse name and address for the selected main user
-                        surname, parsed_name, father_name, sakh = parse_name(main_name_to_use)
-                        birthdate = parse_date(main_row_to_use.iloc[3])
-                        blood_group = str(main_row_to_use.iloc[4]).strip() if not pd.isna(main_row_to_use.iloc[4]) else ''
-                        marital_status = str(main_row_to_use.iloc[5]).strip() if not pd.isna(main_row_to_use.iloc[5]) else ''
-                        sakh_from_excel = str(main_row_to_use.iloc[6]).strip() if not pd.isna(main_row_to_use.iloc[6]) else sakh
-                        education = str(main_row_to_use.iloc[8]).strip() if not pd.isna(main_row_to_use.iloc[8]) else ''
-                        occupation = str(main_row_to_use.iloc[9]).strip() if not pd.isna(main_row_to_use.iloc[9]) else ''
-                        full_address = str(main_row_to_use.iloc[10]) if not pd.isna(main_row_to_use.iloc[10]) else ''
-                        address_details, area, city = parse_address(full_address)
-                        print(f"Main user address parsed: '{full_address}' -> '{address_details}', '{area}', '{city}'")
-                        
-                        # If main user has no address, use original પોતે's address
-                        if main_name_to_use != current_main and (not address_details or address_details.strip() == ''):
-                            original_address = str(row.iloc[10]) if not pd.isna(row.iloc[10]) else ''
-                            original_address_details, original_area, original_city = parse_address(original_address)
-                            address_details, area, city = original_address_details, original_area, original_city
-                        
-                        # Check if user already exists - PRESERVE EXISTING DATA
-                        if main_mobile and len(main_mobile) >= 10:
-                            # Check all mobile variants to prevent duplicates
-                            clean_main_mobile = main_mobile.replace('+', '').replace(' ', '').replace('-', '')
-                            if clean_main_mobile.startswith('91') and len(clean_main_mobile) == 12:
-                                clean_main_mobile = clean_main_mobile[2:]
-                            
-                            mobile_check_variants = [main_mobile, clean_main_mobile]
-                            if main_mobile.startswith('+91'):
-                                mobile_check_variants.append(main_mobile[3:])
-                            
-                            # Remove duplicates from check variants
-                            mobile_check_variants = list(set(mobile_check_variants))
-                            
-                            # Check if any variant already exists - PRESERVE EXISTING DATA
-                            user_exists = False
-                            existing_variant = None
-                            for variant in mobile_check_variants:
-                                if (User.objects.filter(username=variant).exists() or 
-                                    NewPersonalProfile.objects.filter(mobileNumber=variant).exists()):
-                                    print(f"✓ PRESERVING: User with mobile {variant} already exists, keeping existing data intact")
-                                    user_exists = True
-                                    existing_variant = variant
-                                    break
-                            
-                            if user_exists:
-                                records_skipped += 1
-                                print(f"✓ SKIPPED: {main_name_to_use} (mobile: {existing_variant}) - preserving existing data")
-                                current_profile = None  # Reset to prevent family member processing
-                                continue
-                            
-                            try:
-                                user = User.objects.create_user(
-                                    username=main_mobile,
-                                    password='temp123',
-                                    first_name=parsed_name[:30] if parsed_name else '',
-                                    last_name=surname[:30] if surname else ''
-                                )
-                                
-                                # Create profile for the selected main user
-                                calculated_age = calculate_age(birthdate)
-                                profile = NewPersonalProfile.objects.create(
-                                    user=user,
-                                    surname=surname,
-                                    name=parsed_name,
-                                    fatherName=father_name,
-                                    sakh=sakh_from_excel,
-                                    age=calculated_age,
-                                    dateOfBirth=birthdate,
-                                    bloodGroup=blood_group,
-                                    maritalStatus='married' if marital_status and ('પરણીત' in marital_status or 'married' in marital_status.lower()) else 'widowed' if marital_status and ('વિધવા' in marital_status or 'widowed' in marital_status.lower()) else 'unmarried' if marital_status and ('અપરણીત' in marital_status or 'single' in marital_status.lower() or 'unmarried' in marital_status.lower()) else 'single' if not marital_status or marital_status.strip() == '' else marital_status.lower(),
-                                    education=education,
-                                    occupation=occupation,
-                                    email=f"{main_mobile}@temp.com",
-                                    mobileNumber=main_mobile,
-                                    address=address_details,
-                                    area=area,
-                                    city=city,
-                                    password_change_required=True
-                                )
-                                
-                                print(f"✓ CREATED: New user #{profile.user_number} - {surname} {parsed_name} (mobile: {main_mobile})")
-                                current_profile = profile
-                                records_created += 1
-                                
-                                # If a family member became main, add original પોતે as family member
-                                if main_name_to_use != current_main:
-                                    original_surname, original_name, original_father, original_sakh = parse_name(current_main)
-                                    
-                                    # Get original પોતે's address from his own row
-                                    original_address = str(row.iloc[10]) if not pd.isna(row.iloc[10]) else ''
-                                    original_address_details, original_area, original_city = parse_address(original_address)
-                                    print(f"Original પોતે address parsed: '{original_address}' -> '{original_address_details}', '{original_area}', '{original_city}'")
-                                    
-                                    # If original પોતે address is empty, use main user's address
-                                    if not original_address_details and not original_area and not original_city:
-                                        original_address_details, original_area, original_city = address_details, area, city
-                                        print(f"Original પોતે had no address, using main user's address: '{address_details}', '{area}', '{city}'")
-                                    else:
-                                        print(f"Using original પોતે's address: '{original_address_details}', '{original_area}', '{original_city}'")
-                                    original_birthdate = parse_date(row.iloc[3])
-                                    
-                                    # Determine relation of original પોતે to the new main user
-                                    selected_relation = str(main_row_to_use.iloc[2]).strip() if not pd.isna(main_row_to_use.iloc[2]) else ''
-                                    original_relation = 'other'  # Default
-                                    
-                                    if 'પુત્ર' in selected_relation:  # If son became main, original is father
-                                        original_relation = 'father'
-                                    elif 'પત્ની' in selected_relation:  # If wife became main, original is husband
-                                        original_relation = 'spouse'
-                                    elif 'પુત્રી' in selected_relation:  # If daughter became main, original is father
-                                        original_relation = 'father'
-                                    elif 'પિતા' in selected_relation:  # If father became main, original is son
-                                        original_relation = 'son'
-                                    elif 'માતા' in selected_relation:  # If mother became main, original is son
-                                        original_relation = 'son'
-                                    
-                                    # Create family member for original પોતે
-                                    original_calculated_age = calculate_age(original_birthdate)
-                                    NewFamilyMember.objects.create(
-                                        profile=profile,
-                                        surname=original_surname,
-                                        name=original_name,
-                                        fatherName=original_father,
-                                        sakh=original_sakh,
-                                        memberAge=original_calculated_age,
-                                        dateOfBirth=original_birthdate,
-                                        relation=original_relation,
-                                        email='',
-                                        mobileNumber='',  # Original had no mobile
-                                        address=original_address_details,
-                                        area=original_area,
-                                        city=original_city
-                                    )
-                                    
-                                    print(f"Added original પોતે {original_surname} {original_name} as {original_relation} - Address: '{original_address_details}', '{original_area}', '{original_city}'")
-                                    
-                                    # Store the selected relation for adjusting other family members
-                                    current_profile.selected_main_relation = selected_relation
-                                    # Store original પોતે's address for family members to use
-                                    current_profile.original_address = original_address_details
-                                    current_profile.original_area = original_area
-                                    current_profile.original_city = original_city
-                                    print(f"Stored original પોતે address for inheritance: '{original_address_details}', '{original_area}', '{original_city}'")
-                                else:
-                                    current_profile.selected_main_relation = 'પોતે'
-                                    # Store main user's address for family members to use
-                                    current_profile.original_address = address_details
-                                    current_profile.original_area = area
-                                    current_profile.original_city = city
-                                    print(f"Stored main user address for inheritance: '{address_details}', '{area}', '{city}'")
-                                
-                            except Exception as e:
-                                print(f"Error creating user for {main_name_to_use}: {e}")
-                                continue
-                        
-                        # Skip processing this row as family member since it's the main member
-                        continue
-                    
-                    # Process family members (skip if this member became the main user)
-                    if current_profile and member_name and relation and relation != 'પોતે' and member_name != main_name_to_use:
-                        try:
-                            surname, parsed_name, father_name, sakh = parse_name(member_name)
-                            birthdate = parse_date(row.iloc[3])
-                            blood_group = str(row.iloc[4]).strip() if not pd.isna(row.iloc[4]) else ''
-                            marital_status = str(row.iloc[5]).strip() if not pd.isna(row.iloc[5]) and str(row.iloc[5]).strip() else ''
-                            sakh_from_excel = str(row.iloc[6]).strip() if not pd.isna(row.iloc[6]) else sakh
-                            education = str(row.iloc[8]).strip() if not pd.isna(row.iloc[8]) else ''
-                            occupation = str(row.iloc[9]).strip() if not pd.isna(row.iloc[9]) else ''
-                            full_address = str(row.iloc[10]) if not pd.isna(row.iloc[10]) else ''
-                            address_details, area, city = parse_address(full_address)
-                            # If family member has empty address, inherit from original પોતે
-                            if not full_address or full_address.strip() == '' or full_address == 'nan':
-                                original_address_details = getattr(current_profile, 'original_address', '')
-                                original_area = getattr(current_profile, 'original_area', '')
-                                original_city = getattr(current_profile, 'original_city', '')
-                                address_details, area, city = original_address_details, original_area, original_city
-                            
-                            # Get mobile number for family member
-                            member_mobile = str(row.iloc[7]).strip() if not pd.isna(row.iloc[7]) else ''
-                            if member_mobile:
-                                try:
-                                    member_mobile = str(int(float(member_mobile)))
-                                except:
-                                    member_mobile = member_mobile.strip()
-                            
-                            # Only set mobile if it's valid (don't create dummy numbers)
-                            if not member_mobile or len(member_mobile) < 10:
-                                member_mobile = ''  # Leave empty instead of dummy
-                            
-                            # Adjust relation based on who became the main member
-                            selected_main_relation = getattr(current_profile, 'selected_main_relation', 'પોતે')
-                            adjusted_relation = relation
-                            
-                            # If son became main, adjust all relations relative to son
-                            if 'પુત્ર' in selected_main_relation:
-                                if relation == 'પત્ની' or relation == 'wife':  # Wife of original becomes mother
-                                    adjusted_relation = 'માતા'
-                                elif relation == 'પુત્રી' or relation == 'daughter':  # Daughter becomes sister
-                                    adjusted_relation = 'બહેન'
-                                elif relation == 'ભાઈ' or relation == 'brother':  # Brother becomes brother (stays same)
-                                    adjusted_relation = 'brother'
-                                elif 'પુત્રવધુ' in relation:  # Daughter-in-law becomes wife
-                                    adjusted_relation = 'પત્ની'
-                                elif relation == 'પૌત્રી' or relation == 'granddaughter':  # Granddaughter becomes daughter
-                                    adjusted_relation = 'પુત્રી'
-                                elif relation == 'પૌત્ર' or relation == 'grandson':  # Grandson becomes son
-                                    adjusted_relation = 'પુત્ર'
-                            
-                            # Map both Gujarati and English relations to English
-                            relation_mapping = {
-                                # Gujarati relations
-                                'પુત્ર': 'son',
-                                'પુત્રી': 'daughter', 
-                                'પત્ની': 'spouse',
-                                'પતિ': 'spouse',
-                                'પિતા': 'father',
-                                'માતા': 'mother',
-                                'ભાઈ': 'brother',
-                                'ભાઇ': 'brother',
-                                'બહેન': 'sister',
-                                'દાદા': 'grandfather',
-                                'દાદી': 'grandmother',
-                                'નાના': 'uncle',
-                                'નાની': 'aunt',
-                                'પૌત્ર': 'grandson',
-                                'પૌત્રી': 'granddaughter',
-                                'પુત્રવધુ': 'daughter_in_law',
-                                # English relations
-                                'son': 'son',
-                                'daughter': 'daughter',
-                                'spouse': 'spouse',
-                                'wife': 'spouse',
-                                'husband': 'spouse',
-                                'father': 'father',
-                                'mother': 'mother',
-                                'brother': 'brother',
-                                'sister': 'sister',
-                                'grandfather': 'grandfather',
-                                'grandmother': 'grandmother',
-                                'uncle': 'uncle',
-                                'aunt': 'aunt',
-                                'grandson': 'grandson',
-                                'granddaughter': 'granddaughter',
-                                'daughter_in_law': 'daughter_in_law'
-                            }
-                            
-                            # Try exact match first, then partial match for Gujarati relations
-                            english_relation = relation_mapping.get(adjusted_relation, None)
-                            if not english_relation:
-                                # Try partial matching for common variations
-                                for gujarati_rel, english_rel in relation_mapping.items():
-                                    if gujarati_rel in adjusted_relation or adjusted_relation in gujarati_rel:
-                                        english_relation = english_rel
-                                        break
-                                if not english_relation:
-                                    english_relation = 'other'
-                            
-                            if adjusted_relation != relation:
-                                print(f"Relation adjusted: {relation} -> {adjusted_relation} -> {english_relation}")
-                            
-                            member_calculated_age = calculate_age(birthdate)
-                            NewFamilyMember.objects.create(
-                                profile=current_profile,
-                                surname=surname,
-                                name=parsed_name,
-                                fatherName=father_name,
-                                sakh=sakh_from_excel,
-                                memberAge=member_calculated_age,
-                                dateOfBirth=birthdate,
-                                bloodGroup=blood_group,
-                                maritalStatus='married' if marital_status and ('પરણીત' in marital_status or 'married' in marital_status.lower()) else 'widowed' if marital_status and ('વિધવા' in marital_status or 'widowed' in marital_status.lower()) else 'unmarried' if marital_status and ('અપરણીત' in marital_status or 'single' in marital_status.lower() or 'unmarried' in marital_status.lower()) else 'single' if not marital_status or marital_status.strip() == '' else marital_status.lower(),
-                                education=education,
-                                occupation=occupation,
-                                relation=english_relation,
-                                email=f"{member_mobile}@temp.com" if member_mobile else '',
-                                mobileNumber=member_mobile,
-                                address=address_details,
-                                area=area,
-                                city=city
-                            )
-                            
-                            print(f"Added {parsed_name} with address: {address_details}")
-                            
-                        except Exception as e:
-                            print(f"Error creating family member {member_name}: {e}")
-                            continue
-                        
-                except Exception as e:
-                    print(f"Error processing row {index}: {e}")
-                    continue
+            writer.flush()
+            if mode in ('bulk', 'stream'):
+                written = writer.written
+                print(f"Bulk insert wrote {written['users']} users, {written['profiles']} profiles, {written['members']} family members")
             
             print(f"\n=== EXCEL UPLOAD COMPLETED ===")
             print(f"✓ NEW RECORDS CREATED: {records_created}")
@@ -541,6 +395,7 @@ class UploadExcelView(APIView):
             
             return Response({
                 'success': True,
+                'mode': mode,
                 'records_created': records_created,
                 'records_skipped': records_skipped,
                 'total_database_records': NewPersonalProfile.objects.count(),
@@ -551,4 +406,59 @@ class UploadExcelView(APIView):
             print(f"Error processing Excel file: {e}")
             import traceback
             traceback.print_exc()
-            return Response({'success': False, 'error': str(e)}, status=500)
\ No newline at end of file
+            return Response({'success': False, 'error': str(e)}, status=500)
+
+    def sync_upload(self, uploaded_file):
+        """mode=sync: diff a re-uploaded sheet against what earlier imports stored and write only the changes"""
+        print(f"\n=== EXCEL UPLOAD - SYNCING CHANGED ROWS ===")
+        df = pd.read_excel(uploaded_file)
+        families = partition_families(df)
+        print(f"Found {len(families)} families in the sheet")
+        
+        records = []
+        invalid = 0
+        for family in families:
+            try:
+                record = build_family_record(family)
+            except Exception as e:
+                print(f"Error processing family starting at row {family['start_index']}: {e}")
+                continue
+            if record is None:
+                invalid += 1
+            else:
+                records.append(record)
+        
+        counts = sync_family_records(records, get_import_writer('bulk'))
+        print(f"Sync result: {counts}")
+        
+        return Response({
+            'success': True,
+            'mode': 'sync',
+            'records_created': counts['families_created'],
+            'records_updated': counts['families_updated'],
+            'records_unchanged': counts['families_unchanged'],
+            'records_skipped': counts['families_skipped'],
+            'records_without_mobile': invalid,
+            'members_created': counts['members_created'],
+            'members_updated': counts['members_updated'],
+            'members_deleted': counts['members_deleted'],
+            'total_database_records': NewPersonalProfile.objects.count(),
+            'message': f"Excel sync completed! Created {counts['families_created']}, updated {counts['families_updated']} and left {counts['families_unchanged']} unchanged families."
+        })
+
+class ImportJobStatusView(APIView):
+    """View to poll the progress of a background Excel import, for the user who uploaded it or staff"""
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, job_id):
+        # The file name and errors hold family names: other users' jobs are not found
+        jobs = ImportJob.objects.filter(id=job_id)
+        if not request.user.is_staff:
+            jobs = jobs.filter(uploaded_by=request.user)
+        # A job whose worker exited shows up as failed instead of running forever
+        fail_stale_jobs(jobs)
+        job = jobs.first()
+        if job is None:
+            return Response({'success': False, 'error': 'Import job not found'}, status=404)
+        
+        return Response({'success': True, 'job': ImportJobSerializer(job).data})
@@ -3,68 +3,10 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny
 from django.contrib.auth.models import User
 from .models import NewPersonalProfile, NewFamilyMember
+from .excel_parsing import parse_name, split_address
 import pandas as pd
 import random
 
-def parse_name(full_name):
-    """Parse Gujarati name"""
-    if not full_name or pd.isna(full_name):
-        return '', '', '', ''
-    
-    name = str(full_name).strip()
-    parts = name.split()
-    
-    if len(parts) < 2:
-        return parts[0] if parts else '', '', '', ''
-    
-    sakh = parts[-1]
-    common_surnames = ['પટેલ', 'શાહ', 'દવે', 'જોશી', 'મહેતા', 'પરમાર', 'ઠાકોર', 'વ્યાસ', 'ત્રિવેદી', 'ચૌધરી']
-    
-    if parts[0] in common_surnames:
-        surname = parts[0]
-    else:
-        surname = sakh
-    
-    if 'સ્વ.' in name or 'સ્વ' in name:
-        sv_index = -1
-        for i, part in enumerate(parts):
-            if 'સ્વ' in part:
-                sv_index = i
-                break
-        
-        if sv_index >= 0 and sv_index + 1 < len(parts):
-            parsed_name = f"સ્વ. {parts[sv_index + 1]}"
-            father_name = parts[sv_index + 2] if sv_index + 2 < len(parts) - 1 else ''
-        else:
-            parsed_name = 'સ્વ.'
-            father_name = ''
-    else:
-        if parts[0] in common_surnames:
-            parsed_name = parts[1] if len(parts) > 1 else ''
-            father_name = parts[2] if len(parts) > 2 else ''
-        else:
-            parsed_name = parts[0]
-            father_name = parts[1] if len(parts) > 1 else ''
-    
-    return surname, parsed_name, father_name, sakh
-
-def parse_address(full_address):
-    """Parse address"""
-    if not full_address or pd.isna(full_address):
-        return '', '', ''
-    
-    address = str(full_address).strip()
-    parts = [part.strip() for part in address.split(',')]
-    
-    if len(parts) < 2:
-        return address, '', ''
-    
-    city = parts[-1].strip()
-    area = parts[-2].strip() if len(parts) > 1 else ''
-    address_details = ', '.join(parts[:-2]) if len(parts) > 2 else ''
-    
-    return address_details, area, city
-
 def extract_mobile_number(row, start_col=7, end_col=15):
     """Extract mobile number from multiple columns"""
     for mobile_col in range(start_col, min(end_col, len(row))):
@@ -135,7 +77,7 @@ class UploadExcelView(APIView):
                         # Create main user
                         user = User.objects.create_user(
                             username=main_mobile,
-                            password='temp123',
+                            password=None,  # Unusable until the user activates the account through the OTP login
                             first_name=name or current_main
                         )
                         
@@ -144,7 +86,7 @@ class UploadExcelView(APIView):
                         if not full_address:
                             full_address = f"Test Address {records_created + 1}, Test Area, Ahmedabad"
                         
-                        address_details, area, city = parse_address(full_address)
+                        address_details, area, city = split_address(full_address)
                         
                         current_profile = NewPersonalProfile.objects.create(
                             user=user,
@@ -158,7 +100,8 @@ class UploadExcelView(APIView):
                             address=address_details or full_address,
                             area=area,
                             city=city,
-                            maritalStatus='married'
+                            maritalStatus='married',
+                            password_change_required=True
                         )
                         
                         records_created += 1
@@ -181,7 +124,7 @@ class UploadExcelView(APIView):
                             if not member_full_address:
                                 member_full_address = f"Family Address {f_name}, Test Area, Ahmedabad"
                             
-                            member_address_details, member_area, member_city = parse_address(member_full_address)
+                            member_address_details, member_area, member_city = split_address(member_full_address)
                             
                             NewFamilyMember.objects.create(
                                 profile=current_profile,
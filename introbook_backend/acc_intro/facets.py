@@ -0,0 +1,98 @@
+# Facet counts of the directory browse (DirectoryBrowseView).
+# Every facet (city, sakh, caste, education, marital status, blood group) is a column of
+# DirectoryEntry, so each facet's counts come from one GROUP BY of that column over the filtered
+# entries, which returns a row per distinct value. (Grouping by all six columns at once returns a
+# row per combination, about one per person.) city and sakh are grouped by their phonetic keys, so
+# 'Surat' and 'સુરત' are counted together.
+#
+# The counts are cached for FACET_CACHE_SECONDS under a key that includes the directory version.
+# directory.py moves to a new version whenever a profile or member is saved or deleted and after
+# the bulk paths rewrite entries, so a write never has to find the cached counts it makes stale:
+# they are no longer read and expire by themselves. The autocomplete cache (autocomplete.py) uses
+# the same version. The version is only seen by every worker when the default cache is shared by
+# them (CACHES in settings.py).
+
+import hashlib
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Min
+from .models import NewPersonalProfile
+
+FACETS = ('city', 'sakh', 'caste', 'education', 'maritalStatus', 'bloodGroup')
+# Facets grouped by a key column, with a spelling of the key as the value to filter on
+KEYED_FACETS = {'city': 'city_key', 'sakh': 'sakh_key'}
+# Values returned per facet, the most common first
+FACET_LIMIT = 50
+DEFAULT_CACHE_SECONDS = 600
+VERSION_KEY = 'directory-version'
+
+
+def directory_version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Never restart from a number an evicted version may already have used
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def next_directory_version():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+
+
+def invalidate_directory_caches(**kwargs):
+    """Start a new version, so the counts and suggestions cached so far are not read again (also a signal receiver)"""
+    next_directory_version()
+    # Until the write commits other requests still read the old rows and may cache them under the
+    # new version, so move on once more when it does
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(next_directory_version)
+
+
+def facet_cache_key(filters):
+    digest = hashlib.sha1(repr(sorted(filters.items())).encode()).hexdigest()
+    return f'directory-facets:{directory_version()}:{digest}'
+
+
+def facet_labels(facet):
+    """Display names of the values of a choice field (education, maritalStatus, bloodGroup)"""
+    if facet in KEYED_FACETS:
+        return {}
+    return dict(NewPersonalProfile._meta.get_field(facet).choices or ())
+
+
+def count_facet(entries, facet):
+    """[{'value', 'label', 'count'}, ...] of one facet for the entries, from one grouped query"""
+    column = KEYED_FACETS.get(facet, facet)
+    groups = entries.order_by().exclude(**{column: ''}).values(column).annotate(count=Count('id'))
+    if facet in KEYED_FACETS:
+        # The key is not readable, filter and display by one of its spellings
+        groups = groups.annotate(spelling=Min(facet))
+
+    labels = facet_labels(facet)
+    values = []
+    for group in groups:
+        value = group['spelling'] if facet in KEYED_FACETS else group[column]
+        values.append({'value': value, 'label': labels.get(value, value), 'count': group['count']})
+    values.sort(key=lambda item: (-item['count'], item['label']))
+    return values[:FACET_LIMIT]
+
+
+def count_facets(entries):
+    """{facet: [{'value', 'label', 'count'}, ...]} for the entries, a small grouped query per facet"""
+    return {facet: count_facet(entries, facet) for facet in FACETS}
+
+
+def facet_counts(entries, filters):
+    """count_facets() of entries, cached per version and filters (the query parameters that made entries)"""
+    key = facet_cache_key(filters)
+    facets = cache.get(key)
+    if facets is None:
+        facets = count_facets(entries)
+        cache.set(key, facets, getattr(settings, 'FACET_CACHE_SECONDS', DEFAULT_CACHE_SECONDS))
+    return facets
@@ -0,0 +1,107 @@
+# Import benchmark used by the benchmark_import command and the tests.
+# Every run posts a workbook to one UploadExcelView variant inside a transaction that is rolled
+# back afterwards, so it can be pointed at a local database without leaving data behind.
+
+import contextlib
+import glob
+import importlib
+import io
+import os
+import time
+import tracemalloc
+
+import pandas as pd
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+SAMPLE_FOLDER = settings.BASE_DIR.parent / 'finalpithoridarwajanamawali'
+
+# name: (module with an UploadExcelView, mode passed to it)
+IMPORT_VARIANTS = {
+    'excel_upload': ('acc_intro.excel_upload', 'standard'),
+    'excel_upload_bulk': ('acc_intro.excel_upload', 'bulk'),
+    'excel_upload_stream': ('acc_intro.excel_upload', 'stream'),
+    'views': ('acc_intro.views', 'standard'),
+    'views_bulk': ('acc_intro.views', 'bulk'),
+    'improved': ('acc_intro.excel_upload_improved', 'standard'),
+    'smart_main': ('acc_intro.excel_upload_smart_main', 'standard'),
+    'dummy_mobiles': ('acc_intro.excel_upload_with_dummy_mobiles', 'standard'),
+}
+
+
+class QueryTimer:
+    """Database execute wrapper that adds up the time spent inside queries"""
+
+    def __init__(self):
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+
+def sample_workbooks(folder=None):
+    """Paths of the workbooks to benchmark (the bundled samples by default)"""
+    folder = folder or SAMPLE_FOLDER
+    paths = sorted(glob.glob(os.path.join(str(folder), '*.xlsx')))
+    # Skip Excel lock files like ~$BHOJAVAT-56.xlsx
+    return [path for path in paths if not os.path.basename(path).startswith('~$')]
+
+
+def run_import_benchmark(path, variant, trace_memory=True):
+    """Import one workbook with one variant, measure it, and roll the import back.
+
+    Returns rows, seconds, rows_per_second, queries, peak_memory (bytes, None without
+    trace_memory), db_seconds, parse_seconds (everything that is not a query),
+    records_created and the response status. tracemalloc slows Python code down, so turn
+    trace_memory off when only the timings matter.
+    """
+    module_name, mode = IMPORT_VARIANTS[variant]
+    view = importlib.import_module(module_name).UploadExcelView.as_view()
+    with open(path, 'rb') as workbook:
+        data = workbook.read()
+    rows = len(pd.read_excel(io.BytesIO(data)).dropna(how='all'))
+    request = APIRequestFactory().post(
+        '/api/upload-excel/',
+        {'file': SimpleUploadedFile(os.path.basename(path), data), 'mode': mode},
+        format='multipart',
+    )
+
+    timer = QueryTimer()
+    peak_memory = None
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        with transaction.atomic():
+            # The importers print a line for every row, keep that out of the timings
+            with CaptureQueriesContext(connection) as queries, connection.execute_wrapper(timer), \
+                    contextlib.redirect_stdout(io.StringIO()):
+                started = time.perf_counter()
+                response = view(request)
+                seconds = time.perf_counter() - started
+            transaction.set_rollback(True)
+        if trace_memory:
+            _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    return {
+        'workbook': os.path.basename(path),
+        'variant': variant,
+        'status': response.status_code,
+        'records_created': response.data.get('records_created', 0),
+        'rows': rows,
+        'seconds': seconds,
+        'rows_per_second': rows / seconds if seconds else 0.0,
+        'queries': len(queries),
+        'peak_memory': peak_memory,
+        'db_seconds': timer.seconds,
+        'parse_seconds': max(seconds - timer.seconds, 0.0),
+    }
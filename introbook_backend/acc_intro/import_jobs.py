@@ -0,0 +1,126 @@
+# Background Excel imports.
+# An upload is saved as an ImportJob and imported on a daemon thread inside this process, so no
+# broker is needed. Families are imported a chunk at a time, and each chunk is committed together
+# with the job's counters so progress can be polled while the import runs.
+#
+# A thread dies with its worker process (a deploy or a restart), leaving its job pending or
+# running. Every chunk moves the job's updated_at, so a job that has not moved for
+# IMPORT_JOB_STALE_SECONDS has lost its thread: fail_stale_jobs() marks running ones as failed
+# (the chunks already committed stay, a re-upload skips them) and the run_import_jobs command,
+# run from cron, does that and then imports the pending jobs no thread ever started.
+
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+from .bulk_import import BulkImportWriter
+from .excel_families import stream_families
+from .models import ImportJob
+
+CHUNK_SIZE = 50  # Families per transaction
+DEFAULT_STALE_SECONDS = 15 * 60
+
+
+def start_import_job(job):
+    """Import the job's file on a background thread and return straight away"""
+    thread = threading.Thread(target=run_import_job_thread, args=(job.id,), name=f'import-job-{job.id}', daemon=True)
+    thread.start()
+    return thread
+
+
+def run_import_job_thread(job_id):
+    try:
+        run_import_job(job_id)
+    finally:
+        # This thread opened its own database connection
+        connection.close()
+
+
+def stale_before():
+    seconds = getattr(settings, 'IMPORT_JOB_STALE_SECONDS', DEFAULT_STALE_SECONDS)
+    return timezone.now() - timedelta(seconds=seconds)
+
+
+def fail_stale_jobs(jobs=None):
+    """Mark running jobs that stopped moving as failed, return how many"""
+    jobs = ImportJob.objects.all() if jobs is None else jobs
+    now = timezone.now()
+    stale = list(jobs.filter(status='running', updated_at__lt=stale_before()))
+    for job in stale:
+        job.status = 'failed'
+        job.errors += "Import stopped: the worker running it exited. Upload the file again to import the rest.\n"
+        job.finished_at = now
+        job.updated_at = now
+    ImportJob.objects.bulk_update(stale, ['status', 'errors', 'finished_at', 'updated_at'])
+    return len(stale)
+
+
+def stale_pending_jobs():
+    """Jobs still pending long after their upload, whose thread never started"""
+    return ImportJob.objects.filter(status='pending', created_at__lt=stale_before()).order_by('created_at')
+
+
+def run_import_job(job_id):
+    """Import every family of the uploaded workbook, committing after each chunk.
+
+    Returns the job, or None when it is not pending (another thread or run_import_jobs took it).
+    """
+    # The upload view holds the parsing logic, importing it here avoids a circular import
+    from .excel_upload import UploadExcelView
+
+    # Claim the job, so it is imported once even when the command and a thread both try
+    claimed = ImportJob.objects.filter(id=job_id, status='pending').update(
+        status='running', started_at=timezone.now(), updated_at=timezone.now()
+    )
+    if not claimed:
+        return None
+    job = ImportJob.objects.get(id=job_id)
+    print(f"=== IMPORT JOB #{job.id} STARTED: {job.original_name} ===")
+
+    importer = UploadExcelView()
+    writer = BulkImportWriter()
+    try:
+        with job.file.open('rb') as upload:
+            chunk = []
+            for family in stream_families(upload):
+                chunk.append(family)
+                if len(chunk) >= CHUNK_SIZE:
+                    import_chunk(job, importer, writer, chunk)
+                    chunk = []
+            if chunk:
+                import_chunk(job, importer, writer, chunk)
+        job.status = 'completed'
+    except Exception as e:
+        print(f"Import job #{job.id} failed: {e}")
+        job.status = 'failed'
+        job.errors += f"Import stopped: {e}\n"
+
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'errors', 'finished_at', 'updated_at'])
+    print(f"=== IMPORT JOB #{job.id} {job.status.upper()}: created {job.records_created}, skipped {job.records_skipped} ===")
+    return job
+
+
+def import_chunk(job, importer, writer, families):
+    """Import a chunk of families and save the job's progress in the same transaction"""
+    with transaction.atomic():
+        errors = []
+        for family in families:
+            result = importer.import_family(family, writer)
+            if result == 'created':
+                job.records_created += 1
+            elif result == 'skipped':
+                job.records_skipped += 1
+            else:
+                job.records_failed += 1
+                reason = 'no mobile number' if result == 'invalid' else 'could not be imported'
+                errors.append(f"Row {family['start_index'] + 2}: {family['main_name']} - {reason}")
+            job.families_processed += 1
+            job.rows_processed += len(family['rows'])
+        writer.flush()
+        job.errors += ''.join(f"{error}\n" for error in errors)
+        job.save(update_fields=[
+            'rows_processed', 'families_processed', 'records_created', 'records_skipped', 'records_failed', 'errors',
+            'updated_at'
+        ])
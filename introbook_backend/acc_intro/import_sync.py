@@ -0,0 +1,209 @@
+# Incremental re-import of a workbook (the sync upload mode).
+# Every imported profile stores a source_key (the family's main mobile) and a content_hash of the
+# whole family as it was in the sheet; every imported member stores its own key and hash. A
+# re-upload compares the hashes and only writes the families that changed: new families are
+# inserted, changed members are updated in place (keeping their ids and member numbers), new
+# members are added and members that were removed from the sheet are deleted, all in bulk.
+# Members are matched on their key (relation and name); a member whose name was corrected in the
+# sheet no longer matches, so what is left over on both sides is paired by relation, in order,
+# before anything is deleted. That keeps the member's id, number and FamilyMemberAuth login.
+
+import hashlib
+import json
+from collections import defaultdict
+from django.contrib.auth.models import User
+from django.db import transaction
+from .models import NewPersonalProfile, NewFamilyMember
+from .directory import rebuild_directory
+from .mobile_utils import mobile_key
+from .search import update_search_columns
+
+# Derived from dateOfBirth and today's date, so they would change the hash every year
+UNHASHED_FIELDS = {'age', 'memberAge', 'password_change_required', 'source_key', 'content_hash'}
+
+
+def content_hash(fields):
+    """Stable hash of the imported values of one profile or member"""
+    values = {key: value for key, value in fields.items() if key not in UNHASHED_FIELDS}
+    encoded = json.dumps(values, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha1(encoded.encode('utf-8')).hexdigest()
+
+
+def member_source_keys(members):
+    """Key every member by relation and name, numbering repeats (two sons with the same name)"""
+    seen = defaultdict(int)
+    keys = []
+    for member in members:
+        key = f"{member['relation']}:{member['surname']} {member['name']}".strip()[:240]
+        seen[key] += 1
+        keys.append(key if seen[key] == 1 else f'{key}#{seen[key]}')
+    return keys
+
+
+def assign_source_keys(record):
+    """Add source_key and content_hash to the profile and members of a built family record"""
+    member_hashes = []
+    for member, key in zip(record['members'], member_source_keys(record['members'])):
+        member['source_key'] = key
+        member['content_hash'] = content_hash(member)
+        member_hashes.append(member['content_hash'])
+    profile = record['profile']
+    profile['source_key'] = mobile_key(record['mobile'])
+    # The profile hash covers the members too, so an unchanged family is skipped without loading them
+    profile['content_hash'] = content_hash({**profile, **record['user'], 'members': member_hashes})
+    return record
+
+
+def sync_family_records(records, writer):
+    """Apply a re-uploaded sheet: insert new families and diff the existing ones.
+
+    Families are matched on source_key. Profiles imported before source keys existed are matched
+    on their mobile number and adopted only while the account was never activated (no usable
+    password), because until then everything in them came from the sheet;
+    activated legacy accounts are left alone like before. The profile and user fields of an account
+    its owner has activated (it has a usable password) are never overwritten, the owner may have
+    edited them since; only its members follow the sheet. Members missing from the sheet are deleted
+    only if an import created them (they have a source_key, or they belong to an adopted legacy
+    family), so members added in the app are kept.
+    """
+    from .excel_upload import save_family_record
+
+    counts = {
+        'families_created': 0, 'families_updated': 0, 'families_unchanged': 0, 'families_skipped': 0,
+        'members_created': 0, 'members_updated': 0, 'members_deleted': 0,
+    }
+
+    by_key = {}
+    for record in records:
+        # A mobile repeated further down the sheet is a duplicate, the first family wins
+        by_key.setdefault(record['profile']['source_key'], record)
+
+    profiles = {profile.source_key: profile for profile in NewPersonalProfile.objects.filter(source_key__in=by_key).select_related('user')}
+    missing = {record['mobile']: key for key, record in by_key.items() if key not in profiles}
+    legacy = NewPersonalProfile.objects.filter(source_key='', mobileNumber__in=missing).select_related('user')
+    for profile in legacy:
+        key = missing[profile.mobileNumber]
+        if key in profiles:
+            continue
+        if not profile.user.has_usable_password():
+            profiles[key] = profile
+        else:
+            counts['families_skipped'] += 1
+            by_key.pop(key, None)
+
+    changed = []
+    for key, record in by_key.items():
+        profile = profiles.get(key)
+        if profile is None:
+            # New family: the same path as a normal import (skips mobiles registered in another form)
+            result = save_family_record(record, writer)
+            if result == 'created':
+                counts['families_created'] += 1
+                counts['members_created'] += len(record['members'])
+            elif result == 'skipped':
+                counts['families_skipped'] += 1
+        elif profile.content_hash == record['profile']['content_hash']:
+            counts['families_unchanged'] += 1
+        else:
+            changed.append((profile, record))
+
+    synced_profiles = []
+    activated_profiles = []
+    profile_fields = set()
+    user_fields = set()
+    member_fields = set()
+    members_to_update = []
+    member_ids_to_delete = []
+
+    # One query for the members of every changed family
+    existing_members = defaultdict(list)
+    for member in NewFamilyMember.objects.filter(profile__in=[profile for profile, _ in changed]).order_by('id'):
+        existing_members[member.profile_id].append(member)
+
+    def update_member(member, values):
+        if member.content_hash == values['content_hash'] and member.source_key == values['source_key']:
+            return
+        for name, value in values.items():
+            setattr(member, name, value)
+        member.canonical_mobile = mobile_key(member.mobileNumber)
+        member_fields.update(values)
+        member_fields.add('canonical_mobile')
+        members_to_update.append(member)
+
+    for profile, record in changed:
+        adopted = not profile.source_key
+        if profile.user.has_usable_password():
+            # Activated: keep what the owner has (email, address, ...), only remember the sheet's version
+            profile.content_hash = record['profile']['content_hash']
+            activated_profiles.append(profile)
+        else:
+            fields = {name: value for name, value in record['profile'].items() if name != 'password_change_required'}
+            for name, value in fields.items():
+                setattr(profile, name, value)
+            # bulk_update skips save() as well
+            profile.canonical_mobile = mobile_key(profile.mobileNumber)
+            update_search_columns(profile)
+            profile_fields.update(fields)
+            profile_fields.update({'canonical_mobile', 'search_document', 'search_key'})
+            for name, value in record['user'].items():
+                setattr(profile.user, name, value)
+            user_fields.update(record['user'])
+            synced_profiles.append(profile)
+
+        current = existing_members[profile.id]
+        # Members imported before source keys existed get the key their row would have now
+        legacy_members = [member for member in current if not member.source_key]
+        legacy_keys = member_source_keys([
+            {'relation': member.relation, 'surname': member.surname, 'name': member.name} for member in legacy_members
+        ])
+        keyed = {member.source_key: member for member in current if member.source_key}
+        for member, legacy_key in zip(legacy_members, legacy_keys):
+            keyed.setdefault(f'legacy|{legacy_key}', member)
+
+        seen_ids = set()
+        unmatched = []
+        for values in record['members']:
+            member = keyed.get(values['source_key']) or keyed.get(f"legacy|{values['source_key']}")
+            if member is None:
+                unmatched.append(values)
+                continue
+            seen_ids.add(member.id)
+            update_member(member, values)
+
+        # Imported members no row matched, by relation in id order. An adopted legacy family was never
+        # activated, so its unmatched members came from the old import too.
+        leftovers = defaultdict(list)
+        for member in current:
+            if (member.source_key or adopted) and member.id not in seen_ids:
+                leftovers[member.relation].append(member)
+        # A row whose name changed takes over the next leftover member with its relation
+        for values in unmatched:
+            candidates = leftovers.get(values['relation'])
+            if candidates:
+                update_member(candidates.pop(0), values)
+            else:
+                writer.create_member(profile=profile, **values)
+                counts['members_created'] += 1
+
+        for members in leftovers.values():
+            member_ids_to_delete.extend(member.id for member in members)
+        counts['families_updated'] += 1
+
+    with transaction.atomic():
+        writer.flush()
+        if synced_profiles:
+            NewPersonalProfile.objects.bulk_update(synced_profiles, sorted(profile_fields), batch_size=writer.batch_size)
+            User.objects.bulk_update([profile.user for profile in synced_profiles], sorted(user_fields), batch_size=writer.batch_size)
+        if activated_profiles:
+            NewPersonalProfile.objects.bulk_update(activated_profiles, ['content_hash'], batch_size=writer.batch_size)
+        if members_to_update:
+            NewFamilyMember.objects.bulk_update(members_to_update, sorted(member_fields), batch_size=writer.batch_size)
+        if member_ids_to_delete:
+            NewFamilyMember.objects.filter(id__in=member_ids_to_delete).delete()
+        if changed:
+            # The directory entries of the changed families (new ones are rebuilt by writer.flush())
+            rebuild_directory([profile.id for profile, _ in changed], batch_size=writer.batch_size)
+
+    counts['members_updated'] = len(members_to_update)
+    counts['members_deleted'] = len(member_ids_to_delete)
+    return counts
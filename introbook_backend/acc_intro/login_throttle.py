@@ -0,0 +1,51 @@
+# Counts failed logins so password guessing is cut off before it costs a PBKDF2 check.
+# Failures are counted per mobile number (canonical form) and per client IP in the Django cache;
+# once either count reaches its limit, login_view answers 429 without looking at the password until
+# the window runs out. A successful login clears the mobile's count. Like the OTP cache backend,
+# the counts are only shared between workers when CACHES points at a shared cache.
+
+from django.conf import settings
+from django.core.cache import cache
+from .mobile_utils import mobile_key
+
+DEFAULT_MAX_FAILURES = 5
+DEFAULT_MAX_FAILURES_PER_IP = 50
+DEFAULT_WINDOW_SECONDS = 900
+
+
+def client_ip(request):
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def throttle_keys(request, mobile):
+    """(cache key, limit) pairs for a login attempt"""
+    keys = [(f"login-fail:ip:{client_ip(request)}", getattr(settings, 'LOGIN_MAX_FAILURES_PER_IP', DEFAULT_MAX_FAILURES_PER_IP))]
+    key = mobile_key(mobile)
+    if key:
+        keys.append((f'login-fail:mobile:{key}', getattr(settings, 'LOGIN_MAX_FAILURES', DEFAULT_MAX_FAILURES)))
+    return keys
+
+
+def is_throttled(request, mobile):
+    """True if the mobile or the client has too many recent failures (one cache round trip)"""
+    keys = throttle_keys(request, mobile)
+    counts = cache.get_many([key for key, _ in keys])
+    return any(counts.get(key, 0) >= limit for key, limit in keys)
+
+
+def record_failure(request, mobile):
+    window = getattr(settings, 'LOGIN_FAILURE_WINDOW_SECONDS', DEFAULT_WINDOW_SECONDS)
+    for key, _ in throttle_keys(request, mobile):
+        # add() starts the window on the first failure, incr() keeps its expiry
+        cache.add(key, 0, window)
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Expired between add() and incr()
+            cache.set(key, 1, window)
+
+
+def reset_failures(mobile):
+    key = mobile_key(mobile)
+    if key:
+        cache.delete(f'login-fail:mobile:{key}')
@@ -1,43 +1,32 @@
 from django.core.management.base import BaseCommand
-from acc_intro.models import NewPersonalProfile, NewFamilyMember
+from django.db import transaction
+from acc_intro.models import NewPersonalProfile, NewFamilyMember, NumberSequence
 
 
 class Command(BaseCommand):
     help = 'Assign sequential numbers to existing users and family members'
 
+    def assign(self, queryset, field, sequence, label):
+        """Number every row of queryset from one reserved block and save them with bulk_update"""
+        rows = list(queryset.filter(**{f'{field}__isnull': True}).order_by('id'))
+        if not rows:
+            return 0
+
+        # Reserved before the transaction, so the counter is not locked while the rows are written
+        first = NumberSequence.allocate(sequence, len(rows))
+        with transaction.atomic():
+            for offset, row in enumerate(rows):
+                setattr(row, field, first + offset)
+                self.stdout.write(f'Assigned {label} number {first + offset} to {row.surname} {row.name}')
+            queryset.model.objects.bulk_update(rows, [field], batch_size=500)
+        return len(rows)
+
     def handle(self, *args, **options):
-        # Assign user numbers to main users
-        main_users = NewPersonalProfile.objects.filter(user_number__isnull=True).order_by('id')
-        user_counter = 1
-        
-        # Get the highest existing user number
-        last_user = NewPersonalProfile.objects.exclude(user_number__isnull=True).order_by('-user_number').first()
-        if last_user:
-            user_counter = last_user.user_number + 1
-        
-        for user in main_users:
-            user.user_number = user_counter
-            user.save()
-            self.stdout.write(f'Assigned user number {user_counter} to {user.surname} {user.name}')
-            user_counter += 1
-        
-        # Assign member numbers to family members
-        family_members = NewFamilyMember.objects.filter(member_number__isnull=True).order_by('id')
-        member_counter = 1
-        
-        # Get the highest existing member number
-        last_member = NewFamilyMember.objects.exclude(member_number__isnull=True).order_by('-member_number').first()
-        if last_member:
-            member_counter = last_member.member_number + 1
-        
-        for member in family_members:
-            member.member_number = member_counter
-            member.save()
-            self.stdout.write(f'Assigned member number {member_counter} to {member.surname} {member.name}')
-            member_counter += 1
-        
+        users = self.assign(NewPersonalProfile.objects.all(), 'user_number', 'user_number', 'user')
+        members = self.assign(NewFamilyMember.objects.all(), 'member_number', 'member_number', 'member')
+
         self.stdout.write(
             self.style.SUCCESS(
-                f'Successfully assigned numbers to {main_users.count()} users and {family_members.count()} family members'
+                f'Successfully assigned numbers to {users} users and {members} family members'
             )
-        )
\ No newline at end of file
+        )
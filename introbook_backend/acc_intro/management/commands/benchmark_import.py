@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the Excel import views on the sample workbooks (every import is rolled back)'
+
+    def add_arguments(self, parser):
+        from acc_intro.import_benchmark import IMPORT_VARIANTS
+
+        parser.add_argument('--folder', help='Folder with .xlsx workbooks (default: finalpithoridarwajanamawali/)')
+        parser.add_argument('--variant', action='append', choices=sorted(IMPORT_VARIANTS),
+                            help='Variant to run, can be repeated (default: all)')
+        parser.add_argument('--limit', type=int, help='Only use the first N workbooks')
+        parser.add_argument('--no-memory', action='store_true', help='Skip tracemalloc so the timings are not slowed down')
+
+    def handle(self, *args, **options):
+        from acc_intro.import_benchmark import IMPORT_VARIANTS, sample_workbooks, run_import_benchmark
+
+        paths = sample_workbooks(options['folder'])
+        if options['limit']:
+            paths = paths[:options['limit']]
+        if not paths:
+            raise CommandError('No .xlsx workbooks found')
+        variants = options['variant'] or list(IMPORT_VARIANTS)
+
+        self.stdout.write(f'⏱ Benchmarking {len(variants)} import variants on {len(paths)} workbooks')
+        header = f"{'Variant':<20} {'Workbook':<28} {'Rows':>5} {'Rows/s':>8} {'Queries':>8} {'Peak MB':>8} {'Parse s':>8} {'DB s':>7} {'Created':>8}"
+        self.stdout.write(header)
+
+        for variant in variants:
+            totals = {'rows': 0, 'seconds': 0.0, 'queries': 0, 'parse_seconds': 0.0, 'db_seconds': 0.0, 'records_created': 0}
+            peak = None
+            for path in paths:
+                result = run_import_benchmark(path, variant, trace_memory=not options['no_memory'])
+                if result['status'] != 200:
+                    self.stdout.write(self.style.ERROR(f"  ❌ {variant} failed on {result['workbook']} (HTTP {result['status']})"))
+                    continue
+                for key in totals:
+                    totals[key] += result[key]
+                if result['peak_memory'] is not None:
+                    peak = max(peak or 0, result['peak_memory'])
+                self.stdout.write(self.format_row(variant, result['workbook'], result, result['peak_memory']))
+
+            totals['rows_per_second'] = totals['rows'] / totals['seconds'] if totals['seconds'] else 0.0
+            self.stdout.write(self.style.SUCCESS(self.format_row(variant, 'TOTAL', totals, peak)))
+
+    def format_row(self, variant, workbook, result, peak_memory):
+        peak = f'{peak_memory / (1024 * 1024):.1f}' if peak_memory is not None else '-'
+        return (
+            f"{variant:<20} {workbook:<28} {result['rows']:>5} {result['rows_per_second']:>8.0f} {result['queries']:>8} "
+            f"{peak:>8} {result['parse_seconds']:>8.2f} {result['db_seconds']:>7.2f} {result['records_created']:>8}"
+        )
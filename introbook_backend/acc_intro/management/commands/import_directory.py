@@ -0,0 +1,111 @@
+import contextlib
+import glob
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+
+
+def parse_workbook(path):
+    """Parse one workbook into family records (runs in a worker process, no database access)"""
+    import pandas as pd
+    from acc_intro.excel_families import partition_families
+    from acc_intro.excel_upload import build_family_record
+
+    started = time.time()
+    records = []
+    invalid = 0
+    errors = 0
+    # The parsers print a line for every row, keep that out of the command's output
+    with contextlib.redirect_stdout(io.StringIO()):
+        df = pd.read_excel(path)
+        families = partition_families(df)
+        for family in families:
+            try:
+                record = build_family_record(family)
+            except Exception:
+                errors += 1
+                continue
+            if record is None:
+                invalid += 1
+            else:
+                records.append(record)
+
+    return {
+        'name': os.path.basename(path),
+        'rows': len(df),
+        'families': len(families),
+        'records': records,
+        'invalid': invalid,
+        'errors': errors,
+        'parse_seconds': time.time() - started,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Import every Excel workbook in a folder (e.g. finalpithoridarwajanamawali/), parsing them in parallel'
+
+    def add_arguments(self, parser):
+        parser.add_argument('folder', help='Folder with one .xlsx workbook per sakh')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Number of parser processes')
+
+    def handle(self, *args, **options):
+        from acc_intro.bulk_import import BulkImportWriter
+        from acc_intro.excel_upload import save_family_record
+
+        folder = options['folder']
+        if not os.path.isdir(folder):
+            raise CommandError(f'Folder not found: {folder}')
+
+        paths = sorted(glob.glob(os.path.join(folder, '*.xlsx')))
+        # Skip Excel lock files like ~$BHOJAVAT-56.xlsx
+        paths = [path for path in paths if not os.path.basename(path).startswith('~$')]
+        if not paths:
+            raise CommandError(f'No .xlsx files found in {folder}')
+
+        workers = max(1, min(options['workers'], len(paths)))
+        self.stdout.write(f'📂 Importing {len(paths)} workbooks from {folder} with {workers} parser processes')
+
+        started = time.time()
+        writer = BulkImportWriter()
+        summaries = []
+
+        # Workers only parse; this process is the single writer, so the bulk inserts never race.
+        # map() returns results in file order, which keeps user numbers in the same order every run.
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as executor:
+            for result in executor.map(parse_workbook, paths):
+                created = 0
+                skipped = 0
+                failed = result['errors']
+                with contextlib.redirect_stdout(io.StringIO()):
+                    for record in result['records']:
+                        outcome = save_family_record(record, writer)
+                        if outcome == 'created':
+                            created += 1
+                        elif outcome == 'skipped':
+                            skipped += 1
+                        else:
+                            failed += 1
+                    writer.flush()
+
+                summaries.append({**result, 'created': created, 'skipped': skipped, 'failed': failed})
+                self.stdout.write(f"  ✓ {result['name']}: {created} created, {skipped} skipped")
+
+        self.stdout.write('')
+        self.stdout.write(f"{'File':<30} {'Rows':>6} {'Families':>9} {'Created':>8} {'Skipped':>8} {'No mobile':>10} {'Failed':>7} {'Parse s':>8}")
+        for summary in summaries:
+            self.stdout.write(
+                f"{summary['name']:<30} {summary['rows']:>6} {summary['families']:>9} {summary['created']:>8} "
+                f"{summary['skipped']:>8} {summary['invalid']:>10} {summary['failed']:>7} {summary['parse_seconds']:>8.2f}"
+            )
+
+        written = writer.written
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {written['profiles']} users and {written['members']} family members "
+                f"from {len(paths)} workbooks in {time.time() - started:.1f}s"
+            )
+        )
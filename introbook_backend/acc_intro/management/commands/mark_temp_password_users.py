@@ -0,0 +1,61 @@
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from acc_intro.authentication import invalidate_user_auth
+from acc_intro.models import NewPersonalProfile
+
+
+class Command(BaseCommand):
+    help = "Make the old 'temp123' import passwords unusable and set password_change_required from each user's password (migration 0028 does this for the @temp.com users; this checks everyone)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many users would be changed without making changes',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+
+        # Every usable password is checked whatever the profile flag says: the old imports set the flag
+        # on their temp123 users, and the old reset flows never cleared it
+        users = User.objects.exclude(password='').exclude(password__startswith=UNUSABLE_PASSWORD_PREFIX).select_related('new_profile')
+        checked = 0
+        marked = 0
+        cleared = 0
+        for user in users.iterator():
+            checked += 1
+            try:
+                profile = user.new_profile
+            except NewPersonalProfile.DoesNotExist:
+                profile = None
+
+            # One PBKDF2 check per user, once, instead of one on every mobile login request
+            if user.check_password('temp123'):
+                marked += 1
+                if dry_run:
+                    self.stdout.write(f'  Would mark {user.username} as not activated')
+                    continue
+                user.set_unusable_password()
+                user.save(update_fields=['password'])
+                if profile is not None and not profile.password_change_required:
+                    profile.password_change_required = True
+                    profile.save(update_fields=['password_change_required'])
+                invalidate_user_auth(user.id)
+            elif profile is not None and profile.password_change_required:
+                cleared += 1
+                if dry_run:
+                    self.stdout.write(f'  Would mark {user.username} as activated (has their own password)')
+                    continue
+                profile.password_change_required = False
+                profile.save(update_fields=['password_change_required'])
+
+        if dry_run:
+            self.stdout.write(self.style.WARNING(
+                f'DRY RUN: {marked} of {checked} users still have the temp123 password, {cleared} flagged users have their own'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ Marked {marked} of {checked} users as not activated, cleared the flag of {cleared} users with their own password'
+            ))
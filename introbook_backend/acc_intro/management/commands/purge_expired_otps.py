@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Delete expired one-time codes from the OTP backend (run it from cron)'
+
+    def handle(self, *args, **options):
+        from acc_intro.otp_store import get_otp_backend
+
+        deleted = get_otp_backend().purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'🧹 Removed {deleted} expired OTPs'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from acc_intro.directory import rebuild_directory
+from acc_intro.models import NewPersonalProfile
+from acc_intro.search import SEARCH_FIELDS, update_search_columns
+
+
+class Command(BaseCommand):
+    help = 'Recompute the search columns of every profile and rebuild the member directory (after changing the transliteration tables)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Profiles written per bulk_update')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        fields = ['search_document', 'search_key']
+        profiles = NewPersonalProfile.objects.only('id', *SEARCH_FIELDS, *fields).order_by('id')
+
+        checked = 0
+        changed = []
+        updated = 0
+        for profile in profiles.iterator(chunk_size=batch_size):
+            checked += 1
+            before = (profile.search_document, profile.search_key)
+            update_search_columns(profile)
+            if (profile.search_document, profile.search_key) != before:
+                changed.append(profile)
+            if len(changed) >= batch_size:
+                NewPersonalProfile.objects.bulk_update(changed, fields)
+                updated += len(changed)
+                changed = []
+        if changed:
+            NewPersonalProfile.objects.bulk_update(changed, fields)
+            updated += len(changed)
+
+        self.stdout.write(self.style.SUCCESS(f'✅ Rebuilt search columns: {updated} of {checked} profiles changed'))
+
+        entries = rebuild_directory(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'✅ Rebuilt the directory: {entries} people'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Fail import jobs whose worker exited and import the pending jobs no worker started (run it from cron)'
+
+    def handle(self, *args, **options):
+        from acc_intro.import_jobs import fail_stale_jobs, run_import_job, stale_pending_jobs
+
+        failed = fail_stale_jobs()
+        self.stdout.write(self.style.SUCCESS(f'🧹 Marked {failed} stalled import jobs as failed'))
+
+        for job_id in stale_pending_jobs().values_list('id', flat=True):
+            job = run_import_job(job_id)
+            if job is not None:
+                self.stdout.write(self.style.SUCCESS(
+                    f'✅ Import job #{job.id} {job.status}: created {job.records_created}, skipped {job.records_skipped}'
+                ))
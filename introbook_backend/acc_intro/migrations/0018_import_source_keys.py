@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acc_intro', '0017_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newfamilymember',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='newfamilymember',
+            name='source_key',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='newpersonalprofile',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+        migrations.AddField(
+            model_name='newpersonalprofile',
+            name='source_key',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:30
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def seed_sequences(apps, schema_editor):
+    """Start both counters after the highest number already in use"""
+    NumberSequence = apps.get_model('acc_intro', 'NumberSequence')
+    NewPersonalProfile = apps.get_model('acc_intro', 'NewPersonalProfile')
+    NewFamilyMember = apps.get_model('acc_intro', 'NewFamilyMember')
+    last_user = NewPersonalProfile.objects.aggregate(last=Max('user_number'))['last'] or 0
+    last_member = NewFamilyMember.objects.aggregate(last=Max('member_number'))['last'] or 0
+    NumberSequence.objects.create(name='user_number', last_value=last_user)
+    NumberSequence.objects.create(name='member_number', last_value=last_member)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acc_intro', '0018_import_source_keys'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_value', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_sequences, migrations.RunPython.noop),
+    ]
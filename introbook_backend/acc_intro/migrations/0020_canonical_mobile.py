@@ -0,0 +1,50 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:33
+
+from django.db import migrations, models
+
+
+# mobile_utils.mobile_key() as it was when this migration was written
+def mobile_key(mobile):
+    if not mobile:
+        return ''
+    digits = ''.join(ch for ch in str(mobile) if ch.isdigit())
+    if digits.startswith('91') and len(digits) == 12:
+        digits = digits[2:]
+    return digits
+
+
+def backfill_canonical_mobiles(apps, schema_editor):
+    """Store the canonical form of every mobile number already in the database"""
+    for model_name, field in (('NewPersonalProfile', 'mobileNumber'), ('NewFamilyMember', 'mobileNumber'), ('FamilyMemberAuth', 'mobile_number')):
+        model = apps.get_model('acc_intro', model_name)
+        rows = []
+        for row in model.objects.exclude(**{field: ''}).only('id', field).iterator():
+            row.canonical_mobile = mobile_key(getattr(row, field))
+            rows.append(row)
+        model.objects.bulk_update(rows, ['canonical_mobile'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acc_intro', '0019_numbersequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='familymemberauth',
+            name='canonical_mobile',
+            field=models.CharField(blank=True, db_index=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='newfamilymember',
+            name='canonical_mobile',
+            field=models.CharField(blank=True, db_index=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='newpersonalprofile',
+            name='canonical_mobile',
+            field=models.CharField(blank=True, db_index=True, max_length=20),
+        ),
+        migrations.RunPython(backfill_canonical_mobiles, migrations.RunPython.noop),
+    ]
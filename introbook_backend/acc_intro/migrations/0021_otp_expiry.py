@@ -0,0 +1,30 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acc_intro', '0020_canonical_mobile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='otp',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='otp',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='otp',
+            name='mobile',
+            field=models.CharField(db_index=True, max_length=15),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.4 on 2026-10-18 13:53
+
+import unicodedata
+from django.db import migrations, models
+
+TRIGRAM_INDEX = 'acc_intro_profile_search_trgm'
+
+# The helpers of search.py as they were when this migration was written
+SEARCH_FIELDS = ('surname', 'name', 'fatherName', 'sakh', 'city', 'area')
+
+
+def search_text(value):
+    """Lowercase words of value separated by single spaces, without punctuation"""
+    value = unicodedata.normalize('NFKC', str(value or '')).casefold()
+    chars = [ch if unicodedata.category(ch)[0] in 'LMN' else ' ' for ch in value]
+    return ' '.join(''.join(chars).split())
+
+
+def search_document(profile):
+    return search_text(' '.join(getattr(profile, field, '') or '' for field in SEARCH_FIELDS))
+
+
+def backfill_search_documents(apps, schema_editor):
+    """Build the search document of every profile already in the database"""
+    NewPersonalProfile = apps.get_model('acc_intro', 'NewPersonalProfile')
+    rows = []
+    for profile in NewPersonalProfile.objects.only('id', *SEARCH_FIELDS).iterator():
+        profile.search_document = search_document(profile)
+        rows.append(profile)
+    NewPersonalProfile.objects.bulk_update(rows, ['search_document'], batch_size=500)
+
+
+def create_trigram_index(apps, schema_editor):
+    # pg_trgm is PostgreSQL only; other databases use the simple search backend without an index
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} ON acc_intro_newpersonalprofile '
+        'USING gin (search_document gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {TRIGRAM_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acc_intro', '0021_otp_expiry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newpersonalprofile',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(backfill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,210 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:00
+
+import re
+import unicodedata
+from functools import lru_cache
+import django.db.models.deletion
+from django.db import migrations, models
+
+TRIGRAM_INDEXES = {
+    'acc_intro_directory_document_trgm': 'search_document',
+    'acc_intro_directory_key_trgm': 'search_key',
+}
+
+# The helpers of search.py, transliteration.py and directory.py as they were when this migration
+# was written, limited to the columns DirectoryEntry has here (0025 and 0026 fill in the others)
+SEARCH_FIELDS = ('surname', 'name', 'fatherName', 'sakh', 'city', 'area')
+
+# Consonants carry an inherent 'a' unless a vowel sign or the virama follows
+GUJARATI_CONSONANTS = {
+    'ક': 'k', 'ખ': 'kh', 'ગ': 'g', 'ઘ': 'gh', 'ઙ': 'n',
+    'ચ': 'ch', 'છ': 'chh', 'જ': 'j', 'ઝ': 'jh', 'ઞ': 'n',
+    'ટ': 't', 'ઠ': 'th', 'ડ': 'd', 'ઢ': 'dh', 'ણ': 'n',
+    'ત': 't', 'થ': 'th', 'દ': 'd', 'ધ': 'dh', 'ન': 'n',
+    'પ': 'p', 'ફ': 'f', 'બ': 'b', 'ભ': 'bh', 'મ': 'm',
+    'ય': 'y', 'ર': 'r', 'લ': 'l', 'ળ': 'l', 'વ': 'v',
+    'શ': 'sh', 'ષ': 'sh', 'સ': 's', 'હ': 'h',
+}
+GUJARATI_VOWELS = {
+    'અ': 'a', 'આ': 'a', 'ઇ': 'i', 'ઈ': 'i', 'ઉ': 'u', 'ઊ': 'u', 'ઋ': 'ru',
+    'એ': 'e', 'ઐ': 'ai', 'ઓ': 'o', 'ઔ': 'au', 'ઍ': 'e', 'ઑ': 'o',
+}
+GUJARATI_VOWEL_SIGNS = {
+    'ા': 'a', 'િ': 'i', 'ી': 'i', 'ુ': 'u', 'ૂ': 'u', 'ૃ': 'ru',
+    'ે': 'e', 'ૈ': 'ai', 'ો': 'o', 'ૌ': 'au', 'ૅ': 'e', 'ૉ': 'o',
+}
+GUJARATI_OTHER = {
+    'ં': 'n', 'ઁ': 'n', 'ઃ': 'h', '઼': '',
+    '૦': '0', '૧': '1', '૨': '2', '૩': '3', '૪': '4', '૫': '5', '૬': '6', '૭': '7', '૮': '8', '૯': '9',
+}
+# Conjuncts that are not pronounced like their parts
+GUJARATI_CONJUNCTS = {'જ્ઞ': 'gn', 'ક્ષ': 'ksh'}
+VIRAMA = '્'
+
+# Applied in order to the Latin spelling; they fold the common ways of writing the same sound
+CONSONANT = '[b-df-hj-np-tv-z]'
+LATIN_FOLDS = (
+    (r'ee', 'i'), (r'oo', 'u'),
+    (r'ph', 'f'),
+    (r'sh', 's'),
+    (r'(?<=[bdgjkpt])h', ''),    # aspirates: bh -> b, kh -> k, th -> t
+    (r'w', 'v'), (r'z', 'j'), (r'q', 'k'), (r'x', 'ks'),
+    (r'c(?!h)', 'k'),
+    (r'(.)\1+', r'\1'),          # pattel -> patel, chh -> ch
+    (rf'(?<={CONSONANT})a(?={CONSONANT})', ''),
+    (r'(.)\1+', r'\1'),
+)
+LATIN_FOLD_PATTERNS = [(re.compile(pattern), replacement) for pattern, replacement in LATIN_FOLDS]
+
+
+def transliterate_gujarati(word):
+    """Latin spelling of a Gujarati word; other characters are left as they are"""
+    # (letter, vowel) units: vowel None is the inherent 'a', '' a consonant closed by the virama
+    units = []
+    index = 0
+    while index < len(word):
+        conjunct = next((c for c in GUJARATI_CONJUNCTS if word.startswith(c, index)), None)
+        if conjunct:
+            units.append([GUJARATI_CONJUNCTS[conjunct], None])
+            index += len(conjunct)
+            continue
+        ch = word[index]
+        index += 1
+        if ch in GUJARATI_CONSONANTS:
+            units.append([GUJARATI_CONSONANTS[ch], None])
+        elif ch in GUJARATI_VOWEL_SIGNS and units and units[-1][1] is None:
+            units[-1][1] = GUJARATI_VOWEL_SIGNS[ch]
+        elif ch == VIRAMA and units and units[-1][1] is None:
+            units[-1][1] = ''
+        elif ch in GUJARATI_VOWELS:
+            units.append(['', GUJARATI_VOWELS[ch]])
+        else:
+            units.append([GUJARATI_OTHER.get(ch, ch), ''])
+
+    letters = []
+    for position, (letter, vowel) in enumerate(units):
+        if vowel is None:
+            # The inherent 'a' is not pronounced at the end of a word (પટેલ: patel, but ન: na)
+            vowel = '' if position == len(units) - 1 and position > 0 else 'a'
+        letters.append(letter + vowel)
+    return ''.join(letters)
+
+
+def fold_latin(word):
+    """Lowercase ASCII spelling with the LATIN_FOLDS applied"""
+    word = unicodedata.normalize('NFKD', word.casefold())
+    word = ''.join(ch for ch in word if not unicodedata.combining(ch))
+    for pattern, replacement in LATIN_FOLD_PATTERNS:
+        word = pattern.sub(replacement, word)
+    return word
+
+
+@lru_cache(maxsize=50000)
+def word_key(word):
+    """The phonetic key of one word in either script"""
+    return fold_latin(transliterate_gujarati(word))
+
+
+def phonetic_key(text):
+    """Phonetic keys of the words of text (normalized with search_text), each word once"""
+    keys = []
+    for word in text.split():
+        key = word_key(word)
+        if key and key not in keys:
+            keys.append(key)
+    return ' '.join(keys)
+
+
+def search_text(value):
+    """Lowercase words of value separated by single spaces, without punctuation"""
+    value = unicodedata.normalize('NFKC', str(value or '')).casefold()
+    chars = [ch if unicodedata.category(ch)[0] in 'LMN' else ' ' for ch in value]
+    return ' '.join(''.join(chars).split())
+
+
+def search_document(profile):
+    return search_text(' '.join(getattr(profile, field, '') or '' for field in SEARCH_FIELDS))
+
+
+def entry_fields(person, relation, age):
+    document = search_document(person)
+    return {
+        'surname': person.surname or '',
+        'name': person.name or '',
+        'gender': person.gender or '',
+        'city': person.city or '',
+        'sakh': person.sakh or '',
+        'relation': (relation or '').strip().lower()[:20],
+        'age': age,
+        'city_key': phonetic_key(search_text(person.city))[:100],
+        'sakh_key': phonetic_key(search_text(person.sakh))[:100],
+        'search_document': document,
+        'search_key': phonetic_key(document),
+    }
+
+
+def build_directory(apps, schema_editor):
+    """One entry for the head of every family and one for every family member"""
+    NewPersonalProfile = apps.get_model('acc_intro', 'NewPersonalProfile')
+    NewFamilyMember = apps.get_model('acc_intro', 'NewFamilyMember')
+    DirectoryEntry = apps.get_model('acc_intro', 'DirectoryEntry')
+    rows = [
+        DirectoryEntry(profile_id=profile.id, **entry_fields(profile, 'self', profile.age))
+        for profile in NewPersonalProfile.objects.iterator()
+    ]
+    rows += [
+        DirectoryEntry(profile_id=member.profile_id, member_id=member.id, **entry_fields(member, member.relation, member.memberAge))
+        for member in NewFamilyMember.objects.iterator()
+    ]
+    DirectoryEntry.objects.bulk_create(rows, batch_size=500)
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # PostgreSQL only, like migrations 0022 and 0023
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in TRIGRAM_INDEXES.items():
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON acc_intro_directoryentry USING gin ({column} gin_trgm_ops)'
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in TRIGRAM_INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acc_intro', '0023_profile_search_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirectoryEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('surname', models.CharField(blank=True, max_length=100)),
+                ('name', models.CharField(blank=True, max_length=100)),
+                ('gender', models.CharField(blank=True, max_length=10)),
+                ('city', models.CharField(blank=True, max_length=100)),
+                ('sakh', models.CharField(blank=True, max_length=100)),
+                ('relation', models.CharField(blank=True, db_index=True, max_length=20)),
+                ('age', models.PositiveIntegerField(blank=True, db_index=True, null=True)),
+                ('city_key', models.CharField(blank=True, db_index=True, max_length=100)),
+                ('sakh_key', models.CharField(blank=True, db_index=True, max_length=100)),
+                ('search_document', models.TextField(blank=True)),
+                ('search_key', models.TextField(blank=True)),
+                ('member', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='directory_entry', to='acc_intro.newfamilymember')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='directory_entries', to='acc_intro.newpersonalprofile')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(condition=models.Q(('member__isnull', True)), fields=('profile',), name='unique_directory_head')],
+            },
+        ),
+        migrations.RunPython(build_directory, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
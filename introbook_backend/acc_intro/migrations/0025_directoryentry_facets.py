@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+FACET_FIELDS = ('caste', 'education', 'maritalStatus', 'bloodGroup')
+
+
+def backfill_facets(apps, schema_editor):
+    """Copy the facet values of every person onto their directory entry"""
+    DirectoryEntry = apps.get_model('acc_intro', 'DirectoryEntry')
+    rows = []
+    for entry in DirectoryEntry.objects.select_related('profile', 'member').iterator(chunk_size=500):
+        person = entry.member or entry.profile
+        for field in FACET_FIELDS:
+            setattr(entry, field, (getattr(person, field) or '').strip())
+        rows.append(entry)
+    DirectoryEntry.objects.bulk_update(rows, FACET_FIELDS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acc_intro', '0024_directoryentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='directoryentry',
+            name='bloodGroup',
+            field=models.CharField(blank=True, db_index=True, max_length=5),
+        ),
+        migrations.AddField(
+            model_name='directoryentry',
+            name='caste',
+            field=models.CharField(blank=True, db_index=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='directoryentry',
+            name='education',
+            field=models.CharField(blank=True, db_index=True, max_length=30),
+        ),
+        migrations.AddField(
+            model_name='directoryentry',
+            name='maritalStatus',
+            field=models.CharField(blank=True, db_index=True, max_length=20),
+        ),
+        migrations.RunPython(backfill_facets, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:08
+
+import unicodedata
+from django.db import migrations, models
+
+
+# search.search_text() as it was when this migration was written
+def search_text(value):
+    """Lowercase words of value separated by single spaces, without punctuation"""
+    value = unicodedata.normalize('NFKC', str(value or '')).casefold()
+    chars = [ch if unicodedata.category(ch)[0] in 'LMN' else ' ' for ch in value]
+    return ' '.join(''.join(chars).split())
+
+
+def backfill_name_text(apps, schema_editor):
+    """Both name orders of every entry, from the surname and name it already has"""
+    DirectoryEntry = apps.get_model('acc_intro', 'DirectoryEntry')
+    rows = []
+    for entry in DirectoryEntry.objects.only('id', 'surname', 'name').iterator(chunk_size=500):
+        entry.name_text = search_text(f'{entry.surname} {entry.name}')[:255]
+        entry.reversed_name_text = search_text(f'{entry.name} {entry.surname}')[:255]
+        rows.append(entry)
+    DirectoryEntry.objects.bulk_update(rows, ['name_text', 'reversed_name_text'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acc_intro', '0025_directoryentry_facets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='directoryentry',
+            name='name_text',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='directoryentry',
+            name='reversed_name_text',
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.RunPython(backfill_name_text, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='directoryentry',
+            index=models.Index(fields=['name_text'], name='acc_intro_directory_name_pfx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='directoryentry',
+            index=models.Index(fields=['reversed_name_text'], name='acc_intro_directory_rname_pfx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
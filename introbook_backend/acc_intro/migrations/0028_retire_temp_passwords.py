@@ -0,0 +1,55 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:20
+
+from django.conf import settings
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX, check_password, make_password
+from django.db import migrations
+from django.db.models import Q
+
+# The password the old Excel imports gave every user, and the email they gave them with it
+LEGACY_PASSWORD = 'temp123'
+LEGACY_EMAIL_SUFFIX = '@temp.com'
+BATCH_SIZE = 500
+
+
+def retire_temp_passwords(apps, schema_editor):
+    """Make the temp123 passwords unusable and set password_change_required from the password itself.
+
+    Users are checked whatever their flag says: the old imports flagged their users, and the old reset
+    flows never cleared the flag. A check is a full PBKDF2 hash, so only the users the old imports
+    created (a {mobile}@temp.com email) are checked here; mark_temp_password_users checks the rest
+    outside the deploy.
+    """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    NewPersonalProfile = apps.get_model('acc_intro', 'NewPersonalProfile')
+
+    imported = Q(email__endswith=LEGACY_EMAIL_SUFFIX) | Q(
+        id__in=NewPersonalProfile.objects.filter(email__endswith=LEGACY_EMAIL_SUFFIX).values('user_id')
+    )
+    candidates = User.objects.filter(imported).exclude(password='').exclude(password__startswith=UNUSABLE_PASSWORD_PREFIX)
+    temp_users = []
+    for user in candidates.only('id', 'password').iterator():
+        if check_password(LEGACY_PASSWORD, user.password):
+            user.password = make_password(None)
+            temp_users.append(user)
+    User.objects.bulk_update(temp_users, ['password'], batch_size=BATCH_SIZE)
+
+    temp_ids = [user.id for user in temp_users]
+    for start in range(0, len(temp_ids), BATCH_SIZE):
+        NewPersonalProfile.objects.filter(user_id__in=temp_ids[start:start + BATCH_SIZE]).update(password_change_required=True)
+    # Everyone else with a usable password has chosen it, or still has temp123 under an email they
+    # changed, which mark_temp_password_users finds
+    NewPersonalProfile.objects.filter(password_change_required=True).exclude(
+        user__password__startswith=UNUSABLE_PASSWORD_PREFIX
+    ).update(password_change_required=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('acc_intro', '0027_importjob_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(retire_temp_passwords, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,101 @@
+# Mobile number helpers shared by the importers and the login views.
+# Numbers arrive as '9825012345', '+919825012345', '91 98250-12345' and so on; mobile_key()
+# reduces all of them to the same 10 digit string so they can be compared. The models store it
+# in an indexed canonical_mobile column, and resolve_mobile_identities() looks a login up in one query.
+# (models.py imports this module, so the model imports stay inside the functions.)
+
+from collections import namedtuple
+
+# kind is 'family_member' (a FamilyMemberAuth login), 'main_user' (a NewPersonalProfile) or 'user'
+# (an account matched only by its username, e.g. one created in the admin)
+MobileIdentity = namedtuple('MobileIdentity', ['kind', 'user', 'profile', 'family_auth_id'])
+IDENTITY_ORDER = {'family_member': 0, 'main_user': 1, 'user': 2}
+
+
+def mobile_key(mobile):
+    """Canonical form of a mobile number: digits only, without the 91 country code"""
+    if not mobile:
+        return ''
+    digits = ''.join(ch for ch in str(mobile) if ch.isdigit())
+    if digits.startswith('91') and len(digits) == 12:
+        digits = digits[2:]
+    return digits
+
+
+def mobile_variants(mobile):
+    """Forms a mobile may have been saved in as a username ('9825012345', '919825012345', '+919825012345')"""
+    key = mobile_key(mobile)
+    variants = {str(mobile).strip(), key}
+    if key:
+        variants.update({f'91{key}', f'+91{key}'})
+    return [variant for variant in variants if variant]
+
+
+def resolve_mobile_identities(mobile):
+    """Every account a mobile number logs in to, in one query, family member logins first.
+
+    The users are matched on the indexed canonical_mobile of their profile or active family login,
+    or on their username, and come back with their profile already joined.
+    """
+    from django.contrib.auth.models import User
+    from django.db.models import OuterRef, Q, Subquery
+    from .models import NewPersonalProfile, FamilyMemberAuth
+
+    key = mobile_key(mobile)
+    if not key:
+        return []
+    family_auths = FamilyMemberAuth.objects.filter(canonical_mobile=key, is_active=True)
+    users = (
+        User.objects
+        .filter(
+            Q(pk__in=NewPersonalProfile.objects.filter(canonical_mobile=key).values('user_id'))
+            | Q(pk__in=family_auths.values('user_id'))
+            | Q(username__in=mobile_variants(mobile))
+        )
+        .select_related('new_profile')
+        .annotate(family_auth_id=Subquery(family_auths.filter(user=OuterRef('pk')).order_by('id').values('id')[:1]))
+        .order_by('id')
+    )
+
+    identities = []
+    for user in users:
+        profile = getattr(user, 'new_profile', None)
+        if profile is not None and profile.canonical_mobile != key:
+            # Joined through the username or a family login, the profile belongs to another number
+            profile = None
+        if user.family_auth_id:
+            kind = 'family_member'
+        elif profile is not None:
+            kind = 'main_user'
+        else:
+            kind = 'user'
+        identities.append(MobileIdentity(kind, user, profile, user.family_auth_id))
+    identities.sort(key=lambda identity: IDENTITY_ORDER[identity.kind])
+    return identities
+
+
+def resolve_mobile_identity(mobile, kinds=None):
+    """The first account for a mobile number (optionally only of the given kinds), or None"""
+    for identity in resolve_mobile_identities(mobile):
+        if kinds is None or identity.kind in kinds:
+            return identity
+    return None
+
+
+def load_registered_mobiles():
+    """Keys of every mobile number that already has an account (usernames and profile mobiles).
+
+    Two queries in total, streamed with iterator() so large tables are not cached twice.
+    """
+    from django.contrib.auth.models import User
+    from .models import NewPersonalProfile
+
+    registered = set()
+    for username in User.objects.values_list('username', flat=True).iterator():
+        key = mobile_key(username)
+        if key:
+            registered.add(key)
+    registered.update(
+        NewPersonalProfile.objects.exclude(canonical_mobile='').values_list('canonical_mobile', flat=True).iterator()
+    )
+    return registered
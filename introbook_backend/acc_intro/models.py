@@ -1,5 +1,8 @@
-from django.db import models
+from django.db import DEFAULT_DB_ALIAS, models, connection, connections, transaction, IntegrityError
+from django.db.models import Max
 from django.contrib.auth.models import User
+from .mobile_utils import mobile_key
+from .search import update_search_columns
 
 # Create your models here.
 
@@ -20,9 +23,12 @@ class UserProfile(models.Model):
         )
 
 class OTP(models.Model):
-    mobile = models.CharField(max_length=15)
+    """One-time codes of the database OTP backend (see otp_store.py), keyed by canonical mobile"""
+    mobile = models.CharField(max_length=15, db_index=True)
     code = models.CharField(max_length=6)
     created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
 
     def __str__(self):
         return f"{self.mobile} - {self.code}"
@@ -50,6 +56,75 @@ class FamilyMember(models.Model):
     def __str__(self):
         return f"{self.first_name} {self.middle_name} {self.last_name} ({self.relation})"
 
+class NumberSequence(models.Model):
+    """Counter row behind user_number and member_number, so numbers never come from a MAX() lookup"""
+    # sequence name: (model, field) it numbers, used to seed a missing counter from the existing rows
+    SEQUENCE_FIELDS = {
+        'user_number': ('NewPersonalProfile', 'user_number'),
+        'member_number': ('NewFamilyMember', 'member_number'),
+    }
+
+    name = models.CharField(max_length=50, unique=True)
+    last_value = models.PositiveIntegerField(default=0)
+
+    @classmethod
+    def increment(cls, db_connection, name, count):
+        """Move the counter on by count and return the first number, None if there is no counter"""
+        table = db_connection.ops.quote_name(cls._meta.db_table)
+        with db_connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {table} SET last_value = last_value + %s WHERE name = %s RETURNING last_value',
+                [count, name]
+            )
+            row = cursor.fetchone()
+        return None if row is None else row[0] - count + 1
+
+    @classmethod
+    def allocate(cls, name, count=1):
+        """Reserve count consecutive numbers and return the first one.
+
+        A single UPDATE ... RETURNING increments the counter, so it is one round-trip and two
+        callers (signups, imports) can never be handed the same numbers.
+        """
+        first = cls.increment(connection, name, count)
+        if first is None:
+            cls.create_sequence(name)
+            return cls.allocate(name, count)
+        return first
+
+    @classmethod
+    def reserve(cls, name, count=1):
+        """allocate() for callers inside a long transaction (bulk imports).
+
+        The counter row stays locked until the transaction that updated it ends, which would make
+        every signup wait for the whole import. On PostgreSQL the block is reserved on a connection
+        of its own that commits straight away; numbers of an import that rolls back are lost, which
+        only leaves a gap. SQLite locks the whole database for any write, so there it is allocate().
+        """
+        if not connection.in_atomic_block or connection.vendor != 'postgresql':
+            return cls.allocate(name, count)
+        own_connection = connections.create_connection(DEFAULT_DB_ALIAS)
+        try:
+            first = cls.increment(own_connection, name, count)
+        finally:
+            own_connection.close()
+        # Migration 0019 creates the counters; a missing one is created in the caller's transaction
+        return cls.allocate(name, count) if first is None else first
+
+    @classmethod
+    def create_sequence(cls, name):
+        """Create a missing counter, starting after the highest number already in use"""
+        model_name, field = cls.SEQUENCE_FIELDS[name]
+        last_value = globals()[model_name].objects.aggregate(last=Max(field))['last'] or 0
+        try:
+            with transaction.atomic():
+                cls.objects.create(name=name, last_value=last_value)
+        except IntegrityError:
+            pass  # Created by a concurrent caller in the meantime
+
+    def __str__(self):
+        return f"{self.name}: {self.last_value}"
+
 class NewPersonalProfile(models.Model):
     GENDER_CHOICES = [
         ('male', 'Male'),
@@ -162,11 +237,23 @@ class NewPersonalProfile(models.Model):
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Excel import bookkeeping: which sheet family this profile came from and a hash of what was imported
+    source_key = models.CharField(max_length=64, blank=True, db_index=True)
+    content_hash = models.CharField(max_length=40, blank=True)
+    
+    # mobileNumber in canonical form (see mobile_utils.mobile_key), indexed for the login lookups
+    canonical_mobile = models.CharField(max_length=20, blank=True, db_index=True)
+    
+    # Normalized names and places for the family search (see search.py), trigram indexed on PostgreSQL,
+    # and their script-independent phonetic keys (transliteration.py)
+    search_document = models.TextField(blank=True, editable=False)
+    search_key = models.TextField(blank=True, editable=False)
+    
     def save(self, *args, **kwargs):
+        self.canonical_mobile = mobile_key(self.mobileNumber)
+        update_search_columns(self)
         if not self.user_number:
-            # Get the highest user number and add 1
-            last_user = NewPersonalProfile.objects.order_by('-user_number').first()
-            self.user_number = (last_user.user_number + 1) if last_user and last_user.user_number else 1
+            self.user_number = NumberSequence.allocate('user_number')
         super().save(*args, **kwargs)
     
     def get_user_id(self):
@@ -294,11 +381,16 @@ class NewFamilyMember(models.Model):
     
     created_at = models.DateTimeField(auto_now_add=True)
     
+    # Excel import bookkeeping: the member's row within its family and a hash of what was imported
+    source_key = models.CharField(max_length=255, blank=True)
+    content_hash = models.CharField(max_length=40, blank=True)
+    
+    canonical_mobile = models.CharField(max_length=20, blank=True, db_index=True)
+    
     def save(self, *args, **kwargs):
+        self.canonical_mobile = mobile_key(self.mobileNumber)
         if not self.member_number:
-            # Get the highest member number and add 1
-            last_member = NewFamilyMember.objects.order_by('-member_number').first()
-            self.member_number = (last_member.member_number + 1) if last_member and last_member.member_number else 1
+            self.member_number = NumberSequence.allocate('member_number')
         super().save(*args, **kwargs)
     
     def get_member_id(self):
@@ -308,11 +400,61 @@ class NewFamilyMember(models.Model):
     def __str__(self):
         return f"Member #{self.member_number} - {self.surname} {self.name} ({self.relation})"
 
+class DirectoryEntry(models.Model):
+    """One row per person in the directory, the head of a family (member is empty) or a family member.
+
+    Kept in step with the profiles and members by directory.py, so the member-level search filters and
+    searches one indexed table instead of scanning NewFamilyMember.
+    """
+    profile = models.ForeignKey(NewPersonalProfile, related_name='directory_entries', on_delete=models.CASCADE)
+    member = models.OneToOneField(NewFamilyMember, related_name='directory_entry', null=True, blank=True, on_delete=models.CASCADE)
+
+    # Shown in the results
+    surname = models.CharField(max_length=100, blank=True)
+    name = models.CharField(max_length=100, blank=True)
+    gender = models.CharField(max_length=10, blank=True)
+    city = models.CharField(max_length=100, blank=True)
+    sakh = models.CharField(max_length=100, blank=True)
+
+    # Filters: relation in lowercase ('self' for the head), city and sakh as phonetic keys so both scripts match
+    relation = models.CharField(max_length=20, blank=True, db_index=True)
+    age = models.PositiveIntegerField(null=True, blank=True, db_index=True)
+    city_key = models.CharField(max_length=100, blank=True, db_index=True)
+    sakh_key = models.CharField(max_length=100, blank=True, db_index=True)
+
+    # Facets of the directory browse (facets.py), as stored on the profile or member
+    caste = models.CharField(max_length=100, blank=True, db_index=True)
+    education = models.CharField(max_length=30, blank=True, db_index=True)
+    maritalStatus = models.CharField(max_length=20, blank=True, db_index=True)
+    bloodGroup = models.CharField(max_length=5, blank=True, db_index=True)
+
+    # 'surname name' and 'name surname' normalized by search_text(), for the autocomplete prefix match
+    name_text = models.CharField(max_length=255, blank=True)
+    reversed_name_text = models.CharField(max_length=255, blank=True)
+
+    # Same as on NewPersonalProfile (search.py), trigram indexed on PostgreSQL
+    search_document = models.TextField(blank=True)
+    search_key = models.TextField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['profile'], condition=models.Q(member__isnull=True), name='unique_directory_head'),
+        ]
+        indexes = [
+            # varchar_pattern_ops lets PostgreSQL use the index for LIKE 'prefix%' whatever the collation
+            models.Index(fields=['name_text'], name='acc_intro_directory_name_pfx', opclasses=['varchar_pattern_ops']),
+            models.Index(fields=['reversed_name_text'], name='acc_intro_directory_rname_pfx', opclasses=['varchar_pattern_ops']),
+        ]
+
+    def __str__(self):
+        return f"{self.surname} {self.name} ({self.relation})"
+
 class FamilyMemberAuth(models.Model):
     """Model to manage family member login access"""
     family_member = models.ForeignKey(NewFamilyMember, on_delete=models.CASCADE, related_name='auth_records')
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='family_auth')
     mobile_number = models.CharField(max_length=20, unique=True)
+    canonical_mobile = models.CharField(max_length=20, blank=True, db_index=True)
     password = models.CharField(max_length=255)  # Hashed password
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -321,6 +463,10 @@ class FamilyMemberAuth(models.Model):
     class Meta:
         unique_together = ['family_member', 'mobile_number']
 
+    def save(self, *args, **kwargs):
+        self.canonical_mobile = mobile_key(self.mobile_number)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.family_member.surname} {self.family_member.name} ({self.mobile_number})"
 
@@ -490,4 +636,34 @@ class FamilyUpdate(models.Model):
         ordering = ['-created_at']
 
     def __str__(self):
-        return f"{self.family.surname} - {self.title}"
\ No newline at end of file
+        return f"{self.family.surname} - {self.title}"
+
+class ImportJob(models.Model):
+    """Model to track an Excel upload that is imported in the background"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    file = models.FileField(upload_to='imports/')
+    original_name = models.CharField(max_length=255, blank=True)
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='import_jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    rows_processed = models.PositiveIntegerField(default=0)
+    families_processed = models.PositiveIntegerField(default=0)
+    records_created = models.PositiveIntegerField(default=0)
+    records_skipped = models.PositiveIntegerField(default=0)
+    records_failed = models.PositiveIntegerField(default=0)
+    errors = models.TextField(blank=True)  # One line per family that could not be imported
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Moves with every chunk, see import_jobs.fail_stale_jobs()
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"Import #{self.id} {self.original_name} ({self.status})"
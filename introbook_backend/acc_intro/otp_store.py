@@ -0,0 +1,139 @@
+# Storage for the one-time codes sent by the signup, login and password reset views.
+# The codes used to live in a dict in views.py, so an OTP issued by one gunicorn worker could not be
+# verified by another and nothing ever expired. The backends here keep every code with an expiry
+# time and a counter of wrong attempts, keyed by the canonical mobile (mobile_utils.mobile_key), so
+# '+919825012345' and '9825012345' share one code.
+#
+# settings.OTP_BACKEND picks the backend: 'database' (the default, the OTP table) or 'cache' (the
+# default Django cache, which has to be shared by the workers, e.g. Redis or Memcached; the
+# local-memory cache is per process). A dotted path to another OTPBackend subclass also works.
+
+import secrets
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from .mobile_utils import mobile_key
+
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_ATTEMPTS = 5
+
+
+class OTPBackend:
+    """Issue and check one-time codes; subclasses store them"""
+
+    def __init__(self, ttl_seconds=None, max_attempts=None):
+        self.ttl_seconds = ttl_seconds or getattr(settings, 'OTP_TTL_SECONDS', DEFAULT_TTL_SECONDS)
+        self.max_attempts = max_attempts or getattr(settings, 'OTP_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS)
+
+    def issue(self, mobile):
+        """Create a new 6 digit code for the mobile, replacing any earlier one, and return it"""
+        # secrets, not random: the codes guard logins and password resets
+        code = str(100000 + secrets.randbelow(900000))
+        self.store(mobile_key(mobile), code, timezone.now() + timedelta(seconds=self.ttl_seconds))
+        return code
+
+    def verify(self, mobile, code, consume=True):
+        """True if code is the live code of the mobile. A used code is removed unless consume=False.
+
+        Every wrong guess counts as an attempt; after max_attempts the code stops working.
+        """
+        if not mobile or not code:
+            return False
+        return self.check(mobile_key(mobile), str(code).strip(), consume)
+
+    def discard(self, mobile):
+        self.delete(mobile_key(mobile))
+
+    def purge_expired(self):
+        """Remove expired codes and return how many were removed"""
+        return 0
+
+    def store(self, key, code, expires_at):
+        raise NotImplementedError
+
+    def check(self, key, code, consume):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+
+class DatabaseOTPBackend(OTPBackend):
+    """Codes in the OTP table, visible to every worker that shares the database"""
+
+    def store(self, key, code, expires_at):
+        from .models import OTP
+
+        with transaction.atomic():
+            OTP.objects.filter(mobile=key).delete()
+            OTP.objects.create(mobile=key, code=code, expires_at=expires_at)
+
+    def check(self, key, code, consume):
+        from .models import OTP
+
+        otp = OTP.objects.filter(mobile=key, expires_at__gt=timezone.now()).order_by('-created_at').first()
+        if otp is None or otp.attempts >= self.max_attempts:
+            return False
+        if otp.code != code:
+            # F() so wrong guesses from several workers at once are all counted
+            OTP.objects.filter(pk=otp.pk).update(attempts=F('attempts') + 1)
+            return False
+        if consume:
+            otp.delete()
+        return True
+
+    def delete(self, key):
+        from .models import OTP
+
+        OTP.objects.filter(mobile=key).delete()
+
+    def purge_expired(self):
+        from .models import OTP
+
+        deleted, _ = OTP.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
+
+
+class CacheOTPBackend(OTPBackend):
+    """Codes in the Django cache, which expires them by itself"""
+
+    def cache_key(self, key):
+        return f'otp:{key}'
+
+    def store(self, key, code, expires_at):
+        cache.set(self.cache_key(key), {'code': code, 'expires_at': expires_at, 'attempts': 0}, self.ttl_seconds)
+
+    def check(self, key, code, consume):
+        entry = cache.get(self.cache_key(key))
+        if entry is None or entry['attempts'] >= self.max_attempts:
+            return False
+        remaining = (entry['expires_at'] - timezone.now()).total_seconds()
+        if remaining <= 0:
+            return False
+        if entry['code'] != code:
+            entry['attempts'] += 1
+            cache.set(self.cache_key(key), entry, remaining)
+            return False
+        if consume:
+            cache.delete(self.cache_key(key))
+        return True
+
+    def delete(self, key):
+        cache.delete(self.cache_key(key))
+
+
+OTP_BACKENDS = {
+    'database': DatabaseOTPBackend,
+    'cache': CacheOTPBackend,
+}
+
+
+def get_otp_backend():
+    """Return the backend configured in settings.OTP_BACKEND"""
+    name = getattr(settings, 'OTP_BACKEND', 'database')
+    backend_class = OTP_BACKENDS.get(name) or import_string(name)
+    return backend_class()
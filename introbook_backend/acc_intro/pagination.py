@@ -0,0 +1,121 @@
+# Keyset (cursor) pagination for the directory lists.
+# A page is read with "WHERE user_number >= 41 AND (user_number > 41 OR id > 7) ORDER BY user_number, id
+# LIMIT n": the leading key is a range, so the index on it is entered at the cursor and read in order,
+# and every page costs the same however far into the directory it is (OFFSET would scan and discard
+# all the rows before it). The cursor is the last row's key, base64 encoded, and the response carries
+# the URL of the next page.
+#
+# NULLs sort last in every key column. An "OR user_number IS NULL" in the condition would stop the
+# index from being used as a range, so the NULL rows of a nullable leading key (profiles imported
+# before user numbers existed) are read as a tail of their own after the others, ordered by the
+# following keys. Keys that cannot be NULL (id, profile_id) get no NULL condition at all.
+
+import base64
+import json
+from django.conf import settings
+from django.db.models import F, Q, prefetch_related_objects
+from rest_framework.exceptions import NotFound
+
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor, length):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeError):
+        raise NotFound('Invalid cursor')
+    if not isinstance(values, list) or len(values) != length:
+        raise NotFound('Invalid cursor')
+    return values
+
+
+def page_size_from(request, default=None):
+    """?page_size=N, capped at DIRECTORY_MAX_PAGE_SIZE"""
+    default = default or getattr(settings, 'DIRECTORY_PAGE_SIZE', DEFAULT_PAGE_SIZE)
+    maximum = getattr(settings, 'DIRECTORY_MAX_PAGE_SIZE', DEFAULT_MAX_PAGE_SIZE)
+    try:
+        size = int(request.query_params.get('page_size', default))
+    except (TypeError, ValueError):
+        size = default
+    return max(1, min(size, maximum))
+
+
+def is_nullable(model, field):
+    return model._meta.get_field(field.lstrip('-')).null
+
+
+def rows_after(model, ordering, values, leading=True):
+    """Q for the rows that come after values in ordering ('field' or '-field' for descending).
+
+    The NULL rows of a nullable leading key are left out, paginate_keyset() reads them separately.
+    """
+    field, name, value = ordering[0], ordering[0].lstrip('-'), values[0]
+    if value is None:
+        # NULLs are last, so only rows that are also NULL here and later on a following key remain
+        if len(ordering) == 1:
+            return Q(pk__in=[])
+        return Q(**{f'{name}__isnull': True}) & rows_after(model, ordering[1:], values[1:], leading=False)
+
+    after, from_ = ('lt', 'lte') if field.startswith('-') else ('gt', 'gte')
+    if len(ordering) == 1:
+        condition = Q(**{f'{name}__{after}': value})
+    else:
+        condition = Q(**{f'{name}__{from_}': value}) & (
+            Q(**{f'{name}__{after}': value}) | rows_after(model, ordering[1:], values[1:], leading=False)
+        )
+    if not leading and is_nullable(model, field):
+        condition |= Q(**{f'{name}__isnull': True})
+    return condition
+
+
+def paginate_keyset(request, queryset, ordering, default_page_size=None):
+    """Return (rows of the requested page, cursor of the next page or None).
+
+    ordering has to end in a unique field (id) so the cursor points at exactly one row.
+    """
+    order_by = [
+        F(field.lstrip('-')).desc(nulls_last=True) if field.startswith('-') else F(field).asc(nulls_last=True)
+        for field in ordering
+    ]
+    queryset = queryset.order_by(*order_by)
+    cursor = request.query_params.get('cursor')
+    values = decode_cursor(cursor, len(ordering)) if cursor else None
+    after = queryset.filter(rows_after(queryset.model, ordering, values)) if values else queryset
+
+    lead = ordering[0].lstrip('-')
+    if values and values[0] is not None and is_nullable(queryset.model, lead):
+        # after holds the rows with a value only, the NULL tail follows them
+        parts = [after, queryset.filter(**{f'{lead}__isnull': True})]
+    else:
+        # The first page (the ORDER BY alone walks the index), keys that are never NULL, or a cursor in
+        # the NULL tail already
+        parts = [after]
+
+    page_size = page_size_from(request, default_page_size)
+    # One row more than the page tells whether there is a next page, without a COUNT query
+    rows = []
+    for part in parts:
+        rows += part.prefetch_related(None)[:page_size + 1 - len(rows)]
+        if len(rows) > page_size:
+            break
+    # Once for the page, however many parts it came from
+    prefetch_related_objects(rows, *queryset._prefetch_related_lookups)
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, field.lstrip('-')) for field in ordering])
+    return rows, next_cursor
+
+
+def next_page_url(request, next_cursor):
+    if not next_cursor:
+        return None
+    params = request.query_params.copy()
+    params['cursor'] = next_cursor
+    return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
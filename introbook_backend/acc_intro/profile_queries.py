@@ -0,0 +1,31 @@
+# Annotations shared by the family card lists (featured, suggested, search and find connections).
+# Every card shows a member count, and suggestions a mutual connection count; annotating them
+# on the queryset keeps those lists at a fixed number of queries instead of one or two per card.
+
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from .models import FamilyConnection
+
+
+def with_member_counts(queryset, profile_path=''):
+    """Annotate members_count, the number of family members of each profile (without the main user).
+
+    profile_path points at the profile from another model, e.g. 'profile__' for FeaturedFamily.
+    """
+    return queryset.annotate(members_count=Count(f'{profile_path}family_members', distinct=True))
+
+
+def with_mutual_connections(queryset, profile):
+    """Annotate mutual_connections: families both profile and each row have an accepted connection to"""
+    connected = FamilyConnection.objects.filter(initiator=profile, status='accepted').values('receiver')
+    mutual = (
+        FamilyConnection.objects
+        .filter(initiator=OuterRef('pk'), status='accepted', receiver__in=connected)
+        .order_by()
+        .values('initiator')
+        .annotate(total=Count('id'))
+        .values('total')
+    )
+    return queryset.annotate(
+        mutual_connections=Coalesce(Subquery(mutual, output_field=IntegerField()), Value(0))
+    )
@@ -0,0 +1,104 @@
+# Who is calling: a family member logged in through FamilyMemberAuth, a main user with a
+# NewPersonalProfile, or neither. RequestIdentityMiddleware puts a lazy RequestIdentity on every
+# request as request.identity; the views ask it instead of querying FamilyMemberAuth and
+# NewPersonalProfile themselves, so each is looked up at most once per request.
+#
+# The identity only resolves when a view first uses it. By then DRF has authenticated the request
+# and copied the user onto the underlying HttpRequest, which is the request the middleware saw.
+#
+# The profile usually comes with the user from the token cache, so it can be a minute old: fine to
+# read, but views that save it load it with get_profile_for_update().
+
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.functional import cached_property
+
+
+class RequestIdentity:
+    """Role, own profile and family member login of request.user, each resolved once"""
+
+    def __init__(self, request):
+        self.request = request
+
+    @property
+    def user(self):
+        return self.request.user
+
+    @cached_property
+    def family_auth(self):
+        """The active FamilyMemberAuth of the user, with its member and the member's family, or None"""
+        from .models import FamilyMemberAuth
+
+        if not self.user.is_authenticated:
+            return None
+        return (
+            FamilyMemberAuth.objects
+            .select_related('family_member__profile')
+            .filter(user=self.user, is_active=True)
+            .first()
+        )
+
+    @cached_property
+    def profile(self):
+        """The user's own NewPersonalProfile, or None"""
+        if not self.user.is_authenticated:
+            return None
+        # CachedTokenAuthentication joins the profile onto the user, so this is usually free
+        try:
+            return self.user.new_profile
+        except ObjectDoesNotExist:
+            return None
+
+    @property
+    def role(self):
+        if self.family_auth is not None:
+            return 'family_member'
+        if self.profile is not None:
+            return 'main_user'
+        return 'user'
+
+    @property
+    def family_profile(self):
+        """The profile of the family the caller belongs to: their own, or the one they are a member of"""
+        if self.family_auth is not None:
+            return self.family_auth.family_member.profile
+        return self.profile
+
+    def get_family_auth(self):
+        """Like FamilyMemberAuth.objects.get(user=..., is_active=True)"""
+        from .models import FamilyMemberAuth
+
+        if self.family_auth is None:
+            raise FamilyMemberAuth.DoesNotExist('No active family member login for this user')
+        return self.family_auth
+
+    def get_profile(self):
+        """Like NewPersonalProfile.objects.get(user=...)"""
+        from .models import NewPersonalProfile
+
+        if self.profile is None:
+            raise NewPersonalProfile.DoesNotExist('No profile for this user')
+        return self.profile
+
+    def get_profile_for_update(self):
+        """The user's profile read from the database, for views that save it.
+
+        get_profile() may come from the token cache, up to AUTH_TOKEN_CACHE_SECONDS old, and save()
+        writes every column, so saving it would put back values changed since (password flag, avatar,
+        import keys).
+        """
+        from .models import NewPersonalProfile
+
+        if not self.user.is_authenticated:
+            raise NewPersonalProfile.DoesNotExist('No profile for this user')
+        return NewPersonalProfile.objects.get(user=self.user)
+
+
+class RequestIdentityMiddleware:
+    """Attach a lazy RequestIdentity to every request as request.identity"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.identity = RequestIdentity(request)
+        return self.get_response(request)
@@ -0,0 +1,160 @@
+# Family search (SearchFamiliesView) and the member-level directory search (directory.py).
+# Every profile keeps a search_document: its surname, name, father's name, sakh, city and area
+# normalized by search_text(), so 'PATEL,' and 'patel' are the same word and Gujarati vowel signs
+# are kept. Next to it, search_key holds the phonetic key of every word (transliteration.py), the
+# same for 'Patel' and 'પટેલ', so a query in either script finds both spellings. NewPersonalProfile.save()
+# and the bulk import paths fill both in (update_search_columns), so a search never has to normalize
+# or transliterate rows, only the query. DirectoryEntry rows carry the same two columns per person.
+#
+# settings.SEARCH_BACKEND picks how the documents are searched: 'trigram' (PostgreSQL pg_trgm with
+# the GIN indexes from migrations 0022 and 0023, ranked by word similarity), 'simple' (a substring
+# match that works on any database, ranked in Python; for SQLite and local testing) or 'auto' (the
+# default: trigram on PostgreSQL, simple otherwise). A dotted path to another SearchBackend subclass also works.
+# (models.py imports this module, so it does not import the models.)
+
+import unicodedata
+from django.conf import settings
+from django.db import connection
+from django.db.models import BooleanField, F, FloatField, Func, Q, Value
+from django.db.models.functions import Greatest
+from django.utils.module_loading import import_string
+from .transliteration import phonetic_key
+
+SEARCH_FIELDS = ('surname', 'name', 'fatherName', 'sakh', 'city', 'area')
+DEFAULT_LIMIT = 20
+
+
+def search_text(value):
+    """Lowercase words of value separated by single spaces, without punctuation.
+
+    Letters, combining marks (the Gujarati vowel signs) and digits are kept, anything else separates words.
+    """
+    value = unicodedata.normalize('NFKC', str(value or '')).casefold()
+    chars = [ch if unicodedata.category(ch)[0] in 'LMN' else ' ' for ch in value]
+    return ' '.join(''.join(chars).split())
+
+
+def search_document(profile):
+    """The search_document of a profile (or any object with the SEARCH_FIELDS attributes)"""
+    return search_text(' '.join(getattr(profile, field, '') or '' for field in SEARCH_FIELDS))
+
+
+def search_key(profile):
+    """The search_key of a profile: the phonetic keys of its search document"""
+    return phonetic_key(search_document(profile))
+
+
+def update_search_columns(profile):
+    """Fill in search_document and search_key (save() and the bulk paths that skip it call this)"""
+    profile.search_document = search_document(profile)
+    profile.search_key = phonetic_key(profile.search_document)
+
+
+def words_match(text, field='search_document'):
+    """Q for the rows whose field contains every word of text"""
+    condition = Q()
+    for word in text.split():
+        condition &= Q(**{f'{field}__contains': word})
+    return condition
+
+
+class WordSimilar(Func):
+    """text <% document: pg_trgm word similarity above pg_trgm.word_similarity_threshold, uses the GIN index"""
+    template = '%(expressions)s'
+    arg_joiner = ' <%% '
+    output_field = BooleanField()
+
+
+class WordSimilarity(Func):
+    function = 'WORD_SIMILARITY'
+    output_field = FloatField()
+
+
+class SearchBackend:
+    """Find the rows of a queryset whose search_document or search_key matches a query, best match first"""
+
+    def search(self, queryset, query, limit=DEFAULT_LIMIT):
+        """At most limit rows of queryset matching query, each with a rank attribute"""
+        text = search_text(query)
+        if not text:
+            return []
+        return self.ranked(queryset, text, phonetic_key(text), limit)
+
+    def filter(self, queryset, query):
+        """queryset narrowed to the rows matching query, unranked (for lists paginated in their own order)"""
+        text = search_text(query)
+        if not text:
+            return queryset.none()
+        return queryset.filter(self.matches(text, phonetic_key(text)))
+
+    def matches(self, text, key):
+        """Q for the rows matching the normalized query text or its phonetic key"""
+        condition = words_match(text)
+        if key:
+            condition |= words_match(key, 'search_key')
+        return condition
+
+    def ranked(self, queryset, text, key, limit):
+        raise NotImplementedError
+
+
+class TrigramSearchBackend(SearchBackend):
+    """PostgreSQL pg_trgm: every word as a substring, or the whole query as a fuzzy match (typos, spellings),
+    in the document as typed or in the keys in the other script"""
+
+    def matches(self, text, key):
+        condition = super().matches(text, key) | Q(WordSimilar(Value(text), F('search_document')))
+        if key:
+            condition |= Q(WordSimilar(Value(key), F('search_key')))
+        return condition
+
+    def ranked(self, queryset, text, key, limit):
+        rank = WordSimilarity(Value(text), F('search_document'))
+        if key:
+            rank = Greatest(rank, WordSimilarity(Value(key), F('search_key')))
+        rows = queryset.filter(self.matches(text, key)).annotate(rank=rank)
+        return list(rows.order_by('-rank', 'id')[:limit])
+
+
+class SimpleSearchBackend(SearchBackend):
+    """Every word as a substring of the document or of the keys, ranked in Python: whole words first,
+    then word prefixes"""
+
+    # Rows ranked per search; without an index the match is a scan either way
+    max_candidates = 500
+
+    def ranked(self, queryset, text, key, limit):
+        rows = list(queryset.filter(self.matches(text, key)).order_by('id')[:self.max_candidates])
+        for row in rows:
+            row.rank = max(
+                self.score(text.split(), row.search_document.split()),
+                self.score(key.split(), row.search_key.split()) if key else 0.0,
+            )
+        rows.sort(key=lambda row: (-row.rank, row.id))
+        return rows[:limit]
+
+    def score(self, query_words, document_words):
+        total = 0.0
+        for word in query_words:
+            if word in document_words:
+                total += 1.0
+            elif any(candidate.startswith(word) for candidate in document_words):
+                total += 0.75
+            else:
+                total += 0.5
+        return total / len(query_words)
+
+
+SEARCH_BACKENDS = {
+    'trigram': TrigramSearchBackend,
+    'simple': SimpleSearchBackend,
+}
+
+
+def get_search_backend():
+    """Return the backend configured in settings.SEARCH_BACKEND"""
+    name = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    if name == 'auto':
+        name = 'trigram' if connection.vendor == 'postgresql' else 'simple'
+    backend_class = SEARCH_BACKENDS.get(name) or import_string(name)
+    return backend_class()
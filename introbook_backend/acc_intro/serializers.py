@@ -1,7 +1,7 @@
 # introbook_backend/acc_intro/serializers.py
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
-from .models import UserProfile, Family, FamilyMember, NewPersonalProfile, NewFamilyMember, FeaturedFamily, FamilyConnection, CommunityActivity, PrivateMessage, FamilyEvent, EventInvitation, FamilyUpdate
+from .models import UserProfile, Family, FamilyMember, NewPersonalProfile, NewFamilyMember, FeaturedFamily, FamilyConnection, CommunityActivity, PrivateMessage, FamilyEvent, EventInvitation, FamilyUpdate, ImportJob
 
 User = get_user_model()
 
@@ -30,34 +30,110 @@ class NewFamilyMemberSerializer(serializers.ModelSerializer):
     class Meta:
         model = NewFamilyMember
         fields = '__all__'
-        read_only_fields = ['profile', 'member_number']
+        read_only_fields = ['profile', 'member_number', 'source_key', 'content_hash', 'canonical_mobile']
     
     def get_member_id(self, obj):
         return obj.get_member_id()
 
-class NewPersonalProfileSerializer(serializers.ModelSerializer):
+def sparse_fieldset(request):
+    """Read ?fields=a,b and ?expand=c from a request as serializer kwargs (fields is None when not given)"""
+    def names(param):
+        value = request.query_params.get(param)
+        if value is None:
+            return None
+        return [name.strip() for name in value.split(',') if name.strip()]
+
+    return {'fields': names('fields'), 'expand': names('expand') or []}
+
+
+class DynamicFieldsMixin:
+    """Sparse fieldsets: fields= keeps only the named fields, expand= adds nested ones from expandable_fields.
+
+    Nested fields are left out whenever fields= is given unless they are expanded (or named in fields).
+    Without fields= every field is returned, like before.
+    """
+    expandable_fields = ()
+    # Serializer fields computed from other model columns, so only_columns() still loads what they read
+    field_columns = {}
+
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            keep = set(fields) | (set(expand or ()) & set(self.expandable_fields))
+            for name in list(self.fields):
+                if name not in keep:
+                    self.fields.pop(name)
+
+    @classmethod
+    def includes(cls, name, fields=None, expand=()):
+        """True if the field name is rendered for this fields/expand combination"""
+        return fields is None or name in fields or (name in cls.expandable_fields and name in (expand or ()))
+
+    @classmethod
+    def only_columns(cls, fields, extra=()):
+        """Model columns needed to render fields, for queryset.only(); None means every column"""
+        if fields is None:
+            return None
+        opts = cls.Meta.model._meta
+        concrete = {field.name for field in opts.concrete_fields}
+        columns = {opts.pk.name, *extra}
+        for name in fields:
+            columns.update(cls.field_columns.get(name, [name] if name in concrete else []))
+        return sorted(columns)
+
+
+class NewPersonalProfileSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     family_members = NewFamilyMemberSerializer(many=True, read_only=True)
     user = serializers.PrimaryKeyRelatedField(read_only=True)
     avatar = serializers.ImageField(required=False, allow_null=True)
     user_id = serializers.SerializerMethodField()
 
+    expandable_fields = ('family_members',)
+    field_columns = {'user_id': ['user_number']}
+
     class Meta:
         model = NewPersonalProfile
-        fields = '__all__'
-        read_only_fields = ['user_number']
+        # The search columns are only for the search queries, they would double the size of every profile
+        exclude = ['search_document', 'search_key']
+        read_only_fields = ['user_number', 'source_key', 'content_hash', 'canonical_mobile']
     
     def get_user_id(self, obj):
         return obj.get_user_id()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, fields=None, expand=(), extra_columns=()):
+        """Load only the columns the requested fields need and prefetch the members only when rendered"""
+        columns = cls.only_columns(fields, extra_columns)
+        if columns is not None:
+            queryset = queryset.only(*columns)
+        if cls.includes('family_members', fields, expand):
+            queryset = queryset.prefetch_related('family_members')
+        return queryset
     
     def to_representation(self, instance):
         data = super().to_representation(instance)
         request = self.context.get('request')
+        if 'avatar' not in data:
+            # Left out by fields=, so the column was not loaded either
+            return data
         if instance.avatar and request:
             data['avatar'] = request.build_absolute_uri(instance.avatar.url)
         elif instance.avatar:
             data['avatar'] = instance.avatar.url
         return data
 
+class ProfileSummarySerializer(serializers.ModelSerializer):
+    """Compact profile for nested positions (message senders, event organizers...), without family members"""
+    user_id = serializers.SerializerMethodField()
+
+    class Meta:
+        model = NewPersonalProfile
+        fields = ['id', 'user_id', 'surname', 'name', 'city', 'avatar']
+
+    def get_user_id(self, obj):
+        return obj.get_user_id()
+
+
 class FeaturedFamilySerializer(serializers.ModelSerializer):
     profile = NewPersonalProfileSerializer(read_only=True)
     
@@ -65,53 +141,89 @@ class FeaturedFamilySerializer(serializers.ModelSerializer):
         model = FeaturedFamily
         fields = '__all__'
 
+# The serializers below nest profiles as ProfileSummarySerializer. setup_eager_loading() adds the
+# select_related/prefetch_related a queryset needs so serializing it takes a fixed number of queries.
+
 class FamilyConnectionSerializer(serializers.ModelSerializer):
-    initiator = NewPersonalProfileSerializer(read_only=True)
-    receiver = NewPersonalProfileSerializer(read_only=True)
+    initiator = ProfileSummarySerializer(read_only=True)
+    receiver = ProfileSummarySerializer(read_only=True)
     
     class Meta:
         model = FamilyConnection
         fields = '__all__'
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('initiator', 'receiver')
+
 class CommunityActivitySerializer(serializers.ModelSerializer):
-    profile = NewPersonalProfileSerializer(read_only=True)
+    profile = ProfileSummarySerializer(read_only=True)
     
     class Meta:
         model = CommunityActivity
         fields = '__all__'
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('profile')
+
 class PrivateMessageSerializer(serializers.ModelSerializer):
-    sender = NewPersonalProfileSerializer(read_only=True)
-    receiver = NewPersonalProfileSerializer(read_only=True)
+    sender = ProfileSummarySerializer(read_only=True)
+    receiver = ProfileSummarySerializer(read_only=True)
     
     class Meta:
         model = PrivateMessage
         fields = '__all__'
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('sender', 'receiver')
+
 class EventInvitationSerializer(serializers.ModelSerializer):
-    invitee = NewPersonalProfileSerializer(read_only=True)
+    invitee = ProfileSummarySerializer(read_only=True)
     
     class Meta:
         model = EventInvitation
         fields = '__all__'
 
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('invitee')
+
 class FamilyEventSerializer(serializers.ModelSerializer):
-    organizer = NewPersonalProfileSerializer(read_only=True)
+    organizer = ProfileSummarySerializer(read_only=True)
     invitations = EventInvitationSerializer(many=True, read_only=True)
     attendees_count = serializers.SerializerMethodField()
     
     class Meta:
         model = FamilyEvent
         fields = '__all__'
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('organizer').prefetch_related('invitations__invitee')
     
     def get_attendees_count(self, obj):
-        return obj.invitations.filter(status='accepted').count()
+        # Counted from the prefetched invitations instead of one COUNT query per event
+        return sum(1 for invitation in obj.invitations.all() if invitation.status == 'accepted')
 
 
 
 class FamilyUpdateSerializer(serializers.ModelSerializer):
-    family = NewPersonalProfileSerializer(read_only=True)
+    family = ProfileSummarySerializer(read_only=True)
     
     class Meta:
         model = FamilyUpdate
         fields = '__all__'
+
+    @staticmethod
+    def setup_eager_loading(queryset):
+        return queryset.select_related('family')
+
+class ImportJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'original_name', 'status', 'rows_processed', 'families_processed', 'records_created',
+            'records_skipped', 'records_failed', 'errors', 'created_at', 'started_at', 'finished_at', 'updated_at'
+        ]
@@ -1,3 +1,840 @@
-from django.test import TestCase
+import contextlib
+import importlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from datetime import timedelta
 
-# Create your tests here.
+import pandas as pd
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .authentication import CachedTokenAuthentication
+from .excel_parsing import (
+    parse_address, parse_address_column, parse_date, parse_date_column, parse_gujarati_name, parse_name,
+    parse_name_column, split_address, split_address_column,
+)
+from .excel_upload import ImportJobStatusView, UploadExcelView
+from .import_benchmark import IMPORT_VARIANTS, SAMPLE_FOLDER, run_import_benchmark
+from .import_jobs import fail_stale_jobs, run_import_job
+from .mobile_utils import resolve_mobile_identities, resolve_mobile_identity
+from .models import DirectoryEntry, FamilyConnection, FamilyMemberAuth, ImportJob, NewPersonalProfile, NewFamilyMember, NumberSequence, OTP, PrivateMessage
+from .otp_store import get_otp_backend
+from .pagination import rows_after
+from .request_identity import RequestIdentity
+from .search import SimpleSearchBackend, search_text
+from .transliteration import phonetic_key
+from .views import AllFamiliesView, AutocompleteView, DirectoryBrowseView, DirectorySearchView, EditProfileView, PrivateMessagesView, SearchFamiliesView, SetMobilePasswordView, SuggestedConnectionsView, login_view
+
+SAMPLE_WORKBOOK = os.path.join(str(SAMPLE_FOLDER), 'BHOJAVAT-56.xlsx')
+
+
+@unittest.skipUnless(os.path.exists(SAMPLE_WORKBOOK), 'sample workbooks are not available')
+class ImportBenchmarkTests(TestCase):
+    """Runs the import benchmark on one sample workbook so regressions in the import hot path fail a test"""
+
+    # BHOJAVAT-56 has 56 families, 53 of them with a mobile number
+    EXPECTED_RECORDS = 53
+    # excel_upload_with_dummy_mobiles makes up a mobile for the 3 families without one
+    EXPECTED_RECORDS_BY_VARIANT = {'dummy_mobiles': 56}
+    # Bulk and stream modes write with bulk_create: a handful of lookups plus one insert per table
+    BULK_QUERY_BUDGET = 30
+
+    @classmethod
+    def setUpTestData(cls):
+        # Migration 0019 creates the number counters, make sure they exist like on a migrated database
+        for name in NumberSequence.SEQUENCE_FIELDS:
+            NumberSequence.create_sequence(name)
+
+    def test_every_variant_imports_the_sample(self):
+        for variant in IMPORT_VARIANTS:
+            with self.subTest(variant=variant):
+                result = run_import_benchmark(SAMPLE_WORKBOOK, variant, trace_memory=False)
+                self.assertEqual(result['status'], 200)
+                self.assertEqual(result['records_created'], self.EXPECTED_RECORDS_BY_VARIANT.get(variant, self.EXPECTED_RECORDS))
+                self.assertGreater(result['rows_per_second'], 0)
+
+    def test_benchmark_rolls_back_the_import(self):
+        run_import_benchmark(SAMPLE_WORKBOOK, 'excel_upload')
+        self.assertEqual(NewPersonalProfile.objects.count(), 0)
+        self.assertEqual(NewFamilyMember.objects.count(), 0)
+
+    def test_bulk_modes_stay_within_query_budget(self):
+        for variant in ('excel_upload_bulk', 'excel_upload_stream', 'views_bulk'):
+            with self.subTest(variant=variant):
+                result = run_import_benchmark(SAMPLE_WORKBOOK, variant, trace_memory=False)
+                self.assertLessEqual(result['queries'], self.BULK_QUERY_BUDGET)
+
+    def test_report_splits_parse_and_db_time(self):
+        result = run_import_benchmark(SAMPLE_WORKBOOK, 'excel_upload')
+        self.assertGreater(result['peak_memory'], 0)
+        self.assertGreater(result['db_seconds'], 0)
+        self.assertAlmostEqual(result['parse_seconds'] + result['db_seconds'], result['seconds'], places=6)
+
+
+@unittest.skipUnless(os.path.exists(SAMPLE_WORKBOOK), 'sample workbooks are not available')
+class SyncUploadTests(TestCase):
+    """Re-uploading a sheet with mode=sync only writes what changed"""
+
+    def upload(self, mode, data=None):
+        if data is None:
+            with open(SAMPLE_WORKBOOK, 'rb') as workbook:
+                data = workbook.read()
+        upload = SimpleUploadedFile('BHOJAVAT-56.xlsx', data)
+        request = APIRequestFactory().post('/api/upload-excel/', {'file': upload, 'mode': mode}, format='multipart')
+        with contextlib.redirect_stdout(io.StringIO()):
+            return UploadExcelView.as_view()(request)
+
+    def test_resync_of_unchanged_sheet_writes_nothing(self):
+        self.upload('bulk')
+        members = dict(NewFamilyMember.objects.values_list('id', 'member_number'))
+
+        with self.assertNumQueries(6):
+            response = self.upload('sync')
+
+        self.assertEqual(response.data['records_unchanged'], ImportBenchmarkTests.EXPECTED_RECORDS)
+        self.assertEqual(response.data['records_created'], 0)
+        self.assertEqual(response.data['members_deleted'], 0)
+        self.assertEqual(dict(NewFamilyMember.objects.values_list('id', 'member_number')), members)
+
+    def test_renamed_member_is_updated_in_place_and_activated_profile_is_kept(self):
+        self.upload('bulk')
+        member = NewFamilyMember.objects.get(name='રમાબેન')
+        profile = member.profile
+        # The owner has activated the account and changed their email
+        profile.user.set_password('chosen-pw')
+        profile.user.save()
+        profile.email = 'owner@example.com'
+        profile.save()
+
+        # Row 2 (the wife in the first family) has her name corrected
+        df = pd.read_excel(SAMPLE_WORKBOOK)
+        df.iloc[2, 1] = 'રમીલાબેન અમરતલાલ ભોજાવત'
+        workbook = io.BytesIO()
+        df.to_excel(workbook, index=False)
+        response = self.upload('sync', workbook.getvalue())
+
+        self.assertEqual(
+            [response.data[name] for name in ('members_created', 'members_updated', 'members_deleted')], [0, 1, 0]
+        )
+        member.refresh_from_db()
+        self.assertEqual(member.name, 'રમીલાબેન')
+        profile.refresh_from_db()
+        self.assertEqual(profile.email, 'owner@example.com')
+        # The next sync of the same sheet has nothing to do
+        self.assertEqual(self.upload('sync', workbook.getvalue()).data['records_unchanged'], ImportBenchmarkTests.EXPECTED_RECORDS)
+
+
+@unittest.skipUnless(os.path.exists(SAMPLE_WORKBOOK), 'sample workbooks are not available')
+class RepeatedMobileImportTests(TestCase):
+    """A family whose mobile already appeared earlier in the same sheet is skipped, not inserted twice"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in NumberSequence.SEQUENCE_FIELDS:
+            NumberSequence.create_sequence(name)
+        # The sample with its first family (rows 1-8) copied to the end of the sheet
+        df = pd.read_excel(SAMPLE_WORKBOOK)
+        workbook = io.BytesIO()
+        pd.concat([df, df.iloc[1:9]]).to_excel(workbook, index=False)
+        cls.workbook = workbook.getvalue()
+
+    def test_repeated_mobile_is_skipped(self):
+        for mode in ('standard', 'bulk'):
+            with self.subTest(mode=mode), transaction.atomic():
+                upload = SimpleUploadedFile('repeated.xlsx', self.workbook)
+                request = APIRequestFactory().post('/api/upload-excel/', {'file': upload, 'mode': mode}, format='multipart')
+                with contextlib.redirect_stdout(io.StringIO()):
+                    response = UploadExcelView.as_view()(request)
+
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data['records_created'], ImportBenchmarkTests.EXPECTED_RECORDS)
+                self.assertEqual(response.data['records_skipped'], 1)
+                self.assertEqual(NewPersonalProfile.objects.filter(mobileNumber='9327015223').count(), 1)
+                transaction.set_rollback(True)
+
+
+@unittest.skipUnless(os.path.exists(SAMPLE_WORKBOOK), 'sample workbooks are not available')
+class ImportDirectoryCommandTests(TestCase):
+    """import_directory parses the workbooks of a folder in worker processes and writes them once"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in NumberSequence.SEQUENCE_FIELDS:
+            NumberSequence.create_sequence(name)
+
+    def test_folder_is_imported_and_reimport_skips_everyone(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        shutil.copy(SAMPLE_WORKBOOK, folder)
+        # An Excel lock file next to the workbook is ignored
+        open(os.path.join(folder, '~$BHOJAVAT-56.xlsx'), 'w').close()
+
+        output = io.StringIO()
+        call_command('import_directory', folder, workers=1, stdout=output)
+        self.assertEqual(NewPersonalProfile.objects.count(), ImportBenchmarkTests.EXPECTED_RECORDS)
+        self.assertIn('BHOJAVAT-56.xlsx: 53 created, 0 skipped', output.getvalue())
+
+        output = io.StringIO()
+        call_command('import_directory', folder, workers=1, stdout=output)
+        self.assertEqual(NewPersonalProfile.objects.count(), ImportBenchmarkTests.EXPECTED_RECORDS)
+        self.assertIn('BHOJAVAT-56.xlsx: 0 created, 53 skipped', output.getvalue())
+
+
+@unittest.skipUnless(os.path.exists(SAMPLE_WORKBOOK), 'sample workbooks are not available')
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+class ImportJobTests(TestCase):
+    """Background jobs import once, count what they did, and do not stay running after their worker exits"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for name in NumberSequence.SEQUENCE_FIELDS:
+            NumberSequence.create_sequence(name)
+
+    def create_job(self, **fields):
+        with open(SAMPLE_WORKBOOK, 'rb') as workbook:
+            upload = SimpleUploadedFile('BHOJAVAT-56.xlsx', workbook.read())
+        return ImportJob.objects.create(file=upload, original_name='BHOJAVAT-56.xlsx', **fields)
+
+    def test_job_imports_the_workbook_once(self):
+        job = self.create_job()
+        with contextlib.redirect_stdout(io.StringIO()):
+            run_import_job(job.id)
+            self.assertIsNone(run_import_job(job.id))
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.families_processed, 56)
+        self.assertEqual(job.records_created, ImportBenchmarkTests.EXPECTED_RECORDS)
+        self.assertEqual(job.records_failed, 3)
+        self.assertEqual(NewPersonalProfile.objects.count(), ImportBenchmarkTests.EXPECTED_RECORDS)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_stalled_jobs_fail_and_unstarted_jobs_are_run(self):
+        stalled = self.create_job(status='running')
+        running = self.create_job(status='running')
+        unstarted = self.create_job()
+        long_ago = timezone.now() - timedelta(hours=1)
+        ImportJob.objects.filter(id=stalled.id).update(updated_at=long_ago)
+        ImportJob.objects.filter(id=unstarted.id).update(created_at=long_ago)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            call_command('run_import_jobs')
+
+        statuses = dict(ImportJob.objects.values_list('id', 'status'))
+        self.assertEqual(statuses, {stalled.id: 'failed', running.id: 'running', unstarted.id: 'completed'})
+        self.assertEqual(fail_stale_jobs(), 0)
+
+    def test_only_the_uploader_and_staff_see_a_job(self):
+        uploader = User.objects.create_user(username='9829100001')
+        job = self.create_job(uploaded_by=uploader)
+
+        def status(user=None):
+            request = APIRequestFactory().get(f'/api/import-jobs/{job.id}/')
+            if user:
+                force_authenticate(request, user=user)
+            return ImportJobStatusView.as_view()(request, job_id=job.id).status_code
+
+        self.assertEqual(status(), 401)
+        self.assertEqual(status(User.objects.create_user(username='9829100002')), 404)
+        self.assertEqual(status(uploader), 200)
+        self.assertEqual(status(User.objects.create_user(username='9829100003', is_staff=True)), 200)
+
+
+class TempPasswordRetirementTests(TestCase):
+    """temp123 passwords are found whatever the activation flag says, by the migration for imported users"""
+
+    def setUp(self):
+        # username: (password, password_change_required, email)
+        accounts = {
+            '9828000001': ('temp123', True, '9828000001@temp.com'),    # baseline excel_upload user
+            '9828000002': ('temp123', False, '9828000002@temp.com'),   # earlier import path
+            '9828000003': ('chosen-pw', True, '9828000003@temp.com'),  # reset through an old flow that left the flag
+            '9828000004': (None, True, '9828000004@temp.com'),         # imported, not activated yet
+            '9828000005': ('temp123', False, 'kiran@example.com'),     # imported, then changed the email only
+        }
+        for username, (password, flagged, email) in accounts.items():
+            user = User.objects.create_user(username=username, password=password)
+            NewPersonalProfile.objects.create(user=user, surname='Patel', name=username, email=email, password_change_required=flagged)
+
+    def assert_retired(self, **expected):
+        state = {
+            user.username: (user.has_usable_password(), user.new_profile.password_change_required)
+            for user in User.objects.select_related('new_profile')
+        }
+        self.assertEqual(state, {
+            '9828000001': (False, True),
+            '9828000002': (False, True),
+            '9828000003': (True, False),
+            '9828000004': (False, True),
+            **expected,
+        })
+
+    def test_migration_checks_the_imported_users(self):
+        migration = importlib.import_module('acc_intro.migrations.0028_retire_temp_passwords')
+        with mock.patch.object(migration, 'check_password', wraps=migration.check_password) as check_password:
+            migration.retire_temp_passwords(apps, None)
+        # Not the user without a password, nor the one whose email is not from an import
+        self.assertEqual(check_password.call_count, 3)
+        self.assert_retired(**{'9828000005': (True, False)})
+
+    def test_command_checks_everyone(self):
+        call_command('mark_temp_password_users', '--dry-run', stdout=io.StringIO())
+        self.assertTrue(User.objects.get(username='9828000001').check_password('temp123'))
+        call_command('mark_temp_password_users', stdout=io.StringIO())
+        self.assert_retired(**{'9828000005': (False, True)})
+
+
+class ExcelParsingTests(unittest.TestCase):
+    """The shared parsers keep the results of the per-module copies they replaced, per cell and per column"""
+
+    def test_names(self):
+        self.assertEqual(parse_name('પટેલ સ્વ. અમરતલાલ નારણદાસ ભોજાવત '), ('પટેલ', 'સ્વ. અમરતલાલ', 'નારણદાસ', 'ભોજાવત'))
+        self.assertEqual(parse_name('રમાબેન અમરતલાલ ભોજાવત'), ('ભોજાવત', 'રમાબેન', 'અમરતલાલ', 'ભોજાવત'))
+        self.assertEqual(parse_name('એકલ'), ('એકલ', '', '', ''))
+        self.assertEqual(parse_name(float('nan')), ('', '', '', ''))
+        # The old prefix loop tried 'ગં.સ્વ' before 'ગં.સ્વ.', leaving the '.' behind
+        self.assertEqual(parse_gujarati_name('ગં.સ્વ. શાંતાબેન ભોજાવત'), ('.', 'ભોજાવત'))
+        self.assertEqual(parse_gujarati_name('એકલ'), ('એકલ', 'એકલ'))
+
+    def test_addresses(self):
+        full = 'વ, નીશીથ એપર્ટમેન્ટ, જયહિન્દ ચાર રસ્તા, મણીનગર, અમદાવાદ'
+        for parser in (parse_address, split_address):
+            self.assertEqual(parser(full), ('વ, નીશીથ એપર્ટમેન્ટ, જયહિન્દ ચાર રસ્તા', 'મણીનગર', 'અમદાવાદ'))
+        # excel_upload.py drops empty parts and reads two parts as (details, area), the others as (area, city)
+        self.assertEqual(parse_address('ગામ, , મણીનગર'), ('ગામ', 'મણીનગર', ''))
+        self.assertEqual(split_address('ગામ, , મણીનગર'), ('ગામ', '', 'મણીનગર'))
+        self.assertEqual(parse_address('મણીનગર, અમદાવાદ'), ('મણીનગર', 'અમદાવાદ', ''))
+        self.assertEqual(split_address('મણીનગર, અમદાવાદ'), ('', 'મણીનગર', 'અમદાવાદ'))
+
+    def test_dates(self):
+        for text in ('05/03/1980', '05-03-1980', '1980-03-05', '1980-03-05 00:00:00'):
+            self.assertEqual(parse_date(text).isoformat(), '1980-03-05')
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertIsNone(parse_date('31/02/1980'))
+        self.assertIsNone(parse_date(None))
+
+    @unittest.skipUnless(os.path.exists(SAMPLE_WORKBOOK), 'sample workbooks are not available')
+    def test_columns_match_parsing_every_cell(self):
+        df = pd.read_excel(SAMPLE_WORKBOOK)
+        # Empty cells and repeats, which parse_column() parses once
+        extra = pd.Series([None, float('nan'), '', 'રમાબેન અમરતલાલ ભોજાવત', 'રમાબેન અમરતલાલ ભોજાવત'], index=range(1000, 1005))
+        cases = (
+            (pd.concat([df.iloc[:, 1], extra]), parse_name_column, parse_name),
+            (pd.concat([df.iloc[:, 10], extra]), parse_address_column, parse_address),
+            (pd.concat([df.iloc[:, 10], extra]), split_address_column, split_address),
+            (df.iloc[:, 3].astype(str), parse_date_column, parse_date),
+        )
+        with contextlib.redirect_stdout(io.StringIO()):
+            for column, column_parser, parser in cases:
+                with self.subTest(parser=parser.__name__):
+                    parsed = column_parser(column)
+                    rows = list(parsed.itertuples(index=False, name=None)) if isinstance(parsed, pd.DataFrame) else list(parsed)
+                    self.assertEqual(rows, [parser(value) for value in column])
+                    self.assertEqual(list(parsed.index), list(column.index))
+
+
+class NumberSequenceTests(TestCase):
+    """Numbers come in consecutive blocks from one counter row, seeded from the numbers already in use"""
+
+    def test_blocks_follow_each_other(self):
+        NumberSequence.create_sequence('member_number')
+        self.assertEqual(NumberSequence.allocate('member_number', 3), 1)
+        self.assertEqual(NumberSequence.allocate('member_number'), 4)
+        with transaction.atomic():
+            self.assertEqual(NumberSequence.reserve('member_number', 10), 5)
+        self.assertEqual(NumberSequence.objects.get(name='member_number').last_value, 14)
+
+    def test_missing_counter_starts_after_the_highest_number(self):
+        user = User.objects.create_user(username='9829000001')
+        NewPersonalProfile.objects.create(user=user, surname='Patel', name='A', user_number=41)
+        NumberSequence.objects.filter(name='user_number').delete()
+        self.assertEqual(NumberSequence.allocate('user_number', 2), 42)
+        self.assertEqual(NumberSequence.allocate('user_number'), 44)
+
+
+class MobileIdentityTests(TestCase):
+    """Any format of a mobile finds its accounts in one query, family member logins first"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.owner = User.objects.create_user(username='9825011111')
+        profile = NewPersonalProfile.objects.create(user=cls.owner, surname='Patel', name='A', mobileNumber='+91 98250-11111')
+        member = NewFamilyMember.objects.create(profile=profile, surname='Patel', name='B', relation='son')
+        # The son logs in with his own number, and also has the owner's number on an old, inactive login
+        cls.son = User.objects.create_user(username='member_9825022222')
+        FamilyMemberAuth.objects.create(family_member=member, user=cls.son, mobile_number='9825022222', password='x')
+        FamilyMemberAuth.objects.create(family_member=member, user=cls.son, mobile_number='98250 11111', password='x', is_active=False)
+        # Created in the admin: only the username holds the number
+        cls.admin_user = User.objects.create_user(username='919825033333')
+
+    def kinds(self, mobile):
+        return [(identity.kind, identity.user.id) for identity in resolve_mobile_identities(mobile)]
+
+    def test_formats_and_kinds(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.kinds('919825011111'), [('main_user', self.owner.id)])
+        self.assertEqual(self.kinds('+91 98250 22222'), [('family_member', self.son.id)])
+        self.assertEqual(self.kinds('9825033333'), [('user', self.admin_user.id)])
+        self.assertEqual(self.kinds('9825044444'), [])
+        self.assertEqual(self.kinds(''), [])
+
+    def test_family_login_comes_first_and_kinds_filter(self):
+        FamilyMemberAuth.objects.filter(is_active=False).update(is_active=True, canonical_mobile='9825011111')
+        self.assertEqual(self.kinds('9825011111'), [('family_member', self.son.id), ('main_user', self.owner.id)])
+        identity = resolve_mobile_identity('9825011111', kinds=('main_user',))
+        self.assertEqual((identity.user, identity.profile.name), (self.owner, 'A'))
+        self.assertIsNone(resolve_mobile_identity('9825022222', kinds=('main_user', 'user')))
+
+
+class OTPStoreTests(TestCase):
+    """Codes are shared through the database, expire and stop working after too many wrong guesses"""
+
+    def test_code_matches_any_format_of_the_mobile_once(self):
+        code = get_otp_backend().issue('+91 98250-12345')
+        # A fresh backend, like another worker process
+        self.assertTrue(get_otp_backend().verify('9825012345', code, consume=False))
+        self.assertTrue(get_otp_backend().verify('919825012345', code))
+        self.assertFalse(get_otp_backend().verify('9825012345', code))
+
+    @override_settings(OTP_MAX_ATTEMPTS=2)
+    def test_wrong_guesses_lock_the_code(self):
+        backend = get_otp_backend()
+        code = backend.issue('9825012345')
+        self.assertFalse(backend.verify('9825012345', '000000'))
+        self.assertFalse(backend.verify('9825012345', '000001'))
+        self.assertFalse(backend.verify('9825012345', code))
+
+    def test_expired_codes_fail_and_are_purged(self):
+        backend = get_otp_backend()
+        code = backend.issue('9825012345')
+        OTP.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertFalse(backend.verify('9825012345', code))
+        self.assertEqual(backend.purge_expired(), 1)
+        self.assertFalse(OTP.objects.exists())
+
+
+class SetMobilePasswordTests(TestCase):
+    """An account without a password gets one only with the OTP sent to its mobile"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='9825012345')
+        NewPersonalProfile.objects.create(user=self.user, name='A', mobileNumber='+919825012345', password_change_required=True)
+
+    def set_password(self, **data):
+        request = APIRequestFactory().post('/api/set-mobile-password/', {'mobile': '9825012345', 'password': 'secret99', **data}, format='json')
+        with contextlib.redirect_stdout(io.StringIO()):
+            return SetMobilePasswordView.as_view()(request)
+
+    def test_otp_is_required(self):
+        get_otp_backend().issue('9825012345')
+        self.assertEqual(self.set_password().status_code, 400)
+        self.assertEqual(self.set_password(otp='000000').status_code, 400)
+        self.user.refresh_from_db()
+        self.assertFalse(self.user.has_usable_password())
+
+    def test_valid_otp_sets_the_password_once(self):
+        code = get_otp_backend().issue('9825012345')
+        self.assertEqual(self.set_password(otp=code).status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('secret99'))
+        self.assertEqual(self.set_password(otp=code, password='other99').status_code, 400)
+
+
+@override_settings(LOGIN_MAX_FAILURES=3)
+class LoginThrottleTests(TestCase):
+    """login_view checks the password once per request and stops checking after repeated failures"""
+
+    def setUp(self):
+        cache.clear()
+        user = User.objects.create_user(username='9825012345', password='secret99')
+        NewPersonalProfile.objects.create(user=user, name='A', mobileNumber='+919825012345')
+
+    def login(self, password, mobile='+91 98250 12345'):
+        request = RequestFactory().post('/api/login/', json.dumps({'mobile': mobile, 'password': password}), content_type='application/json')
+        with contextlib.redirect_stdout(io.StringIO()):
+            return login_view(request)
+
+    def test_login_resolves_the_account_and_checks_once(self):
+        # The resolver query, nothing else: no per-variant lookups
+        with self.assertNumQueries(1):
+            response = self.login('wrong')
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.login('secret99').status_code, 200)
+
+    def test_repeated_failures_are_throttled(self):
+        for _ in range(3):
+            self.assertEqual(self.login('wrong').status_code, 401)
+        with self.assertNumQueries(0):
+            response = self.login('secret99')
+        self.assertEqual(response.status_code, 429)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Repeat requests with a token are authenticated from the cache until the token or user changes"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='9825012345', password='secret99')
+        NewPersonalProfile.objects.create(user=self.user, name='A', mobileNumber='9825012345')
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def test_cached_token_needs_no_queries(self):
+        self.auth.authenticate_credentials(self.token.key)
+        with self.assertNumQueries(0):
+            user, _ = self.auth.authenticate_credentials(self.token.key)
+            self.assertEqual(user.new_profile.name, 'A')
+
+    def test_password_change_and_token_rotation_evict_the_entry(self):
+        self.auth.authenticate_credentials(self.token.key)
+        self.user.set_password('changed99')
+        self.user.save()
+        with self.assertNumQueries(1):
+            user, _ = self.auth.authenticate_credentials(self.token.key)
+        self.assertTrue(user.check_password('changed99'))
+
+        self.token.delete()
+        with self.assertRaises(AuthenticationFailed):
+            self.auth.authenticate_credentials(self.token.key)
+
+    def test_profile_edit_keeps_columns_changed_since_the_cache(self):
+        user, _ = self.auth.authenticate_credentials(self.token.key)
+        # A re-import changes the profile with update(), which the cached entry does not see
+        NewPersonalProfile.objects.filter(user=self.user).update(password_change_required=True, source_key='sheet:1')
+
+        request = APIRequestFactory().post('/api/profile/', {'name': 'B'}, format='json')
+        force_authenticate(request, user=user)
+        request.identity = RequestIdentity(request)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertEqual(EditProfileView.as_view()(request).status_code, 200)
+
+        profile = NewPersonalProfile.objects.get(user=self.user)
+        self.assertEqual((profile.name, profile.password_change_required, profile.source_key), ('B', True, 'sheet:1'))
+
+
+class KeysetPaginationTests(TestCase):
+    """AllFamiliesView pages through the directory by (user_number, id) with a constant query count"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(5):
+            user = User.objects.create_user(username=f'98250{index:05d}')
+            profile = NewPersonalProfile.objects.create(user=user, name=f'P{index}', mobileNumber=user.username)
+            NewFamilyMember.objects.create(profile=profile, name='M', relation='Son')
+        # A profile imported before user numbers existed sorts after the numbered ones
+        NewPersonalProfile.objects.filter(name='P2').update(user_number=None)
+
+    def get(self, url):
+        return AllFamiliesView.as_view()(APIRequestFactory().get(url))
+
+    def test_cursor_walks_every_family_once(self):
+        names = []
+        url = '/api/all-families/?page_size=2'
+        # The page and the prefetched family members, and the profiles without a number once the
+        # numbered ones run out
+        for queries in (2, 3, 3):
+            with self.assertNumQueries(queries):
+                response = self.get(url)
+            names += [profile['name'] for profile in response.data['results']]
+            self.assertLessEqual(len(response.data['results']), 2)
+            url = response.data['next']
+        self.assertIsNone(url)
+        self.assertEqual(names, ['P0', 'P1', 'P3', 'P4', 'P2'])
+
+    def test_cursor_condition_is_a_range(self):
+        sql = str(NewPersonalProfile.objects.filter(rows_after(NewPersonalProfile, ('user_number', 'id'), [41, 7])).query)
+        self.assertIn('"user_number" >= 41', sql)
+        self.assertNotIn('IS NULL', sql)
+        sql = str(NewPersonalProfile.objects.filter(rows_after(NewPersonalProfile, ('user_number', 'id'), [None, 7])).query)
+        self.assertIn('"user_number" IS NULL', sql)
+
+    def test_invalid_cursor_is_rejected(self):
+        self.assertEqual(self.get('/api/all-families/?cursor=nonsense').status_code, 404)
+
+
+class SparseFieldsetTests(TestCase):
+    """?fields= and ?expand= shrink both the columns read and the profiles returned"""
+
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(3):
+            user = User.objects.create_user(username=f'98250{index:05d}')
+            profile = NewPersonalProfile.objects.create(user=user, surname='Shah', name=f'P{index}', mobileNumber=user.username)
+            NewFamilyMember.objects.create(profile=profile, name='M', relation='Son')
+
+    def get(self, url):
+        return AllFamiliesView.as_view()(APIRequestFactory().get(url))
+
+    def test_fields_without_expand_skip_the_members(self):
+        # Only the page, no deferred column loads and no member prefetch
+        with self.assertNumQueries(1):
+            response = self.get('/api/all-families/?fields=id,surname,user_id')
+        self.assertEqual(set(response.data['results'][0]), {'id', 'surname', 'user_id'})
+        self.assertEqual(response.data['results'][0]['user_id'], 'A1')
+
+    def test_expand_adds_the_members(self):
+        with self.assertNumQueries(2):
+            response = self.get('/api/all-families/?fields=surname&expand=family_members')
+        family = response.data['results'][0]
+        self.assertEqual(set(family), {'surname', 'family_members'})
+        self.assertEqual(family['family_members'][0]['name'], 'M')
+
+
+class ProfileSummaryTests(TestCase):
+    """Messages nest a compact profile summary and serialize in a fixed number of queries"""
+
+    def test_message_history_nests_profile_summaries(self):
+        sender, receiver = [
+            NewPersonalProfile.objects.create(user=User.objects.create_user(username=name), name=name, mobileNumber=name)
+            for name in ('9825000001', '9825000002')
+        ]
+        NewFamilyMember.objects.create(profile=sender, name='M', relation='Son')
+        for _ in range(20):
+            PrivateMessage.objects.create(sender=sender, receiver=receiver, message='hello')
+
+        request = APIRequestFactory().get('/api/community/messages/', {'partner_id': receiver.id})
+        force_authenticate(request, user=sender.user)
+        # What RequestIdentityMiddleware does for real requests
+        request.identity = RequestIdentity(request)
+        # Marking the messages read and one query for the messages with both profiles joined
+        with self.assertNumQueries(2), contextlib.redirect_stdout(io.StringIO()):
+            response = PrivateMessagesView.as_view()(request)
+
+        message = response.data['messages'][0]
+        self.assertEqual(set(message['sender']), {'id', 'user_id', 'surname', 'name', 'city', 'avatar'})
+
+
+class MemberCountAnnotationTests(TestCase):
+    """Suggested connections annotate member and mutual connection counts instead of counting per card"""
+
+    def test_suggestions_render_in_constant_queries(self):
+        profiles = [
+            NewPersonalProfile.objects.create(user=User.objects.create_user(username=f'982500{index:04d}'), name=f'P{index}', city='Surat')
+            for index in range(6)
+        ]
+        current, friend = profiles[:2]
+        for profile in profiles[2:]:
+            NewFamilyMember.objects.create(profile=profile, name='M', relation='Son')
+            NewFamilyMember.objects.create(profile=profile, name='D', relation='Daughter')
+        FamilyConnection.objects.create(initiator=current, receiver=friend, status='accepted')
+        FamilyConnection.objects.create(initiator=profiles[2], receiver=friend, status='accepted')
+
+        request = APIRequestFactory().get('/api/community/suggested-connections/')
+        force_authenticate(request, user=current.user)
+        request.identity = RequestIdentity(request)
+        # Both connection id lists and one query for the annotated suggestions
+        with self.assertNumQueries(3):
+            response = SuggestedConnectionsView.as_view()(request)
+
+        cards = {card['name']: card for card in response.data['suggested_connections']}
+        self.assertEqual(set(cards), {'P2', 'P3', 'P4', 'P5'})
+        self.assertEqual(cards['P2']['membersCount'], 3)
+        self.assertEqual(cards['P2']['mutualConnections'], 1)
+        self.assertEqual(cards['P3']['mutualConnections'], 0)
+
+
+@override_settings(SEARCH_BACKEND='simple')
+class FamilySearchTests(TestCase):
+    """Profiles keep a normalized search document that SearchFamiliesView matches and ranks"""
+
+    def test_text_is_normalized_without_losing_vowel_signs(self):
+        self.assertEqual(search_text('  PATEL,  Rameshbhai. '), 'patel rameshbhai')
+        self.assertEqual(search_text('પટેલ (સુરત)'), 'પટેલ સુરત')
+
+    def test_search_covers_every_field_and_ranks_whole_words_first(self):
+        current = NewPersonalProfile.objects.create(user=User.objects.create_user(username='9825000000'), name='Me')
+        NewPersonalProfile.objects.create(user=User.objects.create_user(username='9825000001'), surname='Patelia', name='Amit')
+        NewPersonalProfile.objects.create(user=User.objects.create_user(username='9825000002'), surname='Patel', name='Ravi', city='Surat')
+        NewPersonalProfile.objects.create(user=User.objects.create_user(username='9825000003'), surname='પટેલ', name='ભાવેશ', area='અડાજણ')
+
+        request = APIRequestFactory().get('/api/community/search-families/', {'q': 'patel'})
+        force_authenticate(request, user=current.user)
+        request.identity = RequestIdentity(request)
+        response = SearchFamiliesView.as_view()(request)
+        # પટેલ through its phonetic key, Patelia only as a prefix
+        self.assertEqual([result['surname'] for result in response.data['results']], ['Patel', 'પટેલ', 'Patelia'])
+
+        by_place = SimpleSearchBackend().search(NewPersonalProfile.objects.all(), 'SURAT patel')
+        self.assertEqual([profile.name for profile in by_place], ['Ravi'])
+        by_gujarati = SimpleSearchBackend().search(NewPersonalProfile.objects.all(), 'અડાજણ')
+        self.assertEqual([profile.name for profile in by_gujarati], ['ભાવેશ'])
+
+
+@override_settings(SEARCH_BACKEND='simple')
+class TransliterationSearchTests(TestCase):
+    """Gujarati and English spellings share a phonetic key, so a query in either script finds both"""
+
+    def test_both_scripts_get_the_same_key(self):
+        for gujarati, english in (('પટેલ', 'Patel'), ('રમેશભાઈ', 'Rameshbhai'), ('ભાવનગર', 'Bhavnagar'), ('જિજ્ઞેશ', 'Jignesh')):
+            with self.subTest(english=english):
+                self.assertEqual(phonetic_key(search_text(gujarati)), phonetic_key(search_text(english)))
+
+    def test_query_in_one_script_finds_the_other(self):
+        for index, (surname, city) in enumerate((('પટેલ', 'ભાવનગર'), ('Patel', 'Surat'), ('Shah', 'Bhavnagar'))):
+            NewPersonalProfile.objects.create(user=User.objects.create_user(username=f'982500000{index}'), surname=surname, city=city)
+
+        def surnames(query):
+            return sorted(profile.surname for profile in SimpleSearchBackend().search(NewPersonalProfile.objects.all(), query))
+
+        self.assertEqual(surnames('patel'), ['Patel', 'પટેલ'])
+        self.assertEqual(surnames('પટેલ'), ['Patel', 'પટેલ'])
+        self.assertEqual(surnames('bhavnagar'), ['Shah', 'પટેલ'])
+
+
+@override_settings(SEARCH_BACKEND='simple')
+class DirectorySearchTests(TestCase):
+    """Every head and member has a directory entry; the search filters them and groups them by family"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='9825000000')
+        for index, (surname, city) in enumerate((('Patel', 'Surat'), ('Shah', 'સુરત'), ('Desai', 'Rajkot'))):
+            profile = NewPersonalProfile.objects.create(
+                user=User.objects.create_user(username=f'982500000{index + 1}'), surname=surname, name='Head', city=city, age=50
+            )
+            NewFamilyMember.objects.create(profile=profile, surname=surname, name='Kiran', relation='son', memberAge=20, city=city)
+            NewFamilyMember.objects.create(profile=profile, surname=surname, name='Meena', relation='daughter', memberAge=15, city=city)
+
+    def get(self, params):
+        request = APIRequestFactory().get('/api/community/directory-search/', params)
+        force_authenticate(request, user=self.user)
+        return DirectorySearchView.as_view()(request)
+
+    def test_members_are_found_and_grouped_by_family(self):
+        # The page of family ids and the matching entries with their family
+        with self.assertNumQueries(2):
+            response = self.get({'q': 'kiran', 'city': 'surat'})
+        families = [(result['family']['surname'], [person['name'] for person in result['people']]) for result in response.data['results']]
+        self.assertEqual(families, [('Patel', ['Kiran']), ('Shah', ['Kiran'])])
+
+    def test_relation_and_age_filters_page_through_families(self):
+        surnames = []
+        params = {'relation': 'son,daughter', 'min_age': 18, 'page_size': 2}
+        while True:
+            response = self.get(params)
+            surnames += [result['family']['surname'] for result in response.data['results']]
+            self.assertTrue(all(person['relation'] == 'son' for result in response.data['results'] for person in result['people']))
+            if not response.data['next_cursor']:
+                break
+            params['cursor'] = response.data['next_cursor']
+        self.assertEqual(surnames, ['Patel', 'Shah', 'Desai'])
+        self.assertEqual(self.get({'min_age': 'old'}).status_code, 400)
+
+    def test_entries_follow_saves_and_deletes(self):
+        member = NewFamilyMember.objects.get(name='Meena', surname='Desai')
+        member.name = 'Meera'
+        member.save()
+        self.assertEqual(member.directory_entry.name, 'Meera')
+        member.delete()
+        self.assertEqual(DirectoryEntry.objects.filter(surname='Desai').count(), 2)
+
+
+@override_settings(SEARCH_BACKEND='simple')
+class DirectoryFacetTests(TestCase):
+    """The browse counts every facet with a grouped query of its own, cached until the next write"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='9826000000')
+        for index, (city, education) in enumerate((('Surat', 'phd'), ('સુરત', 'master'), ('Rajkot', 'phd'))):
+            profile = NewPersonalProfile.objects.create(
+                user=User.objects.create_user(username=f'982600000{index + 1}'), surname='Patel', name='Head',
+                city=city, education=education, bloodGroup='O+', caste='Leuva'
+            )
+            NewFamilyMember.objects.create(profile=profile, surname='Patel', name='Kiran', relation='son', city=city, bloodGroup='A+')
+
+    def get(self, params):
+        request = APIRequestFactory().get('/api/community/browse/', params)
+        force_authenticate(request, user=self.user)
+        return DirectoryBrowseView.as_view()(request)
+
+    def facet(self, response, name):
+        return [(item['value'], item['label'], item['count']) for item in response.data['facets'][name]]
+
+    def test_counts_come_from_a_query_per_facet_and_are_cached(self):
+        # Family ids, their entries and the counts of the six facets
+        with self.assertNumQueries(8):
+            response = self.get({'bloodGroup': 'O+,A+'})
+        self.assertEqual(self.facet(response, 'city'), [('Surat', 'Surat', 4), ('Rajkot', 'Rajkot', 2)])
+        self.assertEqual(self.facet(response, 'education'), [('phd', 'PhD', 2), ('master', "Master's Degree", 1)])
+        self.assertEqual(self.facet(response, 'bloodGroup'), [('A+', 'A+', 3), ('O+', 'O+', 3)])
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get({'bloodGroup': 'O+,A+'}).data['facets'], response.data['facets'])
+
+    def test_filters_narrow_the_counts_and_writes_invalidate_them(self):
+        response = self.get({'education': 'phd', 'city': 'surat'})
+        self.assertEqual(self.facet(response, 'caste'), [('Leuva', 'Leuva', 1)])
+        self.assertEqual([result['family']['city'] for result in response.data['results']], ['Surat'])
+
+        profile = NewPersonalProfile.objects.get(city='સુરત')
+        profile.education = 'phd'
+        profile.save()
+        self.assertEqual(self.facet(self.get({'education': 'phd', 'city': 'surat'}), 'caste'), [('Leuva', 'Leuva', 2)])
+
+
+class AutocompleteTests(TestCase):
+    """Suggestions come from the name prefix columns, most common first, and repeat prefixes from memory"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='9827000000')
+        for index, surname in enumerate(('Patel', 'Patel', 'Patelia')):
+            profile = NewPersonalProfile.objects.create(
+                user=User.objects.create_user(username=f'982700000{index + 1}'), surname=surname, name='Ramesh'
+            )
+            NewFamilyMember.objects.create(profile=profile, surname=surname, name='Kiran', relation='son')
+
+    def setUp(self):
+        from .autocomplete import prefix_cache
+        prefix_cache.clear()
+
+    def get(self, params):
+        request = APIRequestFactory().get('/api/community/autocomplete/', params)
+        force_authenticate(request, user=self.user)
+        return AutocompleteView.as_view()(request)
+
+    def names(self, params):
+        return [(item['name'], item['count']) for item in self.get(params).data['suggestions']]
+
+    def test_prefix_matches_either_name_order(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                self.names({'q': 'pat'}),
+                [('Patel Kiran', 2), ('Patel Ramesh', 2), ('Patelia Kiran', 1), ('Patelia Ramesh', 1)],
+            )
+        self.assertEqual(self.names({'q': 'Kiran  PATELI', 'limit': 5}), [('Patelia Kiran', 1)])
+        self.assertEqual(self.names({'q': 'patel k', 'limit': 1}), [('Patel Kiran', 2)])
+        self.assertEqual(self.names({'q': ' '}), [])
+        self.assertEqual(self.get({'q': 'pat', 'limit': 'ten'}).status_code, 400)
+
+    def test_repeat_prefixes_are_cached_until_a_write(self):
+        self.names({'q': 'ram'})
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names({'q': 'ram'}), [('Patel Ramesh', 2), ('Patelia Ramesh', 1)])
+        NewFamilyMember.objects.create(profile=NewPersonalProfile.objects.filter(surname='Patelia').first(), surname='Patelia', name='Ramesh')
+        self.assertEqual(self.names({'q': 'ram'}), [('Patel Ramesh', 2), ('Patelia Ramesh', 2)])
+
+    def test_cached_suggestions_expire(self):
+        from .autocomplete import PrefixCache
+
+        lasting, expired = PrefixCache(1, 60), PrefixCache(1, 0)
+        for prefix_cache in (lasting, expired):
+            prefix_cache.set('pat', ['Patel Kiran'])
+        self.assertEqual(lasting.get('pat'), ['Patel Kiran'])
+        self.assertIsNone(expired.get('pat'))
+        self.assertEqual(expired.entries, {})
@@ -0,0 +1,115 @@
+# Script-independent keys for the family search.
+# Names are stored in Gujarati by the Excel imports and update_to_gujarati, and in English by the
+# signup and revert_to_english, so 'Patel' and 'પટેલ' have to meet somewhere. phonetic_key() turns
+# both into the same Latin spelling: Gujarati is transliterated with the tables below, then every
+# spelling is folded the same way (bh -> b, sh -> s, ee -> i, w -> v, doubled letters once, and no
+# 'a' between two consonants, which is where Gujarati spellings and English ones disagree most:
+# ભાવનગર is bhavanagar letter by letter, Bhavnagar in English). 'Rameshbhai' and 'રમેશભાઈ' both
+# become 'rmesbai', 'Bhavnagar' and 'ભાવનગર' both 'bvngr'.
+#
+# The tables are plain dicts so a spelling can be fixed in one place; after changing them run
+# `manage.py rebuild_search_index` to recompute the stored keys. word_key() is cached, so the
+# surnames and cities that repeat across a directory are only transliterated once per process.
+
+import re
+import unicodedata
+from functools import lru_cache
+
+# Consonants carry an inherent 'a' unless a vowel sign or the virama follows
+GUJARATI_CONSONANTS = {
+    'ક': 'k', 'ખ': 'kh', 'ગ': 'g', 'ઘ': 'gh', 'ઙ': 'n',
+    'ચ': 'ch', 'છ': 'chh', 'જ': 'j', 'ઝ': 'jh', 'ઞ': 'n',
+    'ટ': 't', 'ઠ': 'th', 'ડ': 'd', 'ઢ': 'dh', 'ણ': 'n',
+    'ત': 't', 'થ': 'th', 'દ': 'd', 'ધ': 'dh', 'ન': 'n',
+    'પ': 'p', 'ફ': 'f', 'બ': 'b', 'ભ': 'bh', 'મ': 'm',
+    'ય': 'y', 'ર': 'r', 'લ': 'l', 'ળ': 'l', 'વ': 'v',
+    'શ': 'sh', 'ષ': 'sh', 'સ': 's', 'હ': 'h',
+}
+GUJARATI_VOWELS = {
+    'અ': 'a', 'આ': 'a', 'ઇ': 'i', 'ઈ': 'i', 'ઉ': 'u', 'ઊ': 'u', 'ઋ': 'ru',
+    'એ': 'e', 'ઐ': 'ai', 'ઓ': 'o', 'ઔ': 'au', 'ઍ': 'e', 'ઑ': 'o',
+}
+GUJARATI_VOWEL_SIGNS = {
+    'ા': 'a', 'િ': 'i', 'ી': 'i', 'ુ': 'u', 'ૂ': 'u', 'ૃ': 'ru',
+    'ે': 'e', 'ૈ': 'ai', 'ો': 'o', 'ૌ': 'au', 'ૅ': 'e', 'ૉ': 'o',
+}
+GUJARATI_OTHER = {
+    'ં': 'n', 'ઁ': 'n', 'ઃ': 'h', '઼': '',
+    '૦': '0', '૧': '1', '૨': '2', '૩': '3', '૪': '4', '૫': '5', '૬': '6', '૭': '7', '૮': '8', '૯': '9',
+}
+# Conjuncts that are not pronounced like their parts
+GUJARATI_CONJUNCTS = {'જ્ઞ': 'gn', 'ક્ષ': 'ksh'}
+VIRAMA = '્'
+
+# Applied in order to the Latin spelling; they fold the common ways of writing the same sound
+CONSONANT = '[b-df-hj-np-tv-z]'
+LATIN_FOLDS = (
+    (r'ee', 'i'), (r'oo', 'u'),
+    (r'ph', 'f'),
+    (r'sh', 's'),
+    (r'(?<=[bdgjkpt])h', ''),    # aspirates: bh -> b, kh -> k, th -> t
+    (r'w', 'v'), (r'z', 'j'), (r'q', 'k'), (r'x', 'ks'),
+    (r'c(?!h)', 'k'),
+    (r'(.)\1+', r'\1'),          # pattel -> patel, chh -> ch
+    (rf'(?<={CONSONANT})a(?={CONSONANT})', ''),
+    (r'(.)\1+', r'\1'),
+)
+LATIN_FOLD_PATTERNS = [(re.compile(pattern), replacement) for pattern, replacement in LATIN_FOLDS]
+
+
+def transliterate_gujarati(word):
+    """Latin spelling of a Gujarati word; other characters are left as they are"""
+    # (letter, vowel) units: vowel None is the inherent 'a', '' a consonant closed by the virama
+    units = []
+    index = 0
+    while index < len(word):
+        conjunct = next((c for c in GUJARATI_CONJUNCTS if word.startswith(c, index)), None)
+        if conjunct:
+            units.append([GUJARATI_CONJUNCTS[conjunct], None])
+            index += len(conjunct)
+            continue
+        ch = word[index]
+        index += 1
+        if ch in GUJARATI_CONSONANTS:
+            units.append([GUJARATI_CONSONANTS[ch], None])
+        elif ch in GUJARATI_VOWEL_SIGNS and units and units[-1][1] is None:
+            units[-1][1] = GUJARATI_VOWEL_SIGNS[ch]
+        elif ch == VIRAMA and units and units[-1][1] is None:
+            units[-1][1] = ''
+        elif ch in GUJARATI_VOWELS:
+            units.append(['', GUJARATI_VOWELS[ch]])
+        else:
+            units.append([GUJARATI_OTHER.get(ch, ch), ''])
+
+    letters = []
+    for position, (letter, vowel) in enumerate(units):
+        if vowel is None:
+            # The inherent 'a' is not pronounced at the end of a word (પટેલ: patel, but ન: na)
+            vowel = '' if position == len(units) - 1 and position > 0 else 'a'
+        letters.append(letter + vowel)
+    return ''.join(letters)
+
+
+def fold_latin(word):
+    """Lowercase ASCII spelling with the LATIN_FOLDS applied"""
+    word = unicodedata.normalize('NFKD', word.casefold())
+    word = ''.join(ch for ch in word if not unicodedata.combining(ch))
+    for pattern, replacement in LATIN_FOLD_PATTERNS:
+        word = pattern.sub(replacement, word)
+    return word
+
+
+@lru_cache(maxsize=50000)
+def word_key(word):
+    """The phonetic key of one word in either script"""
+    return fold_latin(transliterate_gujarati(word))
+
+
+def phonetic_key(text):
+    """Phonetic keys of the words of text (normalized with search.search_text), each word once"""
+    keys = []
+    for word in text.split():
+        key = word_key(word)
+        if key and key not in keys:
+            keys.append(key)
+    return ' '.join(keys)
@@ -11,8 +11,8 @@ from .views import FamilyViewSet
 from .views import TestPublicView
 from .views import EditProfileView
 from .views import NewProfileListView
-from .views import AllFamiliesView, FamilyMemberRegistrationView, FamilyMemberListView, FamilyMemberRemoveAccessView, FamilyMemberAvailableListView, ActivitiesView, FamilyMemberFamilyView, UserPermissionsView, FeaturedFamiliesView, SuggestedConnectionsView, ConnectFamilyView, CommunityActivitiesView, AcceptedConnectionsView, PendingRequestsView, FindConnectionsView, ConnectionResponseView, PrivateMessagesView, FamilyEventsView, FamilyEventDetailView, EventInvitationsView, EventResponseView, EventAttendeesView, FamilyUpdatesView, FamilyProfileView, SearchFamiliesView, DashboardStatsView, UserNumbersView, ForgotPasswordView, ResetPasswordView, MobileLoginOtpView, VerifyMobileOtpView, SetMobilePasswordView, TransformRelationView
-from .excel_upload import UploadExcelView
+from .views import AllFamiliesView, FamilyMemberRegistrationView, FamilyMemberListView, FamilyMemberRemoveAccessView, FamilyMemberAvailableListView, ActivitiesView, FamilyMemberFamilyView, UserPermissionsView, FeaturedFamiliesView, SuggestedConnectionsView, ConnectFamilyView, CommunityActivitiesView, AcceptedConnectionsView, PendingRequestsView, FindConnectionsView, ConnectionResponseView, PrivateMessagesView, FamilyEventsView, FamilyEventDetailView, EventInvitationsView, EventResponseView, EventAttendeesView, FamilyUpdatesView, FamilyProfileView, SearchFamiliesView, DirectorySearchView, DirectoryBrowseView, AutocompleteView, DashboardStatsView, UserNumbersView, ForgotPasswordView, ResetPasswordView, MobileLoginOtpView, VerifyMobileOtpView, SetMobilePasswordView, TransformRelationView
+from .excel_upload import UploadExcelView, ImportJobStatusView
 
 router = DefaultRouter()
 router.register(r'families', FamilyViewSet, basename='family')
@@ -24,6 +24,7 @@ urlpatterns = [
     path('forgot-password/', ForgotPasswordView.as_view(), name='forgot-password'),
     path('reset-password/', ResetPasswordView.as_view(), name='reset-password'),
     path('upload-excel/', UploadExcelView.as_view(), name='upload-excel'),
+    path('import-jobs/<int:job_id>/', ImportJobStatusView.as_view(), name='import-job-status'),
     path('mobile-login-otp/', MobileLoginOtpView.as_view(), name='mobile-login-otp'),
     path('verify-mobile-otp/', VerifyMobileOtpView.as_view(), name='verify-mobile-otp'),
     path('set-mobile-password/', SetMobilePasswordView.as_view(), name='set-mobile-password'),
@@ -53,6 +54,9 @@ urlpatterns = [
     path('community/connections/<int:connection_id>/respond/', ConnectionResponseView.as_view(), name='connection-response'),
     path('community/connections/<int:connection_id>/', ConnectionResponseView.as_view(), name='connection-delete'),
     path('community/search-families/', SearchFamiliesView.as_view(), name='search-families'),
+    path('community/directory-search/', DirectorySearchView.as_view(), name='directory-search'),
+    path('community/browse/', DirectoryBrowseView.as_view(), name='directory-browse'),
+    path('community/autocomplete/', AutocompleteView.as_view(), name='autocomplete'),
     path('user-numbers/', UserNumbersView.as_view(), name='user-numbers'),
     # New post-connection features
     path('community/messages/', PrivateMessagesView.as_view(), name='private-messages'),
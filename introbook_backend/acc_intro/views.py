@@ -6,12 +6,12 @@ from rest_framework import generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.authtoken.models import Token
 from rest_framework import viewsets
+from rest_framework.exceptions import NotFound
 from django.db import models
-from django.db.models import Q
+from django.db.models import Q, prefetch_related_objects
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.models import User
-from django.contrib.auth import authenticate
 from django.utils import timezone
 from .models import (
     UserProfile, FamilyMember, NewPersonalProfile, NewFamilyMember, 
@@ -21,18 +21,22 @@ from .models import (
 from .serializers import (
     UserProfileSerializer, NewPersonalProfileSerializer, 
     FamilySerializer, FamilyMemberSerializer, PrivateMessageSerializer,
-    FamilyEventSerializer, FamilyUpdateSerializer
+    FamilyEventSerializer, FamilyUpdateSerializer, sparse_fieldset
 )
-import random
 import json
 import os
 from twilio.rest import Client
 import pandas as pd
+from .bulk_import import get_import_writer
+from .excel_families import partition_families, stream_families
+from .excel_parsing import parse_gujarati_name, split_address
+from .mobile_utils import mobile_key, resolve_mobile_identity
+from .login_throttle import is_throttled, record_failure, reset_failures
+from .otp_store import get_otp_backend
+from .authentication import invalidate_user_auth
+from .pagination import paginate_keyset, next_page_url
 
 
-# In-memory OTP store (for demo; use a persistent store in production)
-OTP_STORE = {}
-
 class TestPublicView(APIView):
     permission_classes = [AllowAny]
     def get(self, request):
@@ -45,11 +49,11 @@ class EditProfileView(APIView):
         try:
             # Check if user is a family member
             try:
-                family_auth = FamilyMemberAuth.objects.get(user=request.user, is_active=True)
+                family_auth = request.identity.get_family_auth()
                 # Family member - return their family's data but mark as read-only
                 family_member = family_auth.family_member
                 main_profile = family_member.profile
-                serializer = NewPersonalProfileSerializer(main_profile)
+                serializer = NewPersonalProfileSerializer(main_profile, **sparse_fieldset(request))
                 data = serializer.data
                 data['user_type'] = 'family_member'
                 data['is_read_only'] = True
@@ -71,19 +75,15 @@ class EditProfileView(APIView):
                     'signup_sakh': main_profile.sakh
                 })
                 
-                # Add member numbers to family_members array
+                # Add member numbers to family_members array (member_id is the formatted number)
                 if 'family_members' in data:
-                    for i, member_data in enumerate(data['family_members']):
-                        try:
-                            member_obj = main_profile.family_members.all()[i]
-                            member_data['member_number'] = member_obj.get_member_id()
-                        except IndexError:
-                            pass
+                    for member_data in data['family_members']:
+                        member_data['member_number'] = member_data['member_id']
                 return Response(data)
             except FamilyMemberAuth.DoesNotExist:
                 # Main user
-                profile = NewPersonalProfile.objects.get(user=request.user)
-                serializer = NewPersonalProfileSerializer(profile)
+                profile = request.identity.get_profile()
+                serializer = NewPersonalProfileSerializer(profile, **sparse_fieldset(request))
                 data = serializer.data
                 data['user_type'] = 'main_user'
                 data['is_read_only'] = False
@@ -99,14 +99,10 @@ class EditProfileView(APIView):
                     'signup_sakh': profile.sakh
                 })
                 
-                # Add member numbers to family_members array
+                # Add member numbers to family_members array (member_id is the formatted number)
                 if 'family_members' in data:
-                    for i, member_data in enumerate(data['family_members']):
-                        try:
-                            member_obj = profile.family_members.all()[i]
-                            member_data['member_number'] = member_obj.get_member_id()
-                        except IndexError:
-                            pass
+                    for member_data in data['family_members']:
+                        member_data['member_number'] = member_data['member_id']
                 return Response(data)
         except NewPersonalProfile.DoesNotExist:
             return Response({'detail': 'Profile not found.'}, status=status.HTTP_404_NOT_FOUND)
@@ -114,7 +110,7 @@ class EditProfileView(APIView):
     def post(self, request):
         # Check if user is a family member - they cannot edit
         try:
-            family_auth = FamilyMemberAuth.objects.get(user=request.user, is_active=True)
+            family_auth = request.identity.get_family_auth()
             return Response({
                 'error': 'Family members cannot edit profile or family data. Only the main user has edit permissions.'
             }, status=status.HTTP_403_FORBIDDEN)
@@ -161,7 +157,8 @@ class EditProfileView(APIView):
         print(f"Family data: {family_data}")
         
         try:
-            profile = NewPersonalProfile.objects.get(user=request.user)
+            # Not the cached profile: every column is written back below
+            profile = request.identity.get_profile_for_update()
             print(f"Found existing profile for user: {request.user.username}")
             
             # Handle avatar upload
@@ -344,10 +341,20 @@ class EditProfileView(APIView):
 class AllFamiliesView(APIView):
     permission_classes = [AllowAny]
     def get(self, request):
-        # Only return main profiles (heads of families), not family members
-        profiles = NewPersonalProfile.objects.all().order_by('user_number')
-        serializer = NewPersonalProfileSerializer(profiles, many=True, context={'request': request})
-        return Response(serializer.data)
+        # Only return main profiles (heads of families), not family members.
+        # One page at a time in user number order (?cursor=...&page_size=N), members in one extra query.
+        # ?fields=id,surname&expand=family_members loads and returns only those fields
+        fieldset = sparse_fieldset(request)
+        profiles = NewPersonalProfileSerializer.setup_eager_loading(
+            NewPersonalProfile.objects.all(), extra_columns=('user_number',), **fieldset
+        )
+        page, next_cursor = paginate_keyset(request, profiles, ('user_number', 'id'))
+        serializer = NewPersonalProfileSerializer(page, many=True, context={'request': request}, **fieldset)
+        return Response({
+            'results': serializer.data,
+            'next_cursor': next_cursor,
+            'next': next_page_url(request, next_cursor)
+        })
 
 class FamilyMemberListView(APIView):
     """View to list family members that can login"""
@@ -356,7 +363,7 @@ class FamilyMemberListView(APIView):
     def get(self, request):
         try:
             # Get the user's profile
-            profile = NewPersonalProfile.objects.get(user=request.user)
+            profile = request.identity.get_profile()
             
             # Get family members that have login access
             family_auths = FamilyMemberAuth.objects.filter(
@@ -392,7 +399,7 @@ class FamilyMemberRemoveAccessView(APIView):
     def delete(self, request, member_id):
         try:
             # Get the main user's profile
-            main_profile = NewPersonalProfile.objects.get(user=request.user)
+            main_profile = request.identity.get_profile()
             
             # Find the family member auth record
             family_auth = FamilyMemberAuth.objects.get(
@@ -428,7 +435,7 @@ class FamilyMemberAvailableListView(APIView):
     def get(self, request):
         try:
             # Get the main user's profile
-            main_profile = NewPersonalProfile.objects.get(user=request.user)
+            main_profile = request.identity.get_profile()
             
             # Get all family members
             family_members = NewFamilyMember.objects.filter(profile=main_profile)
@@ -469,7 +476,7 @@ class FamilyMemberRegistrationView(APIView):
     def post(self, request):
         try:
             # Get the main user's profile
-            main_profile = NewPersonalProfile.objects.get(user=request.user)
+            main_profile = request.identity.get_profile()
             
             # Get family member data
             family_member_id = request.data.get('family_member_id')
@@ -493,7 +500,7 @@ class FamilyMemberRegistrationView(APIView):
                 }, status=status.HTTP_404_NOT_FOUND)
             
             # Check if mobile number is already registered for family member auth
-            if FamilyMemberAuth.objects.filter(mobile_number=mobile_number).exists():
+            if FamilyMemberAuth.objects.filter(canonical_mobile=mobile_key(mobile_number)).exists():
                 return Response({
                     'error': 'Mobile number already registered for family member access'
                 }, status=status.HTTP_400_BAD_REQUEST)
@@ -554,7 +561,7 @@ class ActivitiesView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
                 
                 # Get user's activities
                 activities = CommunityActivity.objects.filter(
@@ -603,7 +610,7 @@ class FamilyMemberFamilyView(APIView):
         try:
             # Check if this user is a family member
             try:
-                family_auth = FamilyMemberAuth.objects.get(user=request.user, is_active=True)
+                family_auth = request.identity.get_family_auth()
                 family_member = family_auth.family_member
                 main_profile = family_member.profile
                 
@@ -680,15 +687,17 @@ class FeaturedFamiliesView(APIView):
     def get(self, request):
         try:
             from .models import FeaturedFamily
+            from .profile_queries import with_member_counts
             
-            # Get featured families
-            featured_families = FeaturedFamily.objects.filter(is_active=True).select_related('profile')[:6]
+            # Get featured families, with the member counts in the same query
+            featured_families = with_member_counts(
+                FeaturedFamily.objects.filter(is_active=True).select_related('profile'), 'profile__'
+            )[:6]
             
             families_data = []
             for featured in featured_families:
                 profile = featured.profile
-                # Count family members
-                family_members_count = profile.family_members.count()
+                family_members_count = featured.members_count
                 
                 families_data.append({
                     'id': profile.id,
@@ -722,10 +731,11 @@ class SuggestedConnectionsView(APIView):
     def get(self, request):
         try:
             from .models import FamilyConnection
+            from .profile_queries import with_member_counts, with_mutual_connections
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -753,21 +763,14 @@ class SuggestedConnectionsView(APIView):
             elif current_profile.hometown:
                 suggestions = suggestions.filter(hometown__icontains=current_profile.hometown)
             
+            # Member and mutual connection counts are annotated instead of counted per card
+            suggestions = with_mutual_connections(with_member_counts(suggestions), current_profile)
             suggestions = suggestions[:6]  # Limit to 6 suggestions
             
             suggestions_data = []
             for profile in suggestions:
-                # Count mutual connections
-                mutual_count = FamilyConnection.objects.filter(
-                    initiator=current_profile,
-                    receiver__in=FamilyConnection.objects.filter(
-                        initiator=profile,
-                        status='accepted'
-                    ).values_list('receiver', flat=True),
-                    status='accepted'
-                ).count()
-                
-                family_members_count = profile.family_members.count()
+                mutual_count = profile.mutual_connections
+                family_members_count = profile.members_count
                 
                 suggestions_data.append({
                     'id': profile.id,
@@ -814,7 +817,7 @@ class ConnectFamilyView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -928,7 +931,7 @@ class AcceptedConnectionsView(APIView):
         try:
             from .models import FamilyConnection
             
-            current_profile = NewPersonalProfile.objects.get(user=request.user)
+            current_profile = request.identity.get_profile()
             
             # Get all accepted connections
             accepted_connections = FamilyConnection.objects.filter(
@@ -963,7 +966,7 @@ class PendingRequestsView(APIView):
         try:
             from .models import FamilyConnection
             
-            current_profile = NewPersonalProfile.objects.get(user=request.user)
+            current_profile = request.identity.get_profile()
             
             # Get sent pending requests
             sent_requests = FamilyConnection.objects.filter(
@@ -1021,8 +1024,9 @@ class FindConnectionsView(APIView):
     def get(self, request):
         try:
             from .models import FamilyConnection
+            from .profile_queries import with_member_counts
             
-            current_profile = NewPersonalProfile.objects.get(user=request.user)
+            current_profile = request.identity.get_profile()
             
             # Get existing connections
             existing_connections = FamilyConnection.objects.filter(
@@ -1035,7 +1039,7 @@ class FindConnectionsView(APIView):
                 excluded_ids.add(receiver_id)
             
             # Get suggested families
-            suggestions = NewPersonalProfile.objects.exclude(id__in=excluded_ids)[:20]
+            suggestions = with_member_counts(NewPersonalProfile.objects.exclude(id__in=excluded_ids))[:20]
             
             suggestions_data = []
             for profile in suggestions:
@@ -1045,7 +1049,7 @@ class FindConnectionsView(APIView):
                     'city': profile.city,
                     'hometown': profile.hometown,
                     'avatar': profile.avatar.url if profile.avatar else None,
-                    'membersCount': profile.family_members.count() + 1
+                    'membersCount': profile.members_count + 1
                 })
             
             return Response({'success': True, 'suggestions': suggestions_data})
@@ -1064,7 +1068,7 @@ class ConnectionResponseView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -1139,7 +1143,7 @@ class ConnectionResponseView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -1194,7 +1198,7 @@ class PrivateMessagesView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -1206,10 +1210,10 @@ class PrivateMessagesView(APIView):
             
             if partner_id:
                 # Get messages with specific partner
-                messages = PrivateMessage.objects.filter(
+                messages = PrivateMessageSerializer.setup_eager_loading(PrivateMessage.objects.filter(
                     (Q(sender=current_profile) & Q(receiver_id=partner_id)) |
                     (Q(sender_id=partner_id) & Q(receiver=current_profile))
-                ).order_by('created_at')
+                ).order_by('created_at'))
                 
                 # Mark received messages as read
                 PrivateMessage.objects.filter(
@@ -1298,7 +1302,7 @@ class PrivateMessagesView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -1365,7 +1369,7 @@ class FamilyEventsView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -1373,12 +1377,14 @@ class FamilyEventsView(APIView):
                 }, status=404)
             
             # Get events organized by user
-            organized_events = FamilyEvent.objects.filter(organizer=current_profile)
+            organized_events = FamilyEventSerializer.setup_eager_loading(
+                FamilyEvent.objects.filter(organizer=current_profile)
+            )
             
             # Get events user is invited to (including public events that need invitations)
-            invited_events = FamilyEvent.objects.filter(
+            invited_events = FamilyEventSerializer.setup_eager_loading(FamilyEvent.objects.filter(
                 invitations__invitee=current_profile
-            ).distinct()
+            ).distinct())
             
             # Get public events from connected families
             from .models import FamilyConnection
@@ -1391,19 +1397,14 @@ class FamilyEventsView(APIView):
             for initiator_id, receiver_id in connected_families:
                 connected_ids.add(initiator_id if initiator_id != current_profile.id else receiver_id)
             
-            # Public events (is_public=True) are invitation-only, so no auto-visible events from connected families
-            public_events = FamilyEvent.objects.none()  # Empty queryset
-            
-            # Get events visible to ALL users (including own events)
-            all_user_events = FamilyEvent.objects.filter(
+            # Public events (is_public=True) are invitation-only, so no auto-visible events from connected families.
+            # The events visible to ALL users (including own events) are the only public events; used
+            # directly instead of a union with an empty queryset, because a union cannot be prefetched
+            public_events = FamilyEventSerializer.setup_eager_loading(FamilyEvent.objects.filter(
                 visible_to_all=True
             ).exclude(
                 id__in=invited_events.values_list('id', flat=True)
-            )
-            
-            # Combine all public events
-            all_public_events = public_events.union(all_user_events) 
-            public_events = all_public_events
+            ))
             
             # Serialize all events
             organized_serializer = FamilyEventSerializer(organized_events, many=True)
@@ -1432,7 +1433,7 @@ class FamilyEventsView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -1517,7 +1518,7 @@ class EventInvitationsView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -1569,7 +1570,7 @@ class EventInvitationsView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -1639,7 +1640,7 @@ class EventInvitationsView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -1688,7 +1689,7 @@ class EventResponseView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -1741,7 +1742,7 @@ class EventAttendeesView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -1799,7 +1800,7 @@ class FamilyUpdatesView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -1817,10 +1818,10 @@ class FamilyUpdatesView(APIView):
                 connected_ids.add(initiator_id if initiator_id != current_profile.id else receiver_id)
             
             # Get updates from connected families
-            updates = FamilyUpdate.objects.filter(
+            updates = FamilyUpdateSerializer.setup_eager_loading(FamilyUpdate.objects.filter(
                 family_id__in=connected_ids,
                 is_public=True
-            ).order_by('-created_at')[:20]  # Limit to 20 recent updates
+            )).order_by('-created_at')[:20]  # Limit to 20 recent updates
             
             serializer = FamilyUpdateSerializer(updates, many=True)
             
@@ -1842,7 +1843,7 @@ class FamilyUpdatesView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -1883,16 +1884,19 @@ class FamilyProfileView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
                     'message': 'Your profile not found'
                 }, status=404)
             
-            # Get the requested profile
+            # Get the requested profile, only the columns asked for with ?fields=
+            fieldset = sparse_fieldset(request)
             try:
-                target_profile = NewPersonalProfile.objects.get(id=profile_id)
+                target_profile = NewPersonalProfileSerializer.setup_eager_loading(
+                    NewPersonalProfile.objects.all(), **fieldset
+                ).get(id=profile_id)
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -1912,20 +1916,16 @@ class FamilyProfileView(APIView):
                     'message': 'You can only view profiles of connected families'
                 }, status=403)
             
-            # Get family members
-            family_members = NewFamilyMember.objects.filter(profile=target_profile)
-            
-            # Serialize the data
-            from .serializers import NewPersonalProfileSerializer, NewFamilyMemberSerializer
-            profile_data = NewPersonalProfileSerializer(target_profile).data
-            family_members_data = NewFamilyMemberSerializer(family_members, many=True).data
-            
-            return Response({
+            # Serialize the data, the members come from the prefetch (and only if they are rendered)
+            from .serializers import NewFamilyMemberSerializer
+            data = {
                 'success': True,
-                'profile': profile_data,
-                'family_members': family_members_data,
+                'profile': NewPersonalProfileSerializer(target_profile, **fieldset).data,
                 'is_connected': True
-            })
+            }
+            if NewPersonalProfileSerializer.includes('family_members', **fieldset):
+                data['family_members'] = NewFamilyMemberSerializer(target_profile.family_members.all(), many=True).data
+            return Response(data)
             
         except Exception as e:
             return Response({
@@ -1966,26 +1966,17 @@ class SignupView(APIView):
             print(f"Validation error: {error_msg}")
             return Response({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Clean mobile number and check variants for duplicate check
+        # Clean mobile number, it becomes the username
         clean_mobile = mobile.replace('+', '') if mobile else ''
         if clean_mobile.startswith('91') and len(clean_mobile) == 12:
             clean_mobile = clean_mobile[2:]
         
-        mobile_variants = [mobile, clean_mobile]
-        if mobile.startswith('+91'):
-            mobile_variants.append(mobile[3:])
-        
-        # Check for duplicate mobile number in all variants
-        for mobile_variant in mobile_variants:
-            if User.objects.filter(username=mobile_variant).exists():
-                error_msg = 'Mobile number already registered.'
-                print(f"Validation error: {error_msg}")
-                return Response({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
-            
-            if NewPersonalProfile.objects.filter(mobileNumber=mobile_variant).exists():
-                error_msg = 'Mobile number already exists.'
-                print(f"Validation error: {error_msg}")
-                return Response({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
+        # Check for a duplicate mobile number, as a username or a profile mobile, in one query
+        existing = resolve_mobile_identity(mobile, kinds=('main_user', 'user'))
+        if existing:
+            error_msg = 'Mobile number already exists.' if existing.profile else 'Mobile number already registered.'
+            print(f"Validation error: {error_msg}")
+            return Response({'error': error_msg}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
             # Create the User with mobile number as username
@@ -2075,23 +2066,8 @@ class SendOTP(APIView):
         if not mobile:
             return Response({'error': 'Mobile number required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Clean mobile number and check variants
-        clean_mobile = mobile.replace('+', '') if mobile else ''
-        if clean_mobile.startswith('91') and len(clean_mobile) == 12:
-            clean_mobile = clean_mobile[2:]
-        
-        mobile_variants = [mobile, clean_mobile]
-        if mobile.startswith('+91'):
-            mobile_variants.append(mobile[3:])
-        
-        # Check if mobile number exists in system
-        mobile_exists = False
-        for mobile_variant in mobile_variants:
-            if (User.objects.filter(username=mobile_variant).exists() or 
-                NewPersonalProfile.objects.filter(mobileNumber=mobile_variant).exists() or
-                FamilyMemberAuth.objects.filter(mobile_number=mobile_variant, is_active=True).exists()):
-                mobile_exists = True
-                break
+        # Check if mobile number exists in system (username, profile mobile or family member login)
+        mobile_exists = resolve_mobile_identity(mobile) is not None
         
         # For signup: only send OTP if mobile number is NOT in system
         # For login: only send OTP if mobile number IS in system
@@ -2104,11 +2080,8 @@ class SendOTP(APIView):
         
         # For development/testing, let's create a simple OTP without Twilio
         try:
-            # Generate a simple 6-digit OTP
-            otp_code = str(random.randint(100000, 999999))
-            
-            # Store OTP in memory (in production, use a proper database)
-            OTP_STORE[mobile] = otp_code
+            # Generate a simple 6-digit OTP, stored with an expiry in the shared OTP backend
+            otp_code = get_otp_backend().issue(mobile)
             
             print(f"Generated OTP for {mobile}: {otp_code}")
             
@@ -2138,13 +2111,8 @@ class VerifyOTP(APIView):
             return Response({'error': 'Mobile and OTP required'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            # Check if OTP exists and matches
-            stored_otp = OTP_STORE.get(mobile)
-            print(f"Stored OTP for {mobile}: {stored_otp}")
-            
-            if stored_otp and stored_otp == code:
-                # Remove OTP from store after successful verification
-                del OTP_STORE[mobile]
+            # Check if OTP exists, has not expired and matches (it is removed once verified)
+            if get_otp_backend().verify(mobile, code):
                 print(f"OTP verified successfully for {mobile}")
                 return Response({
                     'success': True,
@@ -2202,90 +2170,50 @@ def login_view(request):
             else:
                 return JsonResponse({'success': False, 'message': 'Invalid admin credentials'}, status=401)
         
-        # Clean mobile number (remove + and country code if present)
-        clean_mobile = mobile.replace('+', '') if mobile else ''
-        # Remove Indian country code 91 if present
-        if clean_mobile.startswith('91') and len(clean_mobile) == 12:
-            clean_mobile = clean_mobile[2:]  # Remove '91' prefix
-        
-        # Also try with original mobile format for backward compatibility
-        mobile_variants = [mobile, clean_mobile]
-        if mobile.startswith('+91'):
-            mobile_variants.append(mobile[3:])  # Remove '+91' directly
-        
-        # Remove duplicates and print for debugging
-        mobile_variants = list(set(mobile_variants))
-        print(f"Mobile variants to try: {mobile_variants}")
+        # Too many recent failures for this mobile or client: refuse before doing any password hashing
+        if is_throttled(request, mobile):
+            print(f"✗ Login throttled for mobile: {mobile}")
+            return JsonResponse({'success': False, 'message': 'Too many failed login attempts. Please try again later.'}, status=429)
         
-        # Check if mobile number exists in system before authentication
-        mobile_exists = False
-        for mobile_variant in mobile_variants:
-            if (User.objects.filter(username=mobile_variant).exists() or 
-                NewPersonalProfile.objects.filter(mobileNumber=mobile_variant).exists() or
-                FamilyMemberAuth.objects.filter(mobile_number=mobile_variant, is_active=True).exists()):
-                mobile_exists = True
-                break
-        
-        if not mobile_exists:
+        # Resolve the account first with the indexed canonical mobile lookup (family member logins win),
+        # then verify the password exactly once
+        identity = resolve_mobile_identity(mobile)
+        if not identity:
+            record_failure(request, mobile)
             return JsonResponse({'success': False, 'message': 'Mobile number not found in system'}, status=404)
         
-        # Try multiple authentication methods
-        user = None
+        user = identity.user
+        print(f"Account found for mobile {mobile}: {identity.kind} {user.username}")
         
-        # Method 1: Try family member authentication FIRST with all mobile variants (prioritize family members)
-        for mobile_variant in mobile_variants:
-            try:
-                family_auth = FamilyMemberAuth.objects.get(mobile_number=mobile_variant, is_active=True)
-                user = authenticate(username=family_auth.user.username, password=password)
-                if user and user == family_auth.user:
-                    print(f"✓ Family member login successful with variant '{mobile_variant}': {user.username}")
-                    # Update last login
-                    family_auth.last_login = timezone.now()
-                    family_auth.save()
-                    token, created = Token.objects.get_or_create(user=user)
-                    return JsonResponse({
-                        'success': True, 
-                        'token': token.key, 
-                        'message': 'Family member login successful',
-                        'user_type': 'family_member',
-                        'family_member_id': family_auth.family_member.id,
-                        'family_member_name': f"{family_auth.family_member.surname} {family_auth.family_member.name}"
-                    })
-            except FamilyMemberAuth.DoesNotExist:
-                continue
-        
-        # Method 2: Try with all mobile variants as username (main user)
-        for mobile_variant in mobile_variants:
-            user = authenticate(username=mobile_variant, password=password)
-            if user:
-                print(f"✓ Login successful with mobile variant '{mobile_variant}' as username: {user.username}")
-                token, created = Token.objects.get_or_create(user=user)
+        if user.is_active and user.check_password(password):
+            reset_failures(mobile)
+            token, created = Token.objects.get_or_create(user=user)
+            
+            if identity.kind == 'family_member':
+                print(f"✓ Family member login successful: {user.username}")
+                family_auth = FamilyMemberAuth.objects.select_related('family_member').get(id=identity.family_auth_id)
+                # Update last login
+                family_auth.last_login = timezone.now()
+                family_auth.save(update_fields=['last_login'])
                 return JsonResponse({
                     'success': True, 
                     'token': token.key, 
-                    'message': 'Login successful',
-                    'user_type': 'main_user'
+                    'message': 'Family member login successful',
+                    'user_type': 'family_member',
+                    'family_member_id': family_auth.family_member.id,
+                    'family_member_name': f"{family_auth.family_member.surname} {family_auth.family_member.name}"
                 })
+            
+            print(f"✓ Login successful: {user.username}")
+            return JsonResponse({
+                'success': True, 
+                'token': token.key, 
+                'message': 'Login successful',
+                'user_type': 'main_user'
+            })
         
-        # Method 3: Try to find user by profile mobile number with all variants (main user)
-        for mobile_variant in mobile_variants:
-            try:
-                profile = NewPersonalProfile.objects.get(mobileNumber=mobile_variant)
-                user = authenticate(username=profile.user.username, password=password)
-                if user and user == profile.user:
-                    print(f"✓ Login successful via profile mobile variant '{mobile_variant}': {user.username}")
-                    token, created = Token.objects.get_or_create(user=user)
-                    return JsonResponse({
-                        'success': True, 
-                        'token': token.key, 
-                        'message': 'Login successful',
-                        'user_type': 'main_user'
-                    })
-            except NewPersonalProfile.DoesNotExist:
-                continue
-        
-        # If all methods fail for user login
-        print(f"✗ All authentication methods failed for mobile: {mobile}")
+        record_failure(request, mobile)
+        print(f"✗ Wrong password for mobile: {mobile}")
         return JsonResponse({'success': False, 'message': 'Invalid mobile number or password'}, status=401)
     
     return JsonResponse({'error': 'POST request required'}, status=400)
@@ -2331,37 +2259,35 @@ class NewProfileListView(APIView):
             current_user_profile = None
             try:
                 # Check if user is a family member
-                family_auth = FamilyMemberAuth.objects.get(user=request.user, is_active=True)
+                family_auth = request.identity.get_family_auth()
                 current_user_profile = family_auth.family_member.profile
             except FamilyMemberAuth.DoesNotExist:
                 # Main user
-                current_user_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_user_profile = request.identity.get_profile()
             
-            # Get all profiles except current user's profile, ordered by creation date (newest first)
-            profiles = NewPersonalProfile.objects.exclude(
-                id=current_user_profile.id
-            ).order_by('-id')[:20]  # Limit to 20 newest profiles
+            # Get all profiles except current user's profile, newest first, 20 per page (?cursor= for the next)
+            fieldset = sparse_fieldset(request)
+            profiles = NewPersonalProfileSerializer.setup_eager_loading(
+                NewPersonalProfile.objects.exclude(id=current_user_profile.id), **fieldset
+            )
+            page, next_cursor = paginate_keyset(request, profiles, ('-id',), default_page_size=20)
             
-            profiles_data = []
-            for profile in profiles:
-                try:
-                    serializer = NewPersonalProfileSerializer(profile)
-                    profile_data = serializer.data
-                    profiles_data.append(profile_data)
-                except Exception as e:
-                    print(f"Error serializing profile {profile.id}: {e}")
-                    continue
+            profiles_data = NewPersonalProfileSerializer(page, many=True, **fieldset).data
             
             return Response({
                 'success': True,
                 'profiles': profiles_data,
-                'count': len(profiles_data)
+                'count': len(profiles_data),
+                'next_cursor': next_cursor,
+                'next': next_page_url(request, next_cursor)
             })
             
         except NewPersonalProfile.DoesNotExist:
             return Response({
                 'error': 'User profile not found'
             }, status=status.HTTP_404_NOT_FOUND)
+        except NotFound as e:
+            return Response({'error': str(e.detail)}, status=status.HTTP_404_NOT_FOUND)
         except Exception as e:
             print(f"Error in NewProfileListView: {e}")
             return Response({
@@ -2377,7 +2303,7 @@ class UserPermissionsView(APIView):
         try:
             # Check if user is a family member or main user
             try:
-                family_auth = FamilyMemberAuth.objects.get(user=request.user, is_active=True)
+                family_auth = request.identity.get_family_auth()
                 # User is a family member
                 family_member = family_auth.family_member
                 main_profile = family_member.profile
@@ -2405,7 +2331,7 @@ class UserPermissionsView(APIView):
             except FamilyMemberAuth.DoesNotExist:
                 # User is main user
                 try:
-                    main_profile = NewPersonalProfile.objects.get(user=request.user)
+                    main_profile = request.identity.get_profile()
                     
                     return Response({
                         'success': True,
@@ -2453,7 +2379,7 @@ class UserNumbersView(APIView):
             # Get current user's profile and number
             try:
                 # Check if user is a family member
-                family_auth = FamilyMemberAuth.objects.get(user=request.user, is_active=True)
+                family_auth = request.identity.get_family_auth()
                 family_member = family_auth.family_member
                 main_profile = family_member.profile
                 
@@ -2468,7 +2394,7 @@ class UserNumbersView(APIView):
                 
             except FamilyMemberAuth.DoesNotExist:
                 # Main user
-                profile = NewPersonalProfile.objects.get(user=request.user)
+                profile = request.identity.get_profile()
                 
                 # Get family members count and their numbers
                 family_members = profile.family_members.all()
@@ -2500,6 +2426,81 @@ class UserNumbersView(APIView):
                 'message': f'Failed to fetch user numbers: {str(e)}'
             }, status=500)
 
+class DirectorySearchView(APIView):
+    """Member-level directory search over every head and family member, grouped by family.
+
+    ?q= searches names and places, ?relation=, ?min_age=, ?max_age=, ?city= and ?sakh= filter,
+    and ?cursor= / ?page_size= page through the families.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from .directory import filter_entries, paginate_families
+
+        try:
+            entries = filter_entries(request.query_params)
+            families, next_cursor = paginate_families(request, entries)
+        except ValueError as e:
+            return Response({'success': False, 'message': str(e)}, status=400)
+        except NotFound as e:
+            return Response({'success': False, 'message': str(e.detail)}, status=404)
+
+        return Response({
+            'success': True,
+            'results': families,
+            'count': len(families),
+            'next_cursor': next_cursor,
+            'next': next_page_url(request, next_cursor)
+        })
+
+class DirectoryBrowseView(APIView):
+    """Faceted browse of the directory: the filtered families like DirectorySearchView, plus the number of
+    matching people per city, sakh, caste, education, marital status and blood group.
+
+    Takes the filters of DirectorySearchView plus ?caste=, ?education=, ?maritalStatus= and ?bloodGroup=;
+    each facet filter takes comma separated values (any of them matches).
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from .directory import filter_entries, filters_from, paginate_families
+        from .facets import facet_counts
+
+        try:
+            entries = filter_entries(request.query_params)
+            families, next_cursor = paginate_families(request, entries)
+        except ValueError as e:
+            return Response({'success': False, 'message': str(e)}, status=400)
+        except NotFound as e:
+            return Response({'success': False, 'message': str(e.detail)}, status=404)
+
+        return Response({
+            'success': True,
+            'results': families,
+            'count': len(families),
+            'next_cursor': next_cursor,
+            'next': next_page_url(request, next_cursor),
+            'facets': facet_counts(entries, filters_from(request.query_params))
+        })
+
+class AutocompleteView(APIView):
+    """Name suggestions for the search box: ?q= is what has been typed so far, ?limit= how many (at most 20)"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from .autocomplete import DEFAULT_LIMIT, MAX_LIMIT, suggestions
+
+        try:
+            limit = int(request.query_params.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            return Response({'success': False, 'message': 'limit must be a whole number'}, status=400)
+        limit = max(1, min(limit, MAX_LIMIT))
+
+        return Response({
+            'success': True,
+            'suggestions': suggestions(request.query_params.get('q', ''), limit)
+        })
+
 class SearchFamiliesView(APIView):
     """View to search for families by name or surname"""
     permission_classes = [IsAuthenticated]
@@ -2508,7 +2509,7 @@ class SearchFamiliesView(APIView):
         try:
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -2526,6 +2527,8 @@ class SearchFamiliesView(APIView):
             
             # Get existing connections to exclude them from search results
             from .models import FamilyConnection
+            from .profile_queries import with_member_counts
+            from .search import get_search_backend
             existing_connections = FamilyConnection.objects.filter(
                 initiator=current_profile
             ).values_list('receiver_id', flat=True)
@@ -2537,17 +2540,17 @@ class SearchFamiliesView(APIView):
             # Combine both lists to exclude all connected profiles
             excluded_ids = list(existing_connections) + list(received_connections) + [current_profile.id]
             
-            # Search for families by surname or name (case-insensitive)
-            search_results = NewPersonalProfile.objects.filter(
-                Q(surname__icontains=search_query) |
-                Q(name__icontains=search_query) |
-                Q(fatherName__icontains=search_query)
-            ).exclude(id__in=excluded_ids)[:20]  # Limit to 20 results
+            # Search the indexed search documents (surname, name, father's name, sakh, city, area), best match first
+            search_results = get_search_backend().search(
+                with_member_counts(NewPersonalProfile.objects.exclude(id__in=excluded_ids)),
+                search_query,
+                limit=20
+            )
             
             # Format search results
             results_data = []
             for profile in search_results:
-                family_members_count = profile.family_members.count()
+                family_members_count = profile.members_count
                 
                 results_data.append({
                     'id': profile.id,
@@ -2590,7 +2593,7 @@ class FamilyEventDetailView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -2679,7 +2682,7 @@ class FamilyEventDetailView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -2720,37 +2723,16 @@ class ForgotPasswordView(APIView):
             return Response({'error': 'Mobile number required'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            # Clean mobile number
-            clean_mobile = mobile.replace('+', '') if mobile else ''
-            if clean_mobile.startswith('91') and len(clean_mobile) == 12:
-                clean_mobile = clean_mobile[2:]
-            
-            mobile_variants = [mobile, clean_mobile]
-            if mobile.startswith('+91'):
-                mobile_variants.append(mobile[3:])
-            
             # Check if mobile number exists in system
-            user_found = False
-            for mobile_variant in mobile_variants:
-                if User.objects.filter(username=mobile_variant).exists() or NewPersonalProfile.objects.filter(mobileNumber=mobile_variant).exists():
-                    user_found = True
-                    break
-            
-            if not user_found:
+            if not resolve_mobile_identity(mobile, kinds=('main_user', 'user')):
                 return Response({'error': 'Mobile number not registered'}, status=status.HTTP_404_NOT_FOUND)
             
-            # Generate OTP and store with original mobile format
-            otp_code = str(random.randint(100000, 999999))
-            OTP_STORE[mobile] = otp_code
-            
-            # Also store with clean mobile format for compatibility
-            for variant in mobile_variants:
-                OTP_STORE[variant] = otp_code
+            # Generate OTP, stored under the canonical mobile so every format of the number matches
+            otp_code = get_otp_backend().issue(mobile)
             
             print(f"\n=== FORGOT PASSWORD OTP ===")
             print(f"Mobile: {mobile}")
             print(f"OTP: {otp_code}")
-            print(f"Variants stored: {mobile_variants}")
             print(f"==========================\n")
             
             return Response({
@@ -2769,54 +2751,24 @@ class MobileLoginOtpView(APIView):
         if not mobile:
             return Response({'error': 'Mobile number required'}, status=400)
         
-        # Clean mobile number and check variants
-        clean_mobile = mobile.replace('+', '').replace(' ', '').replace('-', '')
-        if clean_mobile.startswith('91') and len(clean_mobile) == 12:
-            clean_mobile = clean_mobile[2:]
-        
         # Check if mobile exists in uploaded data and belongs to main user (not family member)
-        mobile_variants = [mobile, clean_mobile]
-        if mobile.startswith('+91'):
-            mobile_variants.append(mobile[3:])
-        
-        main_user_exists = False
-        for variant in mobile_variants:
-            if NewPersonalProfile.objects.filter(mobileNumber=variant).exists():
-                main_user_exists = True
-                break
-        
-        if not main_user_exists:
+        identity = resolve_mobile_identity(mobile, kinds=('main_user',))
+        if not identity:
             return Response({'error': 'Mobile number not found in system'}, status=404)
         
         # Check if this mobile belongs to a family member (prevent family member login)
-        family_member_exists = False
-        for variant in mobile_variants:
-            if NewFamilyMember.objects.filter(mobileNumber=variant).exists():
-                family_member_exists = True
-                break
-        
-        if family_member_exists:
+        if NewFamilyMember.objects.filter(canonical_mobile=mobile_key(mobile)).exists():
             return Response({'error': 'Family members cannot login through mobile login. Please contact the main user.'}, status=403)
         
-        # Check if main user already has a proper password set (not temp123)
-        for variant in mobile_variants:
-            try:
-                profile = NewPersonalProfile.objects.get(mobileNumber=variant)
-                user = profile.user
-                # If user has changed from default temp123 password, they should use regular login
-                if user.check_password('temp123'):
-                    # Still has temp password, can use mobile login
-                    continue
-                else:
-                    # Has set custom password, must use regular login
-                    return Response({'error': 'You have already set a password. Please use the regular login page.'}, status=403)
-            except NewPersonalProfile.DoesNotExist:
-                continue
+        # Only accounts that have not been activated yet can use mobile login: imported users have no usable
+        # password until they set one here (migration 0028 retired the old temp123 passwords), so no hash
+        # check is needed. The password_change_required flag alone is not trusted, older resets left it set.
+        if identity.user.has_usable_password():
+            # Has set custom password, must use regular login
+            return Response({'error': 'You have already set a password. Please use the regular login page.'}, status=403)
         
-        # Generate OTP and store for all variants
-        otp_code = str(random.randint(100000, 999999))
-        for variant in mobile_variants:
-            OTP_STORE[variant] = otp_code
+        # Generate OTP, stored under the canonical mobile so every format of the number matches
+        otp_code = get_otp_backend().issue(mobile)
         
         print(f"\n=== MOBILE LOGIN OTP ===")
         print(f"Mobile: {mobile}")
@@ -2838,22 +2790,8 @@ class VerifyMobileOtpView(APIView):
         if not mobile or not otp:
             return Response({'error': 'Mobile and OTP required'}, status=400)
         
-        # Check OTP for mobile variants
-        clean_mobile = mobile.replace('+', '').replace(' ', '').replace('-', '')
-        if clean_mobile.startswith('91') and len(clean_mobile) == 12:
-            clean_mobile = clean_mobile[2:]
-        
-        mobile_variants = [mobile, clean_mobile]
-        if mobile.startswith('+91'):
-            mobile_variants.append(mobile[3:])
-        
-        otp_valid = False
-        for variant in mobile_variants:
-            if OTP_STORE.get(variant) == otp:
-                otp_valid = True
-                break
-        
-        if not otp_valid:
+        # Check the OTP; it stays valid (until it expires) for SetMobilePasswordView, which removes it
+        if not get_otp_backend().verify(mobile, otp, consume=False):
             return Response({'error': 'Invalid OTP'}, status=400)
         
         return Response({'success': True, 'message': 'OTP verified'})
@@ -2863,42 +2801,36 @@ class SetMobilePasswordView(APIView):
     
     def post(self, request):
         mobile = request.data.get('mobile')
+        otp = request.data.get('otp')
         password = request.data.get('password')
         
-        if not mobile or not password:
-            return Response({'error': 'Mobile and password required'}, status=400)
+        if not mobile or not otp or not password:
+            return Response({'error': 'Mobile, OTP and password required'}, status=400)
         
         try:
-            # Find user by mobile variants
-            clean_mobile = mobile.replace('+', '').replace(' ', '').replace('-', '')
-            if clean_mobile.startswith('91') and len(clean_mobile) == 12:
-                clean_mobile = clean_mobile[2:]
-            
-            mobile_variants = [mobile, clean_mobile]
-            if mobile.startswith('+91'):
-                mobile_variants.append(mobile[3:])
+            # The code VerifyMobileOtpView checked (and kept alive); used up here
+            if not get_otp_backend().verify(mobile, otp):
+                return Response({'error': 'Invalid OTP'}, status=400)
             
-            profile = None
-            for variant in mobile_variants:
-                try:
-                    profile = NewPersonalProfile.objects.get(mobileNumber=variant)
-                    break
-                except NewPersonalProfile.DoesNotExist:
-                    continue
-            
-            if not profile:
+            # Find the main user by the canonical profile mobile
+            identity = resolve_mobile_identity(mobile, kinds=('main_user',))
+            if not identity:
                 return Response({'error': 'User not found'}, status=404)
             
-            user = profile.user
+            profile = identity.profile
+            user = identity.user
+            # Like MobileLoginOtpView: an activated account changes its password through the reset flow
+            if user.has_usable_password():
+                return Response({'error': 'You have already set a password. Please use the regular login page.'}, status=403)
             
-            # Set password
+            # Set password, this activates the account
             user.set_password(password)
             user.save()
-            
-            # Remove OTP for all variants
-            for variant in mobile_variants:
-                if variant in OTP_STORE:
-                    del OTP_STORE[variant]
+            if profile.password_change_required:
+                profile.password_change_required = False
+                profile.save(update_fields=['password_change_required'])
+            # Tokens cached before the password change must be looked up again
+            invalidate_user_auth(user.id)
             
             # Generate token
             from rest_framework.authtoken.models import Token
@@ -2928,51 +2860,21 @@ class ResetPasswordView(APIView):
             return Response({'error': 'Mobile, OTP and new password required'}, status=status.HTTP_400_BAD_REQUEST)
         
         try:
-            # Verify OTP - check all mobile variants
-            stored_otp = None
-            for variant in [mobile, mobile.replace('+', ''), mobile.replace('+91', '')]:
-                if OTP_STORE.get(variant) == otp:
-                    stored_otp = otp
-                    break
-            
-            if not stored_otp:
+            # Verify OTP (any format of the mobile; removed once used, expired or guessed too often)
+            if not get_otp_backend().verify(mobile, otp):
                 return Response({'error': 'Invalid OTP'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Clean mobile number
-            clean_mobile = mobile.replace('+', '') if mobile else ''
-            if clean_mobile.startswith('91') and len(clean_mobile) == 12:
-                clean_mobile = clean_mobile[2:]
-            
-            mobile_variants = [mobile, clean_mobile]
-            if mobile.startswith('+91'):
-                mobile_variants.append(mobile[3:])
-            
-            # Find and update user password
-            user_updated = False
-            for mobile_variant in mobile_variants:
-                try:
-                    user = User.objects.get(username=mobile_variant)
-                    user.set_password(new_password)
-                    user.save()
-                    user_updated = True
-                    break
-                except User.DoesNotExist:
-                    try:
-                        profile = NewPersonalProfile.objects.get(mobileNumber=mobile_variant)
-                        profile.user.set_password(new_password)
-                        profile.user.save()
-                        user_updated = True
-                        break
-                    except NewPersonalProfile.DoesNotExist:
-                        continue
-            
-            if not user_updated:
+            # Find and update user password (by username or profile mobile)
+            identity = resolve_mobile_identity(mobile, kinds=('main_user', 'user'))
+            if not identity:
                 return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
             
-            # Remove OTP from store for all variants
-            for variant in [mobile, mobile.replace('+', ''), mobile.replace('+91', '')]:
-                if variant in OTP_STORE:
-                    del OTP_STORE[variant]
+            user = identity.user
+            user.set_password(new_password)
+            user.save()
+            NewPersonalProfile.objects.filter(user=user, password_change_required=True).update(password_change_required=False)
+            # update() skips the signals, drop the cached token and profile explicitly
+            invalidate_user_auth(user.id)
             
             return Response({
                 'success': True,
@@ -2982,55 +2884,6 @@ class ResetPasswordView(APIView):
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-def parse_gujarati_name(full_name):
-    """Parse Gujarati name to extract surname and sakh"""
-    if not full_name or pd.isna(full_name):
-        return '', ''
-    
-    name = str(full_name).strip()
-    
-    # Remove prefixes like સ્વ., ગં.સ્વ
-    prefixes = ['સ્વ.', 'ગં.સ્વ', 'સ્વ', 'ગં.સ્વ.']
-    for prefix in prefixes:
-        if name.startswith(prefix):
-            name = name[len(prefix):].strip()
-            break
-    
-    # Split name into parts
-    parts = name.split()
-    if len(parts) == 0:
-        return '', ''
-    elif len(parts) == 1:
-        return parts[0], parts[0]  # surname and sakh same
-    else:
-        # Last word is sakh, first word is surname
-        surname = parts[0]
-        sakh = parts[-1]
-        return surname, sakh
-
-def parse_address(address):
-    """Parse address to extract area and city"""
-    if not address or pd.isna(address):
-        return '', '', address
-    
-    addr = str(address).strip()
-    
-    # Split by comma and get parts
-    parts = [part.strip() for part in addr.split(',')]
-    
-    if len(parts) < 2:
-        return '', '', addr
-    
-    # Last part is city, second to last is area
-    city = parts[-1]
-    area = parts[-2] if len(parts) > 1 else ''
-    
-    # Remove city and area from address for remaining address
-    remaining_parts = parts[:-2] if len(parts) > 2 else []
-    remaining_address = ', '.join(remaining_parts)
-    
-    return area, city, remaining_address
-
 class UploadExcelView(APIView):
     permission_classes = [AllowAny]
     
@@ -3043,42 +2896,59 @@ class UploadExcelView(APIView):
             if not uploaded_file.name.endswith('.xlsx'):
                 return Response({'success': False, 'error': 'Only .xlsx files are allowed'}, status=400)
             
-            df = pd.read_excel(uploaded_file)
+            # mode=bulk builds every row in memory and writes it with bulk_create at the end,
+            # mode=stream reads the workbook row by row and writes each batch as soon as it fills up
+            mode = request.data.get('mode') or request.query_params.get('mode') or 'standard'
+            writer = get_import_writer(mode)
+            
             records_created = 0
             records_skipped = 0
             processed_mains = set()
+            families_found = 0
             
-            print(f"\n=== EXCEL UPLOAD STARTED ===")
-            print(f"Excel loaded: {len(df)} rows, {len(df.columns)} columns")
-            print(f"First row data: {df.iloc[0].tolist() if len(df) > 0 else 'No data'}")
-            print(f"Current database has {NewPersonalProfile.objects.count()} existing users")
-            
-            # Get unique main members from column 0
-            main_members = df.iloc[:, 0].dropna().unique()
-            print(f"Found {len(main_members)} main members in Excel: {list(main_members)[:5]}")
-            
-            # Debug: Show all data for first few rows
-            print("\nDetailed Excel data:")
-            for i in range(min(10, len(df))):
-                print(f"Row {i}:")
-                for j in range(len(df.columns)):
-                    val = df.iloc[i, j]
-                    print(f"  Col{j}: '{val}' (type: {type(val).__name__})")
-                print()
-            
-            for main_name in main_members:
+            print(f"\n=== EXCEL UPLOAD STARTED ({mode} mode) ===")
+            
+            # Pick every family's main mobile up front: પોતે, then these relations, then anyone else
+            priority_relations = ['પુત્ર', 'પત્ની', 'પુત્રવધુ', 'દીકરી', 'ભાઈ', 'બહેન']
+            if mode == 'stream':
+                # Families are yielded one at a time, so the whole sheet is never held in memory
+                print(f"Current database has {NewPersonalProfile.objects.count()} existing users")
+                families = stream_families(uploaded_file, priority_relations)
+            else:
+                df = pd.read_excel(uploaded_file)
+                print(f"Excel loaded: {len(df)} rows, {len(df.columns)} columns")
+                print(f"First row data: {df.iloc[0].tolist() if len(df) > 0 else 'No data'}")
+                print(f"Current database has {NewPersonalProfile.objects.count()} existing users")
+                
+                # Split the sheet into families once instead of scanning the DataFrame for every main member
+                families = partition_families(df, priority_relations)
+                print(f"Found {len(families)} main members in Excel: {[family['main_name'] for family in families[:5]]}")
+                
+                # Debug: Show all data for first few rows
+                print("\nDetailed Excel data:")
+                for i in range(min(10, len(df))):
+                    print(f"Row {i}:")
+                    for j in range(len(df.columns)):
+                        val = df.iloc[i, j]
+                        print(f"  Col{j}: '{val}' (type: {type(val).__name__})")
+                    print()
+            
+            for family in families:
+                families_found += 1
+                if mode == 'stream' and writer.pending_count() >= writer.batch_size:
+                    writer.flush()
+                
+                main_name = family['main_name']
                 try:
-                    main_name = str(main_name).strip()
                     if not main_name or main_name in processed_mains:
                         continue
                     
-                    # Find all rows for this main person
-                    family_rows = df[df.iloc[:, 0] == main_name]
+                    family_rows = family['rows']
                     
                     # Find પોતે (self) row first
                     pote_row = None
-                    for _, row in family_rows.iterrows():
-                        relation = str(row.iloc[2]).strip() if len(row) > 2 and not pd.isna(row.iloc[2]) else ''
+                    for row in family_rows:
+                        relation = str(row[2]).strip() if not pd.isna(row[2]) else ''
                         if 'પોતે' in relation:
                             pote_row = row
                             break
@@ -3086,90 +2956,30 @@ class UploadExcelView(APIView):
                     if pote_row is None:
                         continue
                     
-                    # Check if પોતે has mobile number (check multiple columns)
-                    main_mobile = ''
-                    for col_idx in [7, 8, 9, 10]:  # Check multiple columns for mobile
-                        if len(pote_row) > col_idx and not pd.isna(pote_row.iloc[col_idx]):
-                            mobile_val = str(pote_row.iloc[col_idx]).strip()
-                            if mobile_val and mobile_val.replace(' ', '').replace('-', '').replace('+', '').isdigit():
-                                main_mobile = mobile_val.replace(' ', '').replace('-', '').replace('+', '')
-                                if len(main_mobile) >= 10:
-                                    break
+                    main_pos = family['main_pos']
+                    main_mobile = family['main_mobile'] if main_pos == 0 else ''
                     print(f"Found mobile for પોતે: '{main_mobile}'")
                     
-                    # If પોતે has no mobile, find first family member with mobile
-                    if not main_mobile or len(main_mobile) < 10:
+                    # If પોતે has no mobile, use the family member picked by priority relation
+                    if not main_mobile:
                         print(f"પોતે {main_name} has no mobile, looking for family member with mobile...")
                         
-                        main_user_row = None
-                        selected_mobile = None
-                        selected_name = None
-                        
                         # Debug: Print all family members with ALL columns
                         print(f"\nFamily members for {main_name}:")
-                        for idx, row in family_rows.iterrows():
-                            member_name = str(row.iloc[1]).strip() if len(row) > 1 and not pd.isna(row.iloc[1]) else ''
-                            relation = str(row.iloc[2]).strip() if len(row) > 2 and not pd.isna(row.iloc[2]) else ''
+                        for row in family_rows:
+                            member_name = str(row[1]).strip() if not pd.isna(row[1]) else ''
+                            relation = str(row[2]).strip() if not pd.isna(row[2]) else ''
                             print(f"  Member: {member_name} ({relation})")
                             # Show all columns for this member
                             for col_idx in range(len(row)):
-                                val = row.iloc[col_idx]
-                                print(f"    Col{col_idx}: '{val}'")
+                                print(f"    Col{col_idx}: '{row[col_idx]}'")
                             print()
                         
-                        # Priority relations for main user selection
-                        priority_relations = ['પુત્ર', 'પત્ની', 'પુત્રવધુ', 'દીકરી', 'ભાઈ', 'બહેન']
-                        
-                        # First try priority relations
-                        for priority_rel in priority_relations:
-                            for _, row in family_rows.iterrows():
-                                relation = str(row.iloc[2]).strip() if len(row) > 2 and not pd.isna(row.iloc[2]) else ''
-                                if priority_rel in relation and 'પોતે' not in relation:
-                                    # Check multiple columns for mobile
-                                    member_mobile = ''
-                                    for col_idx in [7, 8, 9, 10]:
-                                        if len(row) > col_idx and not pd.isna(row.iloc[col_idx]):
-                                            mobile_val = str(row.iloc[col_idx]).strip()
-                                            if mobile_val and mobile_val.replace(' ', '').replace('-', '').replace('+', '').isdigit():
-                                                member_mobile = mobile_val.replace(' ', '').replace('-', '').replace('+', '')
-                                                if len(member_mobile) >= 10:
-                                                    break
-                                    
-                                    if member_mobile and len(member_mobile) >= 10:
-                                        main_user_row = row
-                                        selected_mobile = member_mobile
-                                        selected_name = str(row.iloc[1]).strip() if len(row) > 1 and not pd.isna(row.iloc[1]) else ''
-                                        print(f"Found priority member: {selected_name} ({relation}) with mobile: {selected_mobile}")
-                                        break
-                            if main_user_row is not None:
-                                break
-                        
-                        # If no priority relation found, take any family member with mobile
-                        if main_user_row is None:
-                            for _, row in family_rows.iterrows():
-                                relation = str(row.iloc[2]).strip() if len(row) > 2 and not pd.isna(row.iloc[2]) else ''
-                                if 'પોતે' not in relation:
-                                    # Check multiple columns for mobile
-                                    member_mobile = ''
-                                    for col_idx in [7, 8, 9, 10]:
-                                        if len(row) > col_idx and not pd.isna(row.iloc[col_idx]):
-                                            mobile_val = str(row.iloc[col_idx]).strip()
-                                            if mobile_val and mobile_val.replace(' ', '').replace('-', '').replace('+', '').isdigit():
-                                                member_mobile = mobile_val.replace(' ', '').replace('-', '').replace('+', '')
-                                                if len(member_mobile) >= 10:
-                                                    break
-                                    
-                                    if member_mobile and len(member_mobile) >= 10:
-                                        main_user_row = row
-                                        selected_mobile = member_mobile
-                                        selected_name = str(row.iloc[1]).strip() if len(row) > 1 and not pd.isna(row.iloc[1]) else ''
-                                        print(f"Found any member: {selected_name} ({relation}) with mobile: {selected_mobile}")
-                                        break
-                        
-                        if main_user_row is not None:
+                        if main_pos is not None:
                             # Use the selected family member as main user
-                            main_name = selected_name
-                            main_mobile = selected_mobile
+                            main_user_row = family_rows[main_pos]
+                            main_name = str(main_user_row[1]).strip() if not pd.isna(main_user_row[1]) else ''
+                            main_mobile = family['main_mobile']
                             print(f"SUCCESS: Making {main_name} the main user with mobile: {main_mobile}")
                         else:
                             print(f"ERROR: No family member with mobile found for {main_name}")
@@ -3178,43 +2988,17 @@ class UploadExcelView(APIView):
                     else:
                         print(f"Processing main user: {main_name}, mobile: {main_mobile}")
                     
-                    if not main_mobile or len(main_mobile) < 10:
-                        print(f"Invalid mobile for {main_name}: '{main_mobile}'")
-                        continue
-                    
-                    # Check all mobile variants to prevent duplicates
-                    clean_main_mobile = main_mobile.replace('+', '').replace(' ', '').replace('-', '')
-                    if clean_main_mobile.startswith('91') and len(clean_main_mobile) == 12:
-                        clean_main_mobile = clean_main_mobile[2:]
-                    
-                    mobile_check_variants = [main_mobile, clean_main_mobile]
-                    if main_mobile.startswith('+91'):
-                        mobile_check_variants.append(main_mobile[3:])
-                    
-                    # Remove duplicates from check variants
-                    mobile_check_variants = list(set(mobile_check_variants))
-                    
-                    # Check if any variant already exists - PRESERVE EXISTING DATA
-                    user_exists = False
-                    existing_variant = None
-                    for variant in mobile_check_variants:
-                        if (User.objects.filter(username=variant).exists() or 
-                            NewPersonalProfile.objects.filter(mobileNumber=variant).exists()):
-                            print(f"✓ PRESERVING: User with mobile {variant} already exists, keeping existing data intact")
-                            user_exists = True
-                            existing_variant = variant
-                            break
-                    
-                    if user_exists:
+                    # Existing mobiles (and the ones created earlier in this sheet) are checked in memory - PRESERVE EXISTING DATA
+                    if writer.is_registered(main_mobile):
+                        print(f"✓ PRESERVING: User with mobile {main_mobile} already exists, keeping existing data intact")
                         processed_mains.add(main_name)
                         records_skipped += 1
-                        print(f"✓ SKIPPED: {main_name} (mobile: {existing_variant}) - preserving existing data")
+                        print(f"✓ SKIPPED: {main_name} (mobile: {main_mobile}) - preserving existing data")
                         continue
                     
                     # Create main user
-                    user = User.objects.create_user(
+                    user = writer.create_user(
                         username=main_mobile,
-                        password='temp123',
                         first_name=main_name,
                         email=f"{main_mobile}@temp.com"
                     )
@@ -3223,8 +3007,8 @@ class UploadExcelView(APIView):
                     surname, name_sakh = parse_gujarati_name(main_name)
                     
                     # Parse address to get area and city
-                    full_address = str(pote_row.iloc[10]).strip() if len(pote_row) > 10 and not pd.isna(pote_row.iloc[10]) else ''
-                    area, city, remaining_address = parse_address(full_address)
+                    full_address = str(pote_row[10]).strip() if not pd.isna(pote_row[10]) else ''
+                    remaining_address, area, city = split_address(full_address)
                     
                     # Use પોતે row data for profile, but main user's mobile
                     profile_data = {
@@ -3236,23 +3020,23 @@ class UploadExcelView(APIView):
                         'mobileNumber': main_mobile,  # Use the mobile from main user (could be family member)
                         'email': f"{main_mobile}@temp.com",
                         'age': 30,
-                        'occupation': str(pote_row.iloc[9]).strip() if len(pote_row) > 9 and not pd.isna(pote_row.iloc[9]) else '',  # Column 9: વ્યવસાય
+                        'occupation': str(pote_row[9]).strip() if not pd.isna(pote_row[9]) else '',  # Column 9: વ્યવસાય
                         'address': remaining_address,  # Remaining address after removing area and city
                         'area': area,  # Parsed area
-                        'city': city   # Parsed city
+                        'city': city,  # Parsed city
+                        'password_change_required': True  # No password yet, activated through the OTP login
                     }
                     
-                    profile = NewPersonalProfile.objects.create(**profile_data)
+                    profile = writer.create_profile(**profile_data)
                     
                     # Add family members (excluding the one who became main user if applicable)
-                    for _, row in family_rows.iterrows():
-                        member_name = str(row.iloc[1]).strip() if not pd.isna(row.iloc[1]) else ''  # Column 1: કુટુંબના સભ્યનું નામ
-                        relation = str(row.iloc[2]).strip() if len(row) > 2 and not pd.isna(row.iloc[2]) else ''
-                        member_mobile = str(row.iloc[7]).strip() if len(row) > 7 and not pd.isna(row.iloc[7]) else ''
-                        member_mobile = member_mobile.replace(' ', '').replace('-', '').replace('+', '') if member_mobile else ''
+                    for pos, row in enumerate(family_rows):
+                        member_name = str(row[1]).strip() if not pd.isna(row[1]) else ''  # Column 1: કુટુંબના સભ્યનું નામ
+                        relation = str(row[2]).strip() if not pd.isna(row[2]) else ''
+                        member_mobile = family['mobiles'][pos]
                         
                         # Skip if this member became the main user
-                        if member_mobile == main_mobile and 'પોતે' not in relation:
+                        if pos == main_pos and 'પોતે' not in relation:
                             continue
                         
                         # Skip પોતે or empty names
@@ -3260,7 +3044,7 @@ class UploadExcelView(APIView):
                             continue
                         
                         # Parse birthdate and calculate age
-                        birthdate_str = str(row.iloc[3]).strip() if len(row) > 3 and not pd.isna(row.iloc[3]) else ''
+                        birthdate_str = str(row[3]).strip() if not pd.isna(row[3]) else ''
                         member_age = 25  # default
                         birthdate = None
                         if birthdate_str:
@@ -3272,7 +3056,7 @@ class UploadExcelView(APIView):
                                 pass
                         
                         # Parse marital status
-                        marital_gujarati = str(row.iloc[5]).strip() if len(row) > 5 and not pd.isna(row.iloc[5]) else ''
+                        marital_gujarati = str(row[5]).strip() if not pd.isna(row[5]) else ''
                         marital_status = ''
                         if 'પરણીત' in marital_gujarati:
                             marital_status = 'married'
@@ -3285,15 +3069,15 @@ class UploadExcelView(APIView):
                         # Parse member address (check multiple columns)
                         member_full_address = ''
                         for addr_col in [10, 9, 8]:  # Check address in multiple columns
-                            if len(row) > addr_col and not pd.isna(row.iloc[addr_col]):
-                                addr_val = str(row.iloc[addr_col]).strip()
+                            if not pd.isna(row[addr_col]):
+                                addr_val = str(row[addr_col]).strip()
                                 if addr_val and addr_val != 'nan' and ',' in addr_val:  # Looks like address
                                     member_full_address = addr_val
                                     break
-                        member_area, member_city, member_remaining_address = parse_address(member_full_address)
+                        member_remaining_address, member_area, member_city = split_address(member_full_address)
                         
                         # Create family member with only required fields
-                        NewFamilyMember.objects.create(
+                        writer.create_member(
                             profile=profile,
                             surname=member_surname,  # Parsed surname from member name
                             name=member_name,        # Keep full name
@@ -3301,12 +3085,12 @@ class UploadExcelView(APIView):
                             relation=relation if relation else 'other',
                             memberAge=member_age,
                             dateOfBirth=birthdate,
-                            bloodGroup=str(row.iloc[4]).strip() if len(row) > 4 and not pd.isna(row.iloc[4]) else '',
+                            bloodGroup=str(row[4]).strip() if not pd.isna(row[4]) else '',
                             maritalStatus=marital_status,
                             sakh=member_sakh,        # Use sakh from parsed member name
                             mobileNumber=member_mobile,
-                            education=str(row.iloc[8]).strip() if len(row) > 8 and not pd.isna(row.iloc[8]) else '',
-                            occupation=str(row.iloc[9]).strip() if len(row) > 9 and not pd.isna(row.iloc[9]) else '',
+                            education=str(row[8]).strip() if not pd.isna(row[8]) else '',
+                            occupation=str(row[9]).strip() if not pd.isna(row[9]) else '',
                             address=member_remaining_address,  # Remaining address
                             area=member_area,        # Parsed area
                             city=member_city         # Parsed city
@@ -3315,12 +3099,17 @@ class UploadExcelView(APIView):
                     
                     processed_mains.add(main_name)
                     records_created += 1
-                    print(f"✓ CREATED: New user #{profile.user_number} - {main_name} (mobile: {main_mobile})")
+                    print(f"✓ CREATED: New user #{profile.user_number or '(numbered on flush)'} - {main_name} (mobile: {main_mobile})")
                     
                 except Exception as e:
                     print(f"✗ ERROR processing {main_name}: {str(e)}")
                     continue
             
+            writer.flush()
+            if mode in ('bulk', 'stream'):
+                written = writer.written
+                print(f"Bulk insert wrote {written['users']} users, {written['profiles']} profiles, {written['members']} family members")
+            
             print(f"\n=== EXCEL UPLOAD COMPLETED ===")
             print(f"✓ NEW RECORDS CREATED: {records_created}")
             print(f"✓ EXISTING RECORDS PRESERVED: {records_skipped}")
@@ -3329,9 +3118,10 @@ class UploadExcelView(APIView):
             
             return Response({
                 'success': True,
+                'mode': mode,
                 'records_created': records_created,
                 'records_skipped': records_skipped,
-                'total_main_members_found': len(main_members),
+                'total_main_members_found': families_found,
                 'processed_successfully': len(processed_mains),
                 'total_database_records': NewPersonalProfile.objects.count(),
                 'message': f'Excel upload completed successfully! Created {records_created} new users, preserved {records_skipped} existing users. Total users in database: {NewPersonalProfile.objects.count()}'
@@ -3348,7 +3138,7 @@ class DashboardStatsView(APIView):
         try:
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
                 # Count family members for current user only
                 user_family_members = current_profile.family_members.count()
                 # Total active members = main user + their family members
@@ -3360,7 +3150,7 @@ class DashboardStatsView(APIView):
             
             # Get unread messages count for current user
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
                 unread_messages = PrivateMessage.objects.filter(
                     receiver=current_profile,
                     is_read=False
@@ -3373,19 +3163,19 @@ class DashboardStatsView(APIView):
             upcoming_events_count = 0
             
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
                 
                 # Get events organized by user (future only)
                 organized_events = FamilyEvent.objects.filter(
                     organizer=current_profile,
                     event_date__gt=timezone.now()
-                )
+                ).select_related('organizer')
                 
                 # Get events user is invited to (future only)
                 invited_events = FamilyEvent.objects.filter(
                     invitations__invitee=current_profile,
                     event_date__gt=timezone.now()
-                ).distinct()
+                ).select_related('organizer').distinct()
                 
                 # Get public events from connected families (future only)
                 from .models import FamilyConnection
@@ -3407,11 +3197,10 @@ class DashboardStatsView(APIView):
                     event_date__gt=timezone.now()
                 ).exclude(
                     id__in=invited_events.values_list('id', flat=True)
-                )
+                ).select_related('organizer')
                 
-                # Combine all public events
-                all_public_events = public_events.union(all_user_events)
-                public_events = list(all_public_events)
+                # Combine all public events (the union with the empty queryset added nothing)
+                public_events = list(public_events) + list(all_user_events)
                 
                 # Combine future events and serialize them
                 all_events = list(organized_events) + list(invited_events) + list(public_events)
@@ -3419,6 +3208,8 @@ class DashboardStatsView(APIView):
                 # Sort by date and limit to 4 most recent
                 all_events.sort(key=lambda x: x.event_date)
                 upcoming_events = all_events[:4]
+                # Invitations only for the 4 events shown, in one query
+                prefetch_related_objects(upcoming_events, 'invitations__invitee')
                 
                 # Serialize events
                 from .serializers import FamilyEventSerializer
@@ -3450,7 +3241,7 @@ class TransformRelationView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
@@ -3507,7 +3298,7 @@ class TransformRelationView(APIView):
             
             # Get current user's profile
             try:
-                current_profile = NewPersonalProfile.objects.get(user=request.user)
+                current_profile = request.identity.get_profile()
             except NewPersonalProfile.DoesNotExist:
                 return Response({
                     'success': False,
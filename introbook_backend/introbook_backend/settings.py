@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -50,6 +51,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # request.identity: the caller's role, profile and family member login (acc_intro/request_identity.py)
+    'acc_intro.request_identity.RequestIdentityMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -146,13 +149,52 @@ CORS_ALLOW_ALL_ORIGINS = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        # TokenAuthentication with the token, user and profile cached (acc_intro/authentication.py)
+        'acc_intro.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 }
 
+# Keyset pagination of the directory lists (acc_intro/pagination.py), overridable with ?page_size=
+DIRECTORY_PAGE_SIZE = 100
+DIRECTORY_MAX_PAGE_SIZE = 500
+
+# The cache has to be shared by every worker process: the directory version that invalidates the
+# facet counts and suggestions (acc_intro/facets.py), the token cache and the login throttle live in
+# it. Set REDIS_URL (e.g. redis://127.0.0.1:6379/1, needs the redis package) when running more than
+# one worker; without it each process keeps its own cache, which is only right for runserver.
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Seconds a token stays in the authentication cache before it is looked up again
+AUTH_TOKEN_CACHE_SECONDS = 60
+
+# Family search (acc_intro/search.py): 'auto' uses pg_trgm on PostgreSQL and a plain substring
+# match elsewhere; 'trigram' or 'simple' force one of them.
+SEARCH_BACKEND = 'auto'
+
+# Seconds the facet counts of the directory browse (acc_intro/facets.py) stay cached; any profile or
+# member write invalidates them sooner.
+FACET_CACHE_SECONDS = 600
+
+# Prefixes whose suggestions every worker keeps in memory (acc_intro/autocomplete.py), and for how
+# many seconds. Writes invalidate them sooner through a version in the shared default cache.
+AUTOCOMPLETE_CACHE_SIZE = 2048
+AUTOCOMPLETE_CACHE_SECONDS = 60
+
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'  # For development - prints to console
 DEFAULT_FROM_EMAIL = 'noreply@introbook.com'
@@ -165,3 +207,19 @@ EMAIL_HOST_USER = 'noreply@introbook.com'
 # EMAIL_USE_TLS = True
 # EMAIL_HOST_USER = 'your-email@gmail.com'
 # EMAIL_HOST_PASSWORD = 'your-app-password'
+
+# One-time codes (acc_intro/otp_store.py). 'database' is shared by every worker process;
+# 'cache' needs a cache shared by the workers (Redis/Memcached) configured in CACHES.
+OTP_BACKEND = 'database'
+OTP_TTL_SECONDS = 300
+OTP_MAX_ATTEMPTS = 5
+
+# Failed logins (acc_intro/login_throttle.py): after this many failures for one mobile, or from one
+# IP, login answers 429 for the rest of the window without checking the password.
+LOGIN_MAX_FAILURES = 5
+LOGIN_MAX_FAILURES_PER_IP = 50
+LOGIN_FAILURE_WINDOW_SECONDS = 900
+
+# Background imports (acc_intro/import_jobs.py): a job that has not moved for this long lost its
+# worker; polling it or `manage.py run_import_jobs` (cron) marks it failed.
+IMPORT_JOB_STALE_SECONDS = 900
@@ -5,4 +5,16 @@ const instance = axios.create({
   baseURL: 'http://localhost:8000/',
 });
 
+// Fetch every page of a cursor-paginated list endpoint (e.g. all-families/) and return one array
+export const fetchAllPages = async (url, config = {}) => {
+  const results = [];
+  let next = url;
+  while (next) {
+    const response = await instance.get(next, config);
+    results.push(...response.data.results);
+    next = response.data.next;
+  }
+  return results;
+};
+
 export default instance;
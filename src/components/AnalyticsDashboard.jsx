@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import { BarChart, Bar, PieChart, Pie, Cell, XAxis, YAxis, CartesianGrid, Tooltip, Legend, ResponsiveContainer } from 'recharts';
-import axios from '../axiosConfig';
+import axios, { fetchAllPages } from '../axiosConfig';
 import UserNumberDisplay from './UserNumberDisplay';
 import { useTranslation } from '../hooks/useTranslation';
 import './AnalyticsDashboard.css';
@@ -24,12 +24,12 @@ const AnalyticsDashboard = () => {
       try {
         const token = localStorage.getItem('token');
         
-        const [familiesResponse, profileResponse] = await Promise.all([
-          axios.get('all-families/', { headers: { Authorization: `Token ${token}` } }),
+        const [allFamilies, profileResponse] = await Promise.all([
+          fetchAllPages('all-families/?fields=surname&expand=family_members', { headers: { Authorization: `Token ${token}` } }),
           axios.get('profile/edit/', { headers: { Authorization: `Token ${token}` } })
         ]);
         
-        const families = familiesResponse.data || [];
+        const families = allFamilies || [];
         const profile = profileResponse.data;
         
         setUserProfile(profile);
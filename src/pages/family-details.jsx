@@ -1,5 +1,5 @@
 import React, { useEffect, useState } from "react";
-import axios from "../axiosConfig";
+import { fetchAllPages } from "../axiosConfig";
 import Layout from "../components/Layout";
 import LanguageToggle from "../components/LanguageToggle";
 import { useTranslation } from "../hooks/useTranslation";
@@ -61,9 +61,11 @@ const FamilyDetails = () => {
     const fetchFamilies = async () => {
       try {
         const token = localStorage.getItem("token");
-        const response = await axios.get("/all-families/", {
-          headers: { Authorization: `Token ${token}` },
-        });
+        const response = {
+          data: await fetchAllPages("/all-families/", {
+            headers: { Authorization: `Token ${token}` },
+          }),
+        };
         setFamilies(response.data);
         setFilteredFamilies(response.data);
         
@@ -71,7 +71,7 @@ const MobileLogin = () => {
       const response = await fetch('http://localhost:8000/api/set-mobile-password/', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ mobile, password })
+        body: JSON.stringify({ mobile, otp, password })
       });
       const data = await response.json();
       if (data.success) {